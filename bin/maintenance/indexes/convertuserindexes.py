@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+##
+##
+## This file is part of Indico.
+## Copyright (C) 2002 - 2013 European Organization for Nuclear Research (CERN).
+##
+## Indico is free software; you can redistribute it and/or
+## modify it under the terms of the GNU General Public License as
+## published by the Free Software Foundation; either version 3 of the
+## License, or (at your option) any later version.
+##
+## Indico is distributed in the hope that it will be useful, but
+## WITHOUT ANY WARRANTY; without even the implied warranty of
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+## General Public License for more details.
+##
+## You should have received a copy of the GNU General Public License
+## along with Indico;if not, see <http://www.gnu.org/licenses/>.
+
+from ZODB.POSException import ConflictError
+
+from MaKaC.common import db
+from MaKaC.common.indexes import IndexesHolder
+
+
+def main():
+    """This script moves the user and group indexes (email, name, surName,
+    organisation, group, status) to the BTree-based storage. Since the
+    indexes keep working with both storages it can be run on a live system;
+    a conversion that conflicts with a concurrent change is simply retried."""
+    dbi = db.DBMgr.getInstance()
+    dbi.startRequest()
+    for name in ('email', 'name', 'surName', 'organisation', 'group', 'status'):
+        for i in xrange(10):
+            dbi.sync()
+            try:
+                converted = IndexesHolder().getById(name).convertStorage()
+                dbi.commit()
+            except ConflictError:
+                dbi.abort()
+                print '%s: conflict, retrying' % name
+                continue
+            print '%s: %s' % (name, 'converted' if converted else 'already converted')
+            break
+        else:
+            print '%s: giving up after too many conflicts' % name
+    dbi.endRequest()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+##
+##
+## This file is part of Indico.
+## Copyright (C) 2002 - 2013 European Organization for Nuclear Research (CERN).
+##
+## Indico is free software; you can redistribute it and/or
+## modify it under the terms of the GNU General Public License as
+## published by the Free Software Foundation; either version 3 of the
+## License, or (at your option) any later version.
+##
+## Indico is distributed in the hope that it will be useful, but
+## WITHOUT ANY WARRANTY; without even the implied warranty of
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+## General Public License for more details.
+##
+## You should have received a copy of the GNU General Public License
+## along with Indico;if not, see <http://www.gnu.org/licenses/>.
+
+from MaKaC.common import db
+from MaKaC.common.indexes import IndexesHolder
+
+
+def main():
+    """This script rebuilds the case-folded and trigram structures used for
+    substring searches in the user and group indexes
+    (email, name, surName, organisation, group)."""
+    dbi = db.DBMgr.getInstance()
+    dbi.startRequest()
+    ih = IndexesHolder()
+    for name in ('email', 'name', 'surName', 'organisation', 'group'):
+        print 'Rebuilding search index for %r...' % name
+        ih.getById(name).buildSearchIndex()
+        dbi.commit()
+    dbi.endRequest()
+
+if __name__ == "__main__":
+    main()
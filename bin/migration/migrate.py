@@ -31,7 +31,7 @@ from pkg_resources import parse_version
 from collections import defaultdict
 
 from MaKaC import __version__
-from MaKaC.common.indexes import IndexesHolder, CategoryDayIndex, CalendarDayIndex
+from MaKaC.common.indexes import IndexesHolder, CategoryDayIndex, CalendarDayIndex, SearchableIndex
 from MaKaC.common import DBMgr
 from MaKaC.common.info import HelperMaKaCInfo
 from MaKaC.common.Counter import Counter
@@ -43,10 +43,14 @@ from MaKaC.plugins.base import PluginType, PluginsHolder
 from MaKaC.registration import RegistrantSession, RegistrationSession
 from MaKaC.plugins.RoomBooking.default.dalManager import DALManager
 from MaKaC.plugins.RoomBooking.default.room import Room
-from MaKaC.plugins.RoomBooking.tasks import RoomReservationTask
+from MaKaC.plugins.RoomBooking.tasks import RoomReservationTask, RoomReservationStatsTask
+from MaKaC.plugins.RoomBooking.default.reservationStats import ReservationStats
+from MaKaC.plugins.RoomBooking.default.roomIndexes import RoomIndexes
+from MaKaC.plugins.RoomBooking.default.reservationTextIndex import ReservationTextIndex
 from MaKaC.plugins.Collaboration.Vidyo.common import VidyoTools
 from MaKaC.plugins.Collaboration import urlHandlers
 from MaKaC.webinterface import displayMgr
+from MaKaC.webinterface.session.sessionManagement import getSessionManager, migrateSession
 from MaKaC.user import AvatarHolder
 from MaKaC.rb_location import CrossLocationQueries
 
@@ -61,6 +65,8 @@ from indico.util.redis import avatar_links
 from indico.util.redis import client as redis_client
 
 from indico.modules.scheduler import Client
+from indico.modules.scheduler.tasks.apikeys import APIKeyUsageTask
+from indico.modules.scheduler.tasks.outbox import MailOutboxTask
 
 
 MIGRATION_TASKS = []
@@ -797,6 +803,31 @@ def redisLinkedTo(dbi, withRBDB, prevVersion):
         pipe.execute()
     print '\r  Done   '
 
+@since('1.2', never=True)
+def redisWebSessions(dbi, withRBDB, prevVersion):
+    """Copy web sessions from the ZODB to Redis"""
+    if not Config.getInstance().getRedisConnectionURL():
+        print console.colored("  Redis not configured, skipping", 'yellow')
+        return
+
+    zodbSM = getSessionManager(backend='zodb')
+    redisSM = getSessionManager(backend='redis')
+    skipped = 0
+    with redis_client.pipeline(transaction=False) as pipe:
+        for i, (sessionId, session) in enumerate(zodbSM.iteritems()):
+            if not zodbSM.isSessionValid(session):
+                skipped += 1
+                continue
+            redisSM.sessions.set(sessionId, migrateSession(session), client=pipe)
+            if i % 1000 == 0:
+                pipe.execute()
+                dbi.sync()
+            print '\r  %d' % i,
+            sys.stdout.flush()
+        pipe.execute()
+    print '\r  Done (%d expired sessions skipped)' % skipped
+
+
 @since('1.2')
 def removeVideoServicesLinksFromCore(dbi, withRBDB, prevVersion):
     """Video Services migration remove from core"""
@@ -820,6 +851,65 @@ def removeVideoServicesLinksFromCore(dbi, withRBDB, prevVersion):
             dbi.commit()
 
 
+@since('1.2')
+def apiKeyUsageTask(dbi, withRBDB, prevVersion):
+    """Schedule the task writing buffered API key usage"""
+    if not Config.getInstance().getRedisConnectionURL():
+        print console.colored("  Redis not configured, skipping", 'yellow')
+        return
+    Client().enqueue(APIKeyUsageTask(rrule.MINUTELY, interval=15))
+
+
+@since('1.2')
+def userIndexesStorage(dbi, withRBDB, prevVersion):
+    """Move the user and group indexes to BTrees and build their search indexes"""
+    ih = IndexesHolder()
+    for name in ('email', 'name', 'surName', 'organisation', 'group', 'status'):
+        idx = ih.getById(name)
+        if not idx.convertStorage() and isinstance(idx, SearchableIndex):
+            idx.buildSearchIndex()
+        dbi.commit()
+
+
+@since('1.2')
+def roomBookingStatsCounters(dbi, withRBDB, prevVersion):
+    """Build the room booking statistics counters and schedule their reconciliation"""
+    if not withRBDB:
+        return
+    ReservationStats.reconcile()
+    DALManager.commit()
+    Client().enqueue(RoomReservationStatsTask(rrule.DAILY, byhour=3, byminute=0, bysecond=0))
+
+
+@since('1.2')
+def roomIndexes(dbi, withRBDB, prevVersion):
+    """Build the room search indexes"""
+    if not withRBDB:
+        return
+    RoomIndexes.build()
+    DALManager.commit()
+
+
+@since('1.2')
+def reservationTextIndex(dbi, withRBDB, prevVersion):
+    """Build the index of the text fields of the reservations"""
+    if not withRBDB:
+        return
+    ReservationTextIndex.build()
+    DALManager.commit()
+
+
+@since('1.2')
+def mailOutboxTask(dbi, withRBDB, prevVersion):
+    """Schedule the task sending the emails from the outbox"""
+    # it runs every minute and keeps a record of every run, so it is only
+    # scheduled where there is something to send
+    if not Config.getInstance().getSmtpUseOutbox():
+        print console.colored("  SmtpUseOutbox not enabled, skipping", 'yellow')
+        return
+    Client().enqueue(MailOutboxTask(rrule.MINUTELY))
+
+
 def runMigration(withRBDB=False, prevVersion=parse_version(__version__),
                  specified=[], dry_run=False, run_from=None):
 
@@ -19,12 +19,15 @@
 
 import ZODB
 from persistent import Persistent
+from BTrees.OOBTree import OOBTree
+from ZODB.POSException import ConflictError
 from functools import wraps
 
 from MaKaC.common import DBMgr
 from MaKaC.common import info
 import MaKaC
 from MaKaC.common.contextManager import ContextManager
+from MaKaC.common.accessCache import memoizeAccess
 from MaKaC.plugins import Observable
 from MaKaC.common.logger import Logger
 
@@ -90,6 +93,13 @@ class AccessController( Persistent, Observable ):
     def setOwner(self, owner):
         self.owner = owner
 
+    def _invalidateAccessSummary(self, descendants=False):
+        """marks the access summaries depending on the owner as out of date
+        """
+        owner = self.getOwner()
+        if owner is not None and hasattr(owner, 'invalidateAccessSummary'):
+            owner.invalidateAccessSummary(descendants)
+
     def _getAccessProtection( self ):
         try:
             return self._accessProtection
@@ -139,6 +149,7 @@ class AccessController( Persistent, Observable ):
     def setProtection( self, protected ):
         self._accessProtection = protected
         self._p_changed = 1
+        self._invalidateAccessSummary(True)
 
     def isFatherProtected(self):
         return self._getFatherProtection()
@@ -159,6 +170,7 @@ class AccessController( Persistent, Observable ):
                 isinstance(principal, MaKaC.user.LDAPGroup)):
             self.allowed.append( principal )
             self._p_changed = 1
+        self._invalidateAccessSummary()
         self._notify('accessGranted', principal)
 
     def getAccessEmail(self):
@@ -171,11 +183,13 @@ class AccessController( Persistent, Observable ):
     def grantAccessEmail(self, email):
         if not email in self.getAccessEmail():
             self.getAccessEmail().append(email)
+        self._invalidateAccessSummary()
         self._notify('accessGranted', email)
 
     def revokeAccessEmail(self, email):
         if email in self.getAccessEmail.keys():
             self.getAccessEmail().remove(email)
+        self._invalidateAccessSummary()
         self._notify('accessRevoked', email)
 
     def revokeAccess( self, principal ):
@@ -190,10 +204,12 @@ class AccessController( Persistent, Observable ):
         if principal in self.allowed:
             self.allowed.remove( principal )
             self._p_changed = 1
+        self._invalidateAccessSummary()
         self._notify('accessRevoked', principal)
 
     def setAccessKey( self, key="" ):
         self.accessKey = key
+        self._invalidateAccessSummary()
 
     def getAccessKey( self ):
         try:
@@ -239,15 +255,23 @@ class AccessController( Persistent, Observable ):
         else:
             return False
 
+    @memoizeAccess
     def canUserAccess( self, av ):
         if self.isAdmin( av ):
             return True
+        ldapGroups = []
         for principal in self.allowed:
             if principal == None:
                 self.revokeAccess(principal)
                 continue
+            # LDAP groups are checked all at once, in a single query
+            if isinstance(principal, MaKaC.user.LDAPGroup):
+                ldapGroups.append(principal)
+                continue
             if (isinstance(principal, MaKaC.user.Avatar) or isinstance(principal, MaKaC.user.CERNGroup) or isinstance(principal, MaKaC.user.Group)) and principal.containsUser( av ):
                 return True
+        if MaKaC.user.LDAPGroup.containsUserInAny(ldapGroups, av):
+            return True
         if isinstance(av, MaKaC.user.Avatar):
             for email in av.getEmails():
                 if email in self.getAccessEmail():
@@ -275,6 +299,7 @@ class AccessController( Persistent, Observable ):
         if not email.lower() in map(lambda x: x.lower(), self.getModificationEmail()):
             self.getModificationEmail().append(email)
             self._p_changed = 1
+            self._invalidateAccessSummary()
             self._notify('modificationGranted', email)
             return True
         return False
@@ -283,6 +308,7 @@ class AccessController( Persistent, Observable ):
         if email in self.getModificationEmail():
             self.getModificationEmail().remove(email)
             self._p_changed = 1
+        self._invalidateAccessSummary()
         self._notify('modificationRevoked', email)
 
     def grantModification( self, principal ):
@@ -292,6 +318,7 @@ class AccessController( Persistent, Observable ):
         if principal not in self.managers and (isinstance(principal, MaKaC.user.Avatar) or isinstance(principal, MaKaC.user.CERNGroup) or isinstance(principal, MaKaC.user.Group)):
             self.managers.append( principal )
             self._p_changed = 1
+        self._invalidateAccessSummary()
         self._notify('modificationGranted', principal)
 
     def revokeModification( self, principal ):
@@ -300,6 +327,7 @@ class AccessController( Persistent, Observable ):
         if principal in self.managers:
             self.managers.remove( principal )
             self._p_changed = 1
+        self._invalidateAccessSummary()
         self._notify('modificationRevoked', principal)
 
     def canModify( self, user ):
@@ -307,9 +335,15 @@ class AccessController( Persistent, Observable ):
         if AdminList.getInstance().isAdmin( user ):
             return True
 
+        ldapGroups = []
         for principal in self.managers:
+            if isinstance(principal, MaKaC.user.LDAPGroup):
+                ldapGroups.append(principal)
+                continue
             if (isinstance(principal, MaKaC.user.Avatar) or isinstance(principal, MaKaC.user.CERNGroup) or isinstance(principal, MaKaC.user.Group)) and principal.containsUser( user ):
                 return True
+        if MaKaC.user.LDAPGroup.containsUserInAny(ldapGroups, user):
+            return True
         ret = False
         if isinstance(user, MaKaC.user.Avatar):
             for email in user.getEmails():
@@ -334,6 +368,7 @@ class AccessController( Persistent, Observable ):
             return
         self.requiredDomains.append( domain )
         self._p_changed = 1
+        self._invalidateAccessSummary(True)
 
     def freeDomain( self, domain ):
         """
@@ -342,6 +377,7 @@ class AccessController( Persistent, Observable ):
             return
         self.requiredDomains.remove( domain )
         self._p_changed = 1
+        self._invalidateAccessSummary(True)
 
     def getRequiredDomainList( self ):
         """
@@ -376,6 +412,7 @@ class AccessController( Persistent, Observable ):
         if av not in self.getSubmitterList():
             self.submitters.append(av)
             self._p_changed = 1
+            self._invalidateAccessSummary()
 
     def grantSubmission(self, sb):
         """Grants submission privileges for the specified user
@@ -390,6 +427,7 @@ class AccessController( Persistent, Observable ):
         if av in self.getSubmitterList():
             self.submitters.remove(av)
             self._p_changed = 1
+            self._invalidateAccessSummary()
 
     def revokeSubmission(self, sb):
         """Removes submission privileges for the specified user
@@ -462,6 +500,223 @@ class AccessController( Persistent, Observable ):
         pass
 
 
+def _accessKey(*parts):
+    return ':'.join(part.encode('utf-8') if isinstance(part, unicode) else str(part)
+                    for part in parts)
+
+
+class AccessSummaryItems(dict):
+    """The entries an object contributes to its `AccessSummary` (see its
+        keys), as a dictionary of keys and principals/objects
+    """
+
+    def setPublic(self):
+        self[AccessSummary.PUBLIC] = None
+
+    def setHasConferences(self):
+        self[AccessSummary.CONFERENCES] = None
+
+    def setHasParts(self):
+        self[AccessSummary.PARTS] = None
+
+    def addPrincipals(self, principals):
+        for principal in principals:
+            if isinstance(principal, MaKaC.user.Avatar):
+                self[_accessKey('a', principal.getId())] = principal
+            elif isinstance(principal, MaKaC.user.Group):
+                self[_accessKey('g', principal.__class__.__name__, principal.getId())] = principal
+
+    def addResidual(self, obj):
+        self[_accessKey('r', obj.__class__.__name__, obj.getId())] = obj
+
+
+class AccessSummary(Persistent):
+    """Summary of who can see something at or below a category (or inside a
+        conference), which allows answering `canView` without walking the
+        whole tree.
+       It records whether anything is public, the principals (users and
+        groups) which are granted access somewhere and the objects whose
+        access depends on the client (IP domains, access keys, email grants,
+        public parts of protected events) and must be checked one by one.
+       The entries are kept in a BTree, with the number of children (events,
+        sub-categories) whose summaries contain them, so that a change is
+        merged into the summaries above as the entries it added or removed.
+        A summary is marked as dirty when something its owner contributes
+        changes, or when one of its children is dirty, and updated on demand
+        by its owner.
+    """
+
+    PUBLIC = '.public'
+    CONFERENCES = '.conferences'
+    PARTS = '.parts'
+
+    def __init__(self):
+        # key -> (number of children containing it, contributed by the owner, object)
+        self._entries = OOBTree()
+        # key -> child whose summary is dirty
+        self._dirtyChildren = OOBTree()
+        self._dirty = True
+        self._rebuild = True
+        self._pending = False
+
+    @staticmethod
+    def getFrom(obj):
+        """Returns the summary of `obj`, unless it has none yet (or in an
+            older format)
+        """
+        summary = getattr(obj, '_accessSummary', None)
+        if getattr(summary, '_entries', None) is None:
+            return None
+        return summary
+
+    @staticmethod
+    def getChildKey(child):
+        return _accessKey(child.__class__.__name__, child.getId())
+
+    def isDirty(self):
+        return self._dirty or self._rebuild or self._pending
+
+    def hasDirtyItems(self):
+        """tells whether the entries contributed by the owner are out of date"""
+        return self._dirty
+
+    def needsRebuild(self):
+        """tells whether the summary has to be computed again out of all
+            its children (e.g. the protection changed)
+        """
+        return self._rebuild
+
+    def invalidate(self, rebuild=False):
+        # always written, so that concurrent updates conflict with it
+        self._dirty = True
+        if rebuild:
+            self._rebuild = True
+
+    def invalidateChild(self, child):
+        self._pending = True
+        self._dirtyChildren[self.getChildKey(child)] = child
+
+    def discardChild(self, child):
+        key = self.getChildKey(child)
+        if key in self._dirtyChildren:
+            del self._dirtyChildren[key]
+
+    def popDirtyChildren(self):
+        children = list(self._dirtyChildren.values())
+        self._dirtyChildren.clear()
+        return children
+
+    def validate(self):
+        self._dirty = self._rebuild = self._pending = False
+
+    def _p_resolveConflict(self, oldState, savedState, newState):
+        # concurrent invalidations are merged, but an update must not miss
+        # one, since it would mark as valid changes it has not seen
+        state = dict(newState)
+        for flag in ('_dirty', '_rebuild', '_pending'):
+            if oldState.get(flag) and not (savedState.get(flag) and newState.get(flag)):
+                raise ConflictError
+            state[flag] = savedState.get(flag) or newState.get(flag)
+        return state
+
+    def _set(self, key, children, own, obj):
+        if children or own:
+            self._entries[key] = (children, own, obj)
+        elif key in self._entries:
+            del self._entries[key]
+
+    def iteritems(self):
+        """iterates over the keys of the entries and their objects"""
+        for key, (children, own, obj) in self._entries.iteritems():
+            yield key, obj
+
+    def merge(self, added, removed):
+        """Counts the entries (key, object) `added` to the summary of a
+            child and discounts the keys `removed` from it.
+           Returns the entries added to and the keys removed from this
+            summary.
+        """
+        newAdded, newRemoved = [], []
+        for key, obj in added:
+            children, own, old = self._entries.get(key, (0, False, None))
+            if not children and not own:
+                newAdded.append((key, obj))
+            self._set(key, children + 1, own, obj)
+        for key in removed:
+            children, own, obj = self._entries.get(key, (0, False, None))
+            if children:
+                self._set(key, children - 1, own, obj)
+                if children == 1 and not own:
+                    newRemoved.append(key)
+        return newAdded, newRemoved
+
+    def setOwnItems(self, items):
+        """Replaces the entries contributed by the owner with `items`
+            (`AccessSummaryItems`).
+           Returns the entries added to and the keys removed from the summary.
+        """
+        added, removed = [], []
+        for key, (children, own, obj) in list(self._entries.iteritems()):
+            if own and key not in items:
+                self._set(key, children, False, obj)
+                if not children:
+                    removed.append(key)
+        for key, obj in items.iteritems():
+            children, own, old = self._entries.get(key, (0, False, None))
+            if not own or old is not obj:
+                self._set(key, children, True, obj)
+                if not children and not own:
+                    added.append((key, obj))
+        return added, removed
+
+    def rebuild(self, items, children):
+        """Computes the summary again out of the entries contributed by the
+            owner (`items`) and the summaries of its `children`, writing only
+            the entries which changed.
+           Returns the entries added to and the keys removed from the summary.
+        """
+        entries = dict((key, [0, True, obj]) for key, obj in items.iteritems())
+        for child in children:
+            for key, obj in child.iteritems():
+                entries.setdefault(key, [0, False, obj])[0] += 1
+        added, removed = [], []
+        for key in list(self._entries.keys()):
+            if key not in entries:
+                del self._entries[key]
+                removed.append(key)
+        for key, (count, own, obj) in entries.iteritems():
+            old = self._entries.get(key)
+            if old is None:
+                added.append((key, obj))
+            if old is None or old[:2] != (count, own) or old[2] is not obj:
+                self._entries[key] = (count, own, obj)
+        return added, removed
+
+    def isPublic(self):
+        return self.PUBLIC in self._entries
+
+    def hasConferences(self):
+        return self.CONFERENCES in self._entries
+
+    def hasParts(self):
+        """tells whether there are sessions or contributions below"""
+        return self.PARTS in self._entries
+
+    def containsUser(self, av):
+        """tells whether the user is (or belongs to) one of the principals"""
+        if av is None:
+            return False
+        if _accessKey('a', av.getId()) in self._entries:
+            return True
+        for children, own, group in self._entries.values('g:', 'g;'):
+            if group.containsUser(av):
+                return True
+        return False
+
+    def getResidualList(self):
+        return [obj for children, own, obj in self._entries.values('r:', 'r;')]
+
+
 class CategoryAC(AccessController):
 
     def __init__( self ):
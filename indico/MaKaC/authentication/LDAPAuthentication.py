@@ -49,9 +49,14 @@ Adjust it to your needs if your LDAP structure is different.
 See indico.conf for information about customization options.
 """
 
+# stdlib imports
+import threading
+import time
+
 # python-ldap
 try:
     import ldap
+    import ldap.dn
     import ldap.filter
 except:
     pass
@@ -183,10 +188,14 @@ class LDAPConnector(object):
     of users which seems to be the standard LDAP setup
     """
 
+    # group name -> (DN, expiration time)
+    _groupDNs = {}
+
     def __init__(self):
         conf = Configuration.Config.getInstance()
         ldapConfig = conf.getLDAPConfig()
         self.ldapHost = ldapConfig.get('host')
+        self.ldapGroupDNTTL = conf.getGroupMembershipCacheTTL()
         self.ldapPeopleFilter, self.ldapPeopleDN = \
                                ldapConfig.get('peopleDNQuery')
         self.ldapGroupsFilter, self.ldapGroupsDN = \
@@ -215,8 +224,17 @@ class LDAPConnector(object):
                             self.ldapPeopleFilter, userName)
 
     def _findDNOfGroup(self, groupName):
-        return self._findDN(self.ldapGroupsDN,
-                            self.ldapGroupsFilter, groupName)
+        # group DNs hardly ever change, keep them for a while
+        now = time.time()
+        dn, expiration = self._groupDNs.get(groupName, (None, 0))
+        if expiration > now:
+            return dn
+        dn = self._findDN(self.ldapGroupsDN,
+                          self.ldapGroupsFilter,
+                          ldap.filter.escape_filter_chars(groupName))
+        if dn:
+            self._groupDNs[groupName] = (dn, now + self.ldapGroupDNTTL)
+        return dn
 
     def open(self):
         """
@@ -311,14 +329,135 @@ class LDAPConnector(object):
         return groupDicts
 
     def userInGroup(self, login, name):
+        """
+        Tells whether a user belongs to a group
+        """
+        return self.userInAnyGroup(login, [name])
+
+    def userInAnyGroup(self, login, names):
+        """
+        Tells whether a user belongs to any of the given groups, with a single
+        search over the user object
+        """
+        groupDNs = filter(None, (self._findDNOfGroup(name) for name in names))
+        if not groupDNs:
+            return False
+        userDN = self._findDNOfUser(ldap.filter.escape_filter_chars(login))
+        if not userDN:
+            return False
+        queries = []
+        for groupDN in groupDNs:
+            query = self.ldapMembershipQuery.format(
+                ldap.filter.escape_filter_chars(groupDN))
+            if not query.startswith('('):
+                query = '(%s)' % query
+            queries.append(query)
+        if len(queries) == 1:
+            query = queries[0]
+        else:
+            query = '(|%s)' % ''.join(queries)
+        res = self.l.search_s(userDN, ldap.SCOPE_BASE, query)
+
+        return res != []
+
+    def findGroupMemberUids(self, name):
         """
         Finds uids of users referenced by the member attribute
         of the group LDAP object
         """
-        query = self.ldapMembershipQuery.format(self._findDNOfGroup(name))
-        res = self.l.search_s(self._findDNOfUser(login), ldap.SCOPE_BASE, query)
+        groupDN = self._findDNOfGroup(name)
+        if not groupDN:
+            return []
+        res = self.l.search_s(groupDN, ldap.SCOPE_BASE,
+                              '(objectClass=*)', ['member'])
+        uids = []
+        for dn, data in res:
+            for memberDN in data.get('member', []):
+                # usually the uid is already part of the DN
+                rdn = ldap.dn.str2dn(memberDN)[0][0]
+                if rdn[0].lower() == 'uid':
+                    uids.append(rdn[1])
+                    continue
+                for _, memberData in self.l.search_s(
+                        memberDN, ldap.SCOPE_BASE, '(objectClass=*)', ['uid']):
+                    uids.extend(memberData.get('uid', [])[:1])
+        return uids
+
+
+class LDAPConnectionPool(object):
+    """
+    Keeps connections logged in with the access credentials, which are reused
+    by the lookups instead of connecting (and binding) again every time.
+    A connector is used by one thread at a time; at most `size` idle ones are
+    kept.
+    """
 
-        return res != []
+    def __init__(self, size):
+        self._size = size
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def _get(self):
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+        ldapc = LDAPConnector()
+        ldapc.open()
+        ldapc.login()
+        return ldapc
+
+    def _release(self, ldapc):
+        with self._lock:
+            if len(self._idle) < self._size:
+                self._idle.append(ldapc)
+                return
+        ldapc.close()
+
+    def _discard(self, ldapc):
+        try:
+            ldapc.close()
+        except ldap.LDAPError:
+            pass
+
+    def run(self, func, *args):
+        """
+        Calls `func(connector, *args)` with a pooled connector and returns its
+        result. A connection which was dropped by the server while idle is
+        replaced (once).
+        """
+        retry = True
+        while True:
+            ldapc = self._get()
+            try:
+                ret = func(ldapc, *args)
+            except ldap.SERVER_DOWN:
+                self._discard(ldapc)
+                if not retry:
+                    raise
+                retry = False
+                continue
+            except:
+                self._discard(ldapc)
+                raise
+            self._release(ldapc)
+            return ret
+
+    def clear(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for ldapc in idle:
+            self._discard(ldapc)
+
+
+_pool = None
+
+
+def getConnectionPool():
+    global _pool
+    if _pool is None:
+        ldapConfig = Configuration.Config.getInstance().getLDAPConfig()
+        _pool = LDAPConnectionPool(ldapConfig.get('connectionPoolSize', 5))
+    return _pool
 
 
 class LDAPChecker(object):
@@ -437,19 +576,11 @@ class LDAPUser(object):
 
         if lfilter == []:
             return {}
-        ldapc = LDAPConnector()
-        ldapc.open()
         fquery = "(&%s)" % ''.join(lfilter)
-        d = ldapc.findUsers(fquery)
-        ldapc.close()
-        return d
+        return getConnectionPool().run(LDAPConnector.findUsers, fquery)
 
     def getById(self, id):
-        ldapc = LDAPConnector()
-        ldapc.open()
-        ldapc.login()
-        ret = ldapc.lookupUser(id)
-        ldapc.close()
+        ret = getConnectionPool().run(LDAPConnector.lookupUser, id)
         if(ret == None):
             return None
         av = dictToAv(ret)
@@ -460,18 +591,21 @@ class LDAPUser(object):
 
 
 def ldapFindGroups(name, exact):
-    ldapc = LDAPConnector()
-    ldapc.open()
-    ldapc.login()
-    ret = ldapc.findGroups(ldap.filter.escape_filter_chars(name), exact)
-    ldapc.close()
-    return ret
+    return getConnectionPool().run(LDAPConnector.findGroups,
+                                   ldap.filter.escape_filter_chars(name), exact)
+
+
+def ldapFindGroupMemberUids(name):
+    return getConnectionPool().run(LDAPConnector.findGroupMemberUids, name)
 
 
 def ldapUserInGroup(user, name):
-    ldapc = LDAPConnector()
-    ldapc.open()
-    ldapc.login()
-    ret = ldapc.userInGroup(user, name)
-    ldapc.close()
-    return ret
+    return ldapUserInAnyGroup(user, [name])
+
+
+def ldapUserInAnyGroup(user, names):
+    """
+    Tells whether the user (login) belongs to any of the groups, with a single
+    query
+    """
+    return getConnectionPool().run(LDAPConnector.userInAnyGroup, user, names)
@@ -441,6 +441,7 @@ class Config:
         'DBPassword'                : '',
         'DBRealm'                   : '',
         'RedisConnectionURL'        : None,
+        'SessionBackend'            : 'zodb',
         'SanitizationLevel'         : 1,
         'CSRFLevel'                 : 2,
         'BaseURL'                   : 'http://localhost/',
@@ -461,10 +462,15 @@ class Config:
         'CacheBackend'              : 'files',
         'MemcachedServers'          : [],
         'RedisCacheURL'             : None,
+        'GroupMembershipCacheSize'  : 10000,
+        'GroupMembershipCacheTTL'   : 600,
+        'GroupNonMembershipCacheTTL': 60,
         'SmtpServer'                : ('localhost', 25),
         'SmtpLogin'                 : '',
         'SmtpPassword'              : '',
         'SmtpUseTLS'                : 'no',
+        'SmtpUseOutbox'             : 'no',
+        'MailSpoolDir'              : '',
         'SupportEmail'              : 'root@localhost',
         'PublicSupportEmail'        : 'root@localhost',
         'NoReplyEmail'              : 'noreply-root@localhost',
@@ -495,7 +501,8 @@ class Config:
                        'membershipQuery': 'memberof={0}',
                        'accessCredentials': ('CN=user,OU=Users,'
                                              'DC=example,DC=com',
-                                             'secret_password')}
+                                             'secret_password'),
+                       'connectionPoolSize': 5}
         }
 
     if sys.platform == 'win32':
@@ -621,6 +628,12 @@ class Config:
             except ImportError, e:
                 raise MaKaCError('Could not import redis: %s' % e.message)
 
+        if self.getSessionBackend() not in ('zodb', 'redis'):
+            raise MaKaCError("Invalid SessionBackend value (%s). Valid values: 'zodb', 'redis'" %
+                             self.getSessionBackend())
+        elif self.getSessionBackend() == 'redis' and not self.getRedisConnectionURL():
+            raise MaKaCError("SessionBackend 'redis' requires RedisConnectionURL to be set")
+
 
     def __getattr__(self, attr):
         """Dynamic finder for values defined in indico.conf
@@ -655,6 +668,15 @@ class Config:
     def getSmtpUseTLS(self):
         return self._yesOrNoVariable('SmtpUseTLS')
 
+    def getSmtpUseOutbox(self):
+        return self._yesOrNoVariable('SmtpUseOutbox')
+
+    def getMailSpoolDir(self):
+        spoolDir = self._configVars['MailSpoolDir']
+        if not spoolDir:
+            spoolDir = os.path.join(self.getSharedTempDir(), 'outbox')
+        return spoolDir
+
     def getProfile(self):
         return self._yesOrNoVariable('Profile')
 
@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+##
+##
+## This file is part of Indico.
+## Copyright (C) 2002 - 2013 European Organization for Nuclear Research (CERN).
+##
+## Indico is free software; you can redistribute it and/or
+## modify it under the terms of the GNU General Public License as
+## published by the Free Software Foundation; either version 3 of the
+## License, or (at your option) any later version.
+##
+## Indico is distributed in the hope that it will be useful, but
+## WITHOUT ANY WARRANTY; without even the implied warranty of
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+## General Public License for more details.
+##
+## You should have received a copy of the GNU General Public License
+## along with Indico;if not, see <http://www.gnu.org/licenses/>.
+
+"""
+Request-scoped memoization of access control resolutions
+"""
+
+from functools import wraps
+
+from MaKaC.common.contextManager import ContextManager
+
+
+class AccessCache(object):
+    """
+    Memo of the results of the (recursive) access checks done over the
+    category/event tree, keyed by method, object and arguments (usually the
+    principal). It lives in the `ContextManager` and is only used once it has
+    been enabled by the request handler, so that scripts and tasks keep
+    resolving access directly against the database.
+
+    Any event in `INVALIDATING_EVENTS` (protection changes, granted/revoked
+    access or management, domains, moves) drops the whole memo.
+    """
+
+    INVALIDATING_EVENTS = frozenset(['protectionChanged',
+                                     'accessGranted', 'accessRevoked',
+                                     'modificationGranted', 'modificationRevoked',
+                                     'accessDomainAdded', 'accessDomainRemoved',
+                                     'moved'])
+
+    _contextName = 'accessCache'
+
+    @classmethod
+    def enable(cls):
+        """
+        Starts an empty memo for the current context
+        """
+        ContextManager.set(cls._contextName, {})
+
+    @classmethod
+    def disable(cls):
+        ContextManager.set(cls._contextName, None)
+
+    @classmethod
+    def get(cls):
+        """
+        Returns the memo of the current context, `None` if not enabled
+        """
+        return ContextManager.get(cls._contextName, None)
+
+    @classmethod
+    def invalidate(cls):
+        cache = cls.get()
+        if cache:
+            cache.clear()
+
+    @classmethod
+    def notify(cls, event):
+        """
+        Invalidates the memo if `event` may change the result of an access check
+        """
+        if event in cls.INVALIDATING_EVENTS:
+            cls.invalidate()
+
+
+def memoizeAccess(method):
+    """
+    Decorator for access check methods whose result only depends on the
+    object, the (hashable) arguments and the access control data covered by
+    `AccessCache.INVALIDATING_EVENTS`
+    """
+    name = method.__name__
+
+    @wraps(method)
+    def _memoized(self, *args):
+        cache = AccessCache.get()
+        if cache is None:
+            return method(self, *args)
+        key = (name, self) + args
+        try:
+            return cache[key]
+        except KeyError:
+            pass
+        except TypeError:
+            # unhashable argument
+            return method(self, *args)
+        result = cache[key] = method(self, *args)
+        return result
+
+    return _memoized
@@ -26,11 +26,48 @@ from MaKaC.common.contextManager import ContextManager
 from indico.util.fs import silentremove
 from indico.util.redis import redis
 
-import hashlib, os, shutil, datetime, time
+import hashlib, os, shutil, datetime, time, threading
 import cPickle as pickle
 from itertools import izip
 
 
+_clients = {}
+_clientsLock = threading.Lock()
+
+
+def _getPooledClient(key, factory):
+    """
+    Returns the client identified by `key`, creating it using `factory` the
+    first time. Clients are shared by the whole process, so they need to be
+    thread-safe (StrictRedis uses a connection pool, memcache.Client keeps
+    its connections in a thread-local).
+    """
+    client = _clients.get(key)
+    if client is None:
+        with _clientsLock:
+            client = _clients.get(key)
+            if client is None:
+                client = _clients[key] = factory()
+    return client
+
+
+def getRedisClient(url):
+    """Returns the process-wide redis client for `url`"""
+    def _factory():
+        client = redis.StrictRedis.from_url(url)
+        client.connection_pool.connection_kwargs['socket_timeout'] = 1
+        return client
+    return _getPooledClient(('redis', url), _factory)
+
+
+def getMemcachedClient(servers):
+    """Returns the process-wide memcached client for `servers`"""
+    def _factory():
+        import memcache
+        return memcache.Client(servers)
+    return _getPooledClient(('memcached', tuple(servers)), _factory)
+
+
 class IndicoCache:
     """
     Used to cache some pages in Indico
@@ -199,8 +236,7 @@ class MemcachedCacheStorage(CacheStorage):
         super(MemcachedCacheStorage, self).__init__(cache)
 
     def _connect(self):
-        import memcache
-        return memcache.Client(Config.getInstance().getMemcachedServers())
+        return getMemcachedClient(Config.getInstance().getMemcachedServers())
 
     def _makeKey(self, path, name):
         return hashlib.sha256(os.path.join(self._name, path, name)).hexdigest()
@@ -224,9 +260,7 @@ class RedisCacheStorage(CacheStorage):
         super(RedisCacheStorage, self).__init__(cache)
 
     def _connect(self):
-        client = redis.StrictRedis.from_url(Config.getInstance().getRedisCacheURL())
-        client.connection_pool.connection_kwargs['socket_timeout'] = 1
-        return client
+        return getRedisClient(Config.getInstance().getRedisCacheURL())
 
     def _makeKey(self, path, name):
         return 'cache/ml/' + os.path.join(self._name, path, name)
@@ -403,6 +437,15 @@ class NullCacheClient(CacheClient):
     def delete(self, key):
         pass
 
+    def set_multi(self, mapping, ttl=0):
+        pass
+
+    def get_multi(self, keys):
+        return {}
+
+    def delete_multi(self, keys):
+        pass
+
 
 class RedisCacheClient(CacheClient):
     """Redis-based cache client with a simple API"""
@@ -410,8 +453,7 @@ class RedisCacheClient(CacheClient):
     key_prefix = 'cache/gen/'
 
     def __init__(self, url):
-        self._client = redis.StrictRedis.from_url(url)
-        self._client.connection_pool.connection_kwargs['socket_timeout'] = 1
+        self._client = getRedisClient(url)
 
     def _unpickle(self, val):
         if val is None:
@@ -424,20 +466,30 @@ class RedisCacheClient(CacheClient):
 
     def set_multi(self, mapping, ttl=0):
         try:
-            self._client.mset(dict((k, pickle.dumps(v)) for k, v in mapping.iteritems()))
-            if ttl:
-                for key in mapping:
-                    self._client.expire(key, ttl)
+            # a single round trip, setting the expiry together with the value
+            pipe = self._client.pipeline(transaction=False)
+            for key, val in mapping.iteritems():
+                if ttl:
+                    pipe.setex(key, ttl, pickle.dumps(val))
+                else:
+                    pipe.set(key, pickle.dumps(val))
+            pipe.execute()
         except redis.RedisError:
             Logger.get('redisCache').exception('set_multi failed')
 
     def get_multi(self, keys):
+        if not keys:
+            return {}
         try:
-            return dict(zip(keys, map(self._unpickle, self._client.mget(keys))))
+            return dict((key, self._unpickle(val)) for key, val in izip(keys, self._client.mget(keys))
+                        if val is not None)
         except redis.RedisError:
             Logger.get('redisCache').exception('get_multi failed')
+            return {}
 
     def delete_multi(self, keys):
+        if not keys:
+            return
         try:
             self._client.delete(*keys)
         except redis.RedisError:
@@ -473,7 +525,7 @@ class FileCacheClient(CacheClient):
     def __init__(self, dir):
         self._dir = os.path.join(dir, 'generic_cache')
 
-    def _getFilePath(self, key, mkdir=True):
+    def _splitKey(self, key):
         # We assume keys have a 'namespace.hashedKey' format
         parts = key.split('.', 1)
         if len(parts) == 1:
@@ -481,14 +533,37 @@ class FileCacheClient(CacheClient):
             filename = parts[0]
         else:
             namespace, filename = parts
-        dir = os.path.join(self._dir, namespace, filename[:4], filename[:8])
+        return os.path.join(self._dir, namespace, filename[:4], filename[:8]), filename
+
+    def _getFilePath(self, key, mkdir=True):
+        dir, filename = self._splitKey(key)
         if mkdir and not os.path.exists(dir):
             os.makedirs(dir)
         return os.path.join(dir, filename)
 
+    def _groupByDir(self, keys):
+        """
+        Returns a dict mapping each cache directory to a list of
+        ``(key, filename)`` tuples for the given keys
+        """
+        dirs = {}
+        for key in keys:
+            dir, filename = self._splitKey(key)
+            dirs.setdefault(dir, []).append((key, filename))
+        return dirs
+
+    def _listDir(self, dir):
+        try:
+            return set(os.listdir(dir))
+        except OSError:
+            return set()
+
     def set(self, key, val, ttl=0):
+        return self._write(self._getFilePath(key), val, ttl)
+
+    def _write(self, path, val, ttl):
         try:
-            f = open(self._getFilePath(key), 'wb')
+            f = open(path, 'wb')
             OSSpecific.lockFile(f, 'LOCK_EX')
             try:
                 expiry = int(time.time()) + ttl if ttl else None
@@ -503,11 +578,13 @@ class FileCacheClient(CacheClient):
         return 1
 
     def get(self, key):
-        try:
-            path = self._getFilePath(key)
-            if not os.path.exists(path):
-                return None
+        path = self._getFilePath(key, False)
+        if not os.path.exists(path):
+            return None
+        return self._read(path)
 
+    def _read(self, path):
+        try:
             f = open(path, 'rb')
             OSSpecific.lockFile(f, 'LOCK_SH')
             expiry = val = None
@@ -533,6 +610,32 @@ class FileCacheClient(CacheClient):
             silentremove(path)
         return 1
 
+    def set_multi(self, mapping, ttl=0):
+        for dir, entries in self._groupByDir(mapping).iteritems():
+            if not os.path.exists(dir):
+                os.makedirs(dir)
+            for key, filename in entries:
+                self._write(os.path.join(dir, filename), mapping[key], ttl)
+
+    def get_multi(self, keys):
+        # list every directory once instead of checking each file
+        values = {}
+        for dir, entries in self._groupByDir(keys).iteritems():
+            existing = self._listDir(dir)
+            for key, filename in entries:
+                if filename in existing:
+                    val = self._read(os.path.join(dir, filename))
+                    if val is not None:
+                        values[key] = val
+        return values
+
+    def delete_multi(self, keys):
+        for dir, entries in self._groupByDir(keys).iteritems():
+            existing = self._listDir(dir)
+            for key, filename in entries:
+                if filename in existing:
+                    silentremove(os.path.join(dir, filename))
+
 
 class GenericCache(object):
     def __init__(self, namespace):
@@ -555,8 +658,7 @@ class GenericCache(object):
         # If not, create a new one
         backend = Config.getInstance().getCacheBackend()
         if backend == 'memcached':
-            import memcache
-            self._client = memcache.Client(Config.getInstance().getMemcachedServers())
+            self._client = getMemcachedClient(Config.getInstance().getMemcachedServers())
         elif backend == 'redis':
             self._client = RedisCacheClient(Config.getInstance().getRedisCacheURL())
         elif backend == 'files':
@@ -22,10 +22,12 @@
 """
 from persistent import Persistent
 from BTrees.IOBTree import IOBTree
-from BTrees.OOBTree import OOBTree, OOSet
+from BTrees.OOBTree import OOBTree, OOSet, OOTreeSet, intersection
+from BTrees.Length import Length
 from MaKaC.common.ObjectHolders import ObjectHolder
 from MaKaC.common.timezoneUtils import date2utctimestamp, datetimeToUnixTime
 from MaKaC.errors import MaKaCError
+from MaKaC.rb_tools import trigrams, PostingLists
 from datetime import datetime, timedelta
 from pytz import timezone
 from MaKaC.common.logger import Logger
@@ -110,21 +112,21 @@ class Index(Persistent):
                 if key.lower() == lowerCaseValue and len(self._words[key]) != 0:
                     if '' in self._words[key]:
                         self._words[key].remove('')
-                    result = result + self._words[key]
+                    result.extend(self._words[key])
             return result
         elif exact == 0 and cs == 1:
             for key in self._words.keys():
                 if key.find(value) != -1 and len(self._words[key]) != 0:
                     if '' in self._words[key]:
                         self._words[key].remove('')
-                    result = result + self._words[key]
+                    result.extend(self._words[key])
             return result
         else:
             for key in self._words.keys():
                 if key.lower().find(lowerCaseValue) != -1 and len(self._words[key]) != 0:
                     if '' in self._words[key]:
                         self._words[key].remove('')
-                    result = result + self._words[key]
+                    result.extend(self._words[key])
             return result
         return None
 
@@ -137,7 +139,195 @@ class Index(Persistent):
     def notifyModification(self):
         self._p_changed=1
 
-class EmailIndex( Index ):
+class BTreeIndex(Index):
+    """
+    Index storing its words in an OOBTree of OOTreeSets, so that indexing an
+    item only modifies the buckets of the affected word instead of the whole
+    word dictionary.
+
+    Instances created with the old storage (a dict of lists in `_words`)
+    keep working as plain `Index` objects until `convertStorage` is called,
+    which makes it possible to migrate them while Indico is running.
+    """
+
+    def __init__(self, name=''):
+        Index.__init__(self, name)
+        self._words = OOBTree()
+        self._length = Length(0)
+
+    def _isLegacy(self):
+        return isinstance(self._words, dict)
+
+    def convertStorage(self):
+        """
+        Moves the words of an index using the old storage to the OOBTree.
+        Returns False if there was nothing to convert.
+        """
+        if not self._isLegacy():
+            return False
+        words = OOBTree()
+        for word, items in self._words.iteritems():
+            items = [item for item in items if item != '']
+            if word != '' and items:
+                words[word] = OOTreeSet(items)
+        self._words = words
+        self._length = Length(len(words))
+        return True
+
+    def getLength(self):
+        if self._isLegacy():
+            return Index.getLength(self)
+        return self._length()
+
+    def getKeys(self):
+        return list(self._words.keys())
+
+    def _addItem(self, value, item):
+        if self._isLegacy():
+            return Index._addItem(self, value, item)
+        if value != "":
+            items = self._words.get(value)
+            if items is None:
+                items = self._words[value] = OOTreeSet()
+                self._length.change(1)
+            items.insert(item)
+
+    def _withdrawItem(self, value, item):
+        if self._isLegacy():
+            return Index._withdrawItem(self, value, item)
+        items = self._words.get(value)
+        if items is not None and item in items:
+            items.remove(item)
+            if not items:
+                del self._words[value]
+                self._length.change(-1)
+
+    def _match(self, value, cs=1, exact=1):
+        if self._isLegacy():
+            return Index._match(self, value, cs, exact)
+        if exact == 1 and cs == 1:
+            items = self._words.get(value)
+            return list(items) if items else None
+
+        result = []
+        lowerCaseValue = value.lower()
+        for key, items in self._words.iteritems():
+            if cs == 1:
+                matched = key.find(value) != -1
+            elif exact == 1:
+                matched = key.lower() == lowerCaseValue
+            else:
+                matched = key.lower().find(lowerCaseValue) != -1
+            if matched:
+                result.extend(items)
+        return result
+
+
+_wordPostings = PostingLists(OOTreeSet, intersection)
+
+
+class SearchableIndex(BTreeIndex):
+    """
+    Index which also keeps its words case-folded and split into trigrams, so
+    that case-insensitive and substring matches do not have to look at every
+    single word in the index.
+
+    Indexes created before this class existed lack these structures until
+    `buildSearchIndex` is called (see bin/maintenance/indexes/
+    rebuildsearchindexes.py) and fall back to scanning all words.
+
+    Attributes:
+        _foldedWords - (OOBTree) case-folded word -> OOTreeSet of the indexed
+            words with this case-folded form
+        _trigrams - (OOBTree) trigram -> OOTreeSet of the case-folded words
+            containing it
+    """
+
+    def __init__(self, name=''):
+        BTreeIndex.__init__(self, name)
+        self._initSearchIndex()
+
+    def _initSearchIndex(self):
+        self._foldedWords = OOBTree()
+        self._trigrams = OOBTree()
+
+    def hasSearchIndex(self):
+        return getattr(self, '_trigrams', None) is not None
+
+    def buildSearchIndex(self):
+        """(Re)builds the case-folded and trigram structures from scratch"""
+        self._initSearchIndex()
+        for word, items in self._words.iteritems():
+            if items:
+                self._indexWord(word)
+
+    def _indexWord(self, word):
+        folded = word.lower()
+        words = self._foldedWords.get(folded)
+        if words is None:
+            words = self._foldedWords[folded] = OOTreeSet()
+            for trigram in trigrams(folded):
+                _wordPostings.insert(self._trigrams, trigram, folded)
+        words.insert(word)
+
+    def _unindexWord(self, word):
+        folded = word.lower()
+        words = self._foldedWords.get(folded)
+        if words is None or word not in words:
+            return
+        words.remove(word)
+        if words:
+            return
+        del self._foldedWords[folded]
+        for trigram in trigrams(folded):
+            _wordPostings.remove(self._trigrams, trigram, folded)
+
+    def convertStorage(self):
+        if not BTreeIndex.convertStorage(self):
+            return False
+        self.buildSearchIndex()
+        return True
+
+    def _addItem(self, value, item):
+        BTreeIndex._addItem(self, value, item)
+        if value != "" and self.hasSearchIndex():
+            self._indexWord(value)
+
+    def _withdrawItem(self, value, item):
+        BTreeIndex._withdrawItem(self, value, item)
+        if self.hasSearchIndex() and not self._words.get(value):
+            self._unindexWord(value)
+
+    def _findFoldedWords(self, folded):
+        """Returns the case-folded words which contain `folded`"""
+        candidates = _wordPostings.findSubstring(self._trigrams, folded)
+        if candidates is None:
+            # too short to use the trigrams
+            return [word for word in self._foldedWords.iterkeys() if folded in word]
+        # containing all trigrams does not necessarily mean containing the string
+        return [word for word in candidates if folded in word]
+
+    def _match(self, value, cs=1, exact=1):
+        if (exact == 1 and cs == 1) or not self.hasSearchIndex():
+            return BTreeIndex._match(self, value, cs, exact)
+
+        folded = value.lower()
+        if exact == 1:
+            words = self._foldedWords.get(folded, ())
+        else:
+            words = []
+            for foldedWord in self._findFoldedWords(folded):
+                words.extend(self._foldedWords[foldedWord])
+            if cs == 1:
+                words = [word for word in words if word.find(value) != -1]
+
+        result = []
+        for word in words:
+            result.extend(item for item in self._words.get(word, ()) if item != '')
+        return result
+
+
+class EmailIndex( SearchableIndex ):
     _name = "email"
 
     def indexUser( self, user ):
@@ -156,7 +346,7 @@ class EmailIndex( Index ):
         """this match is an approximative case insensitive match"""
         return self._match(email,cs,exact)
 
-class NameIndex( Index ):
+class NameIndex( SearchableIndex ):
     _name = "name"
 
     def indexUser( self, user ):
@@ -171,7 +361,7 @@ class NameIndex( Index ):
         """this match is an approximative case insensitive match"""
         return self._match(name,cs,exact)
 
-class SurNameIndex( Index ):
+class SurNameIndex( SearchableIndex ):
     _name = "surName"
 
     def indexUser( self, user ):
@@ -186,7 +376,7 @@ class SurNameIndex( Index ):
         """this match is an approximative case insensitive match"""
         return self._match(surName,cs,exact)
 
-class OrganisationIndex( Index ):
+class OrganisationIndex( SearchableIndex ):
     _name = "organisation"
 
     def indexUser( self, user ):
@@ -201,11 +391,11 @@ class OrganisationIndex( Index ):
         """this match is an approximative case insensitive match"""
         return self._match(org,cs,exact)
 
-class StatusIndex( Index ):
+class StatusIndex( BTreeIndex ):
     _name = "status"
 
     def __init__( self ):
-        Index.__init__( self )
+        BTreeIndex.__init__( self )
         from MaKaC.user import AvatarHolder
         ah = AvatarHolder()
         for av in ah.getList():
@@ -223,7 +413,7 @@ class StatusIndex( Index ):
         """this match is an approximative case insensitive match"""
         return self._match(status,cs,exact)
 
-class GroupIndex( Index ):
+class GroupIndex( SearchableIndex ):
     _name = "group"
 
     def indexGroup( self, group ):
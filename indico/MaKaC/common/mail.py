@@ -17,7 +17,14 @@
 ## You should have received a copy of the GNU General Public License
 ## along with Indico;if not, see <http://www.gnu.org/licenses/>.
 
+import errno
+import os
 import smtplib
+import socket
+import tempfile
+import time
+import uuid
+import cPickle
 from email.utils import formatdate
 
 from MaKaC.common import Config
@@ -40,8 +47,10 @@ class GenericMailer:
         mailData = cls._prepare(notification)
 
         if mailData:
-            if skipQueue or not rh:
+            if skipQueue:
                 cls._send(mailData)
+            elif not rh:
+                cls._enqueue(mailData)
             else:
                 ContextManager.setdefault('emailQueue', []).append(mailData)
 
@@ -51,9 +60,9 @@ class GenericMailer:
         if not queue:
             return
         if send:
-            # send all emails
+            # send all emails (or hand them over to the outbox)
             for mail in queue:
-                cls._send(mail)
+                cls._enqueue(mail)
         # clear the queue no matter if emails were sent or not
         del queue[:]
 
@@ -98,29 +107,61 @@ class GenericMailer:
             'to': to
         }
 
+    @classmethod
+    def _enqueue(cls, msgData):
+        """Stores an email in the outbox, or sends it right away if there is none"""
+        from indico.util.redis import RedisError
+        outbox = getOutbox()
+        if outbox is not None:
+            try:
+                outbox.add(msgData)
+            except (RedisError, IOError, OSError):
+                Logger.get('mail').exception('Could not store mail in the outbox, sending it directly')
+            else:
+                Logger.get('mail').info('Mail to %s queued in the outbox' % msgData['to'])
+                return
+        cls._send(msgData)
+
     @staticmethod
-    def _send(msgData):
+    def _connect():
+        """Opens a connection to the SMTP server, authenticating if needed"""
         server=smtplib.SMTP(*Config.getInstance().getSmtpServer())
-        if Config.getInstance().getSmtpUseTLS():
-            server.ehlo()
-            (code, errormsg) = server.starttls()
-            if code != 220:
-                raise MaKaCError( _("Can't start secure connection to SMTP server: %d, %s")%(code, errormsg))
-        if Config.getInstance().getSmtpLogin():
-            login = Config.getInstance().getSmtpLogin()
-            password = Config.getInstance().getSmtpPassword()
-            (code, errormsg) = server.login(login, password)
-            if code != 235:
-                raise MaKaCError( _("Can't login on SMTP server: %d, %s")%(code, errormsg))
+        try:
+            if Config.getInstance().getSmtpUseTLS():
+                server.ehlo()
+                (code, errormsg) = server.starttls()
+                if code != 220:
+                    raise MaKaCError( _("Can't start secure connection to SMTP server: %d, %s")%(code, errormsg))
+            if Config.getInstance().getSmtpLogin():
+                login = Config.getInstance().getSmtpLogin()
+                password = Config.getInstance().getSmtpPassword()
+                (code, errormsg) = server.login(login, password)
+                if code != 235:
+                    raise MaKaCError( _("Can't login on SMTP server: %d, %s")%(code, errormsg))
+        except:
+            server.close()
+            raise
+        return server
+
+    @staticmethod
+    def _sendMessage(server, msgData):
+        """Sends an email over an already open connection"""
+        Logger.get('mail').info("Mailing %s  CC: %s" % (msgData['toList'], msgData['ccList']))
+        refused = server.sendmail(msgData['fromAddr'], msgData['toList'] + msgData['ccList'] + msgData['bccList'],
+                                  msgData['msg'])
+        if refused:
+            Logger.get('mail').warning('Recipients refused by the SMTP server: %s' % refused)
+        Logger.get('mail').info('Mail sent to %s' % msgData['to'])
 
+    @classmethod
+    def _send(cls, msgData):
+        server = cls._connect()
         try:
-            Logger.get('mail').info("Mailing %s  CC: %s" % (msgData['toList'], msgData['ccList']))
-            server.sendmail(msgData['fromAddr'], msgData['toList'] + msgData['ccList'] + msgData['bccList'], msgData['msg'])
+            cls._sendMessage(server, msgData)
         except smtplib.SMTPRecipientsRefused,e:
-            server.quit()
             raise MaKaCError("Email address is not valid: %s" % e.recipients)
-        server.quit()
-        Logger.get('mail').info('Mail sent to %s' % msgData['to'])
+        finally:
+            server.quit()
 
     @classmethod
     def _log(cls, data):
@@ -137,3 +178,211 @@ class GenericMailer:
             'body': notification.getBody()
         }
         conference.getLogHandler().logEmail(logData, module, user)
+
+
+class SMTPSession(object):
+    """
+    An SMTP connection which is kept open to send several emails.
+
+    The connection is only opened when the first email is sent and it is
+    re-established once if the server closed it in the meantime.
+    """
+
+    def __init__(self):
+        self._server = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def open(self):
+        if self._server is None:
+            self._server = GenericMailer._connect()
+        return self._server
+
+    def send(self, msgData):
+        if self._server is not None:
+            try:
+                GenericMailer._sendMessage(self._server, msgData)
+                return
+            except smtplib.SMTPServerDisconnected:
+                # e.g. idle timeout or too many messages per connection
+                self._server = None
+        GenericMailer._sendMessage(self.open(), msgData)
+
+    def close(self):
+        if self._server is None:
+            return
+        try:
+            self._server.quit()
+        except (smtplib.SMTPException, socket.error):
+            self._server.close()
+        self._server = None
+
+
+class MailOutbox(object):
+    """
+    Durable queue of the emails waiting to be sent by the `MailOutboxTask`.
+
+    Emails are identified by an opaque id and only returned by `getDue` once
+    the time they are scheduled for has been reached.
+    """
+
+    def add(self, msgData, due=None):
+        raise NotImplementedError
+
+    def getDue(self, limit, now=None):
+        """Returns up to `limit` ``(id, msgData)`` tuples, oldest first"""
+        raise NotImplementedError
+
+    def remove(self, mailId):
+        raise NotImplementedError
+
+    def defer(self, mailId, msgData, due):
+        """Stores the (updated) email again to be sent at the `due` timestamp"""
+        raise NotImplementedError
+
+
+class RedisMailOutbox(MailOutbox):
+    """
+    Outbox stored in redis: a sorted set of ids scored by the time they are
+    due and a hash containing the emails.
+    """
+
+    _queueKey = 'mail-outbox:queue'
+    _messagesKey = 'mail-outbox:messages'
+
+    def __init__(self, client):
+        self._client = client
+
+    def add(self, msgData, due=None):
+        mailId = uuid.uuid4().hex
+        self._store(mailId, msgData, due)
+        return mailId
+
+    def _store(self, mailId, msgData, due):
+        if due is None:
+            due = time.time()
+        with self._client.pipeline() as pipe:
+            pipe.hset(self._messagesKey, mailId, cPickle.dumps(msgData, 2))
+            pipe.zadd(self._queueKey, int(due), mailId)
+            pipe.execute()
+
+    def getDue(self, limit, now=None):
+        if now is None:
+            now = time.time()
+        ids = self._client.zrangebyscore(self._queueKey, '-inf', int(now), start=0, num=limit)
+        if not ids:
+            return []
+        res = []
+        for mailId, data in zip(ids, self._client.hmget(self._messagesKey, ids)):
+            if data is None:
+                # already sent and removed
+                self._client.zrem(self._queueKey, mailId)
+                continue
+            res.append((mailId, cPickle.loads(data)))
+        return res
+
+    def remove(self, mailId):
+        with self._client.pipeline() as pipe:
+            pipe.zrem(self._queueKey, mailId)
+            pipe.hdel(self._messagesKey, mailId)
+            pipe.execute()
+
+    def defer(self, mailId, msgData, due):
+        self._store(mailId, msgData, due)
+
+
+class SpoolMailOutbox(MailOutbox):
+    """
+    Outbox stored in a spool directory, one file per email. The file names
+    start with the time the email is due so a sorted listing gives the
+    sending order; files are written to a temporary name first and renamed
+    so a partially written email is never picked up.
+    """
+
+    _suffix = '.mail'
+
+    def __init__(self, path):
+        self._path = path
+
+    def _ensureDir(self):
+        try:
+            os.makedirs(self._path)
+        except OSError, e:
+            if e.errno != errno.EEXIST:
+                raise
+
+    def add(self, msgData, due=None):
+        if due is None:
+            due = time.time()
+        self._ensureDir()
+        mailId = '%010d-%s%s' % (int(due), uuid.uuid4().hex, self._suffix)
+        fd, tmpPath = tempfile.mkstemp(prefix='.', dir=self._path)
+        try:
+            f = os.fdopen(fd, 'wb')
+            try:
+                cPickle.dump(msgData, f, 2)
+                f.flush()
+                os.fsync(f.fileno())
+            finally:
+                f.close()
+            os.rename(tmpPath, os.path.join(self._path, mailId))
+        except:
+            os.unlink(tmpPath)
+            raise
+        return mailId
+
+    def getDue(self, limit, now=None):
+        if now is None:
+            now = time.time()
+        try:
+            names = os.listdir(self._path)
+        except OSError, e:
+            if e.errno == errno.ENOENT:
+                return []
+            raise
+        res = []
+        for name in sorted(names):
+            if len(res) >= limit:
+                break
+            due = name.split('-', 1)[0]
+            if not name.endswith(self._suffix) or not due.isdigit():
+                continue
+            if int(due) > now:
+                break
+            try:
+                f = open(os.path.join(self._path, name), 'rb')
+            except IOError, e:
+                if e.errno == errno.ENOENT:
+                    continue
+                raise
+            try:
+                res.append((name, cPickle.load(f)))
+            finally:
+                f.close()
+        return res
+
+    def remove(self, mailId):
+        try:
+            os.unlink(os.path.join(self._path, mailId))
+        except OSError, e:
+            if e.errno != errno.ENOENT:
+                raise
+
+    def defer(self, mailId, msgData, due):
+        self.add(msgData, due)
+        self.remove(mailId)
+
+
+def getOutbox():
+    """Returns the configured `MailOutbox`, or None if emails are sent directly"""
+    cfg = Config.getInstance()
+    if not cfg.getSmtpUseOutbox():
+        return None
+    if cfg.getRedisConnectionURL():
+        from indico.util.redis import client
+        return RedisMailOutbox(client)
+    return SpoolMailOutbox(cfg.getMailSpoolDir())
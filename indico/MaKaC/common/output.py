@@ -22,6 +22,7 @@ from pytz import timezone
 
 
 import string
+import threading
 from indico.util.json import dumps
 import StringIO
 
@@ -57,10 +58,37 @@ def stringToDate( str ):
 
 class XSLTransformer:
 
+    # compiled stylesheets, {path: (mtime, XSLT)}. lxml does not allow using
+    # an XSLT object in a thread other than the one which created it, so they
+    # are cached per thread.
+    _stylesheetCache = threading.local()
+
     def __init__(self, stylesheet):
         # instanciate stylesheet object
-        styledoc = etree.parse(stylesheet)
-        self.__style = etree.XSLT(styledoc)
+        if isinstance(stylesheet, basestring):
+            self.__style = self._getCompiledStylesheet(stylesheet)
+        else:
+            self.__style = etree.XSLT(etree.parse(stylesheet))
+
+    @classmethod
+    def _getCompiledStylesheet(cls, path):
+        """
+        Returns the compiled XSLT for the given file, compiling it only if it
+        has not been compiled yet or if the file has been modified since.
+        """
+        try:
+            cache = cls._stylesheetCache.styles
+        except AttributeError:
+            cache = cls._stylesheetCache.styles = {}
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            # let lxml fail with its usual error
+            return etree.XSLT(etree.parse(path))
+        entry = cache.get(path)
+        if entry is None or entry[0] != mtime:
+            entry = cache[path] = (mtime, etree.XSLT(etree.parse(path)))
+        return entry[1]
 
     def process (self, xml):
 
@@ -20,10 +20,28 @@
 from xml.sax import saxutils
 from MaKaC.common.utils import encodeUnicode
 
+
+# translation table replacing the characters which are not allowed in XML
+_cleanTable = "".join((" " if c < 0x20 and chr(c) not in "\t\r\n" else chr(c)) for c in range(256))
+
+
 class XMLGen:
+    """
+    Generates XML documents.
 
-    def __init__(self, init=True):
+    By default the document is kept in memory until `getXml` is called.  If a
+    `stream` (any object with a `write` method) is given, the generated XML is
+    written to it in chunks instead: whenever more than `bufferSize` pieces
+    have been buffered they are written once the current tag is closed.  With
+    `bufferSize=None` the buffer is only written when `flush` is called.
+    `popXml` allows consuming the document piece by piece, e.g. from a
+    generator.
+    """
+
+    def __init__(self, init=True, stream=None, bufferSize=1024):
         self.setSourceEncoding( "utf-8" )
+        self._stream = stream
+        self._bufferSize = bufferSize
         if init:
             self.initXml()
         else:
@@ -39,6 +57,21 @@ class XMLGen:
     def getXml(self):
         return "".join(self.xml)
 
+    def getXmlChunks(self):
+        """Returns the pieces of the XML document, without joining them"""
+        return self.xml
+
+    def popXml(self):
+        """Returns the XML generated since the last call and discards it"""
+        xml = "".join(self.xml)
+        del self.xml[:]
+        return xml
+
+    def flush(self):
+        """Writes the buffered XML to the stream"""
+        if self._stream is not None and self.xml:
+            self._stream.write(self.popXml())
+
     def escapeString(self,text):
         tmp = encodeUnicode(text, self._sourceEncoding)
         return saxutils.escape( tmp )
@@ -47,23 +80,25 @@ class XMLGen:
         #open an XML tag
         #listAttrib is the list of the attribute. each attribute must be set in a 2 elements list like [name,value]
         #the single parameter, when false, place a '\n\r' after the tag
-        LAtt = ""
-        for att in listAttrib:
-            LAtt= LAtt + ' ' + att[0] + '=' + saxutils.quoteattr(self.escapeString(att[1]))
-        for i in range(0,self.indent):
-            self.xml.append(" ")
+        if listAttrib:
+            LAtt = "".join([" %s=%s" % (att[0], saxutils.quoteattr(self.escapeString(att[1]))) for att in listAttrib])
+        else:
+            LAtt = ""
+        if self.indent:
+            self.xml.append(" " * self.indent)
         self.xml.append( "<" + name + LAtt + ">" )
         if not single:
-            self.xml.append( self.escapeString("\r\n") )
+            self.xml.append("\r\n")
         self.indent = self.indent+1
 
     def closeTag(self,name,single=False):
         #close an XML tag
         self.indent = self.indent-1
-        if not single:
-            for i in range(0,self.indent):
-                self.xml.append(" ")
+        if not single and self.indent:
+            self.xml.append(" " * self.indent)
         self.xml.append( "</" + name + ">\r\n")
+        if self._stream is not None and self._bufferSize is not None and len(self.xml) > self._bufferSize:
+            self.flush()
 
     def writeText(self,text, single=False):
         #add text to the response
@@ -72,7 +107,7 @@ class XMLGen:
             text = self.cleanText(text)
             self.xml.append( self.escapeString(text))
         if not single:
-            self.xml.append( self.escapeString("\r\n"))
+            self.xml.append("\r\n")
 
     def writeTag(self,name,value,ListAttrib=[]):
         #add a full tag
@@ -91,10 +126,4 @@ class XMLGen:
 
     def cleanText(self, text):
         # clean the text from illegal XML characters
-        cm = []
-        for c in range(256):
-            if c < 0x20 and chr(c) not in '\t\r\n':
-                cm.append(" ")
-            else:
-                cm.append(chr(c))
-        return str(text).translate("".join(cm))
+        return str(text).translate(_cleanTable)
@@ -71,7 +71,8 @@ from MaKaC.common import Config, DBMgr, utils
 from MaKaC.common.Counter import Counter
 from MaKaC.common.ObjectHolders import ObjectHolder
 from MaKaC.common.Locators import Locator
-from MaKaC.accessControl import AccessController, AdminList
+from MaKaC.common.accessCache import memoizeAccess
+from MaKaC.accessControl import AccessController, AccessSummary, AccessSummaryItems, AdminList
 from MaKaC.errors import MaKaCError, TimingError, ParentTimingError, EntryTimingError, NoReportError
 from MaKaC import registration,epayment
 from MaKaC.evaluation import Evaluation
@@ -279,6 +280,14 @@ class CommonObjectBase(CoreObject, Observable, Fossilizable):
         # return set containing whatever avatars/groups we may have collected
         return av_set
 
+    def invalidateAccessSummary(self, descendants=False):
+        """Marks the access summaries of the event/categories containing
+        this object as out of date (see `AccessSummary`)
+        """
+        owner = self.getOwner()
+        if owner is not None and hasattr(owner, 'invalidateAccessSummary'):
+            owner.invalidateAccessSummary()
+
 
 class CategoryManager( ObjectHolder ):
     idxName = "categories"
@@ -1057,6 +1066,9 @@ class Category(CommonObjectBase):
         newSc.setOwner( self )
         self.subcategories[ newSc.getId() ] = newSc
         self._incNumConfs(newSc.getNumConferences())
+        self._addAccessSummaryChild(newSc)
+        # the sub-category may now inherit a different protection
+        newSc.invalidateAccessSummary(True)
         self.cleanCache()
 
     def _removeSubCategory( self, sc ):
@@ -1068,6 +1080,7 @@ class Category(CommonObjectBase):
             self._decNumConfs(sc.getNumConferences())
             del self.subcategories[ sc.getId() ]
             sc.setOwner( None )
+            self._removeAccessSummaryChild(sc)
             self.cleanCache()
 
     def newSubCategory(self, protection):
@@ -1111,6 +1124,7 @@ class Category(CommonObjectBase):
         newConf.addOwner(self)
         self._incNumConfs(1)
         self.indexConf(newConf)
+        self._addAccessSummaryChild(newConf)
         self.cleanCache()
 
     def getAccessKey(self):
@@ -1152,6 +1166,7 @@ class Category(CommonObjectBase):
             conf.delete()
         conf.removeOwner( self, notify )
         self._decNumConfs(1)
+        self._removeAccessSummaryChild(conf)
         self.cleanCache()
 
     def getSubCategoryList( self ):
@@ -1365,6 +1380,7 @@ class Category(CommonObjectBase):
     def isItselfProtected( self ):
         return self.__ac.isItselfProtected()
 
+    @memoizeAccess
     def hasAnyProtection( self ):
         if self.__ac.isProtected() or len(self.getDomainList())>0:
             return True
@@ -1388,6 +1404,7 @@ class Category(CommonObjectBase):
     def hasProtectedOwner( self ):
         return self.__ac._getFatherProtection()
 
+    @memoizeAccess
     def isAllowedToAccess( self, av ):
         """Says whether an avatar can access a category independently of it is
             or not protected or domain filtered
@@ -1400,14 +1417,139 @@ class Category(CommonObjectBase):
     def canView(self,aw):
         if self.canAccess( aw ):
             return True
-        for conf in self.getConferenceList():
-            if conf.canView( aw ):
-                return True
-        for subcateg in self.getSubCategoryList():
-            if subcateg.canView( aw ):
+        # instead of looking for something visible below, ask the summary
+        summary = self.getAccessSummary()
+        if summary.isPublic() or summary.containsUser( aw.getUser() ):
+            return True
+        if summary.hasConferences() and self.__ac.isHarvesterIP( aw.getIP() ):
+            return True
+        # plugin admins may access any event (and its parts)
+        if summary.hasConferences() and \
+               (any(self._notify("isPluginTypeAdmin", {"user": aw.getUser()})) or \
+                any(self._notify("isPluginAdmin", {"user": aw.getUser(), "plugins": "any"}))):
+            return True
+        for obj in summary.getResidualList():
+            if isinstance(obj, Category):
+                if obj.canAccess( aw ):
+                    return True
+            elif obj.canView( aw ):
                 return True
         return False
 
+    def getAccessSummary( self ):
+        """Returns the `AccessSummary` of the category and everything below
+            it, updating it if it is out of date
+        """
+        summary = AccessSummary.getFrom(self)
+        if summary is None:
+            summary = self._accessSummary = AccessSummary()
+        if summary.isDirty():
+            self._updateAccessSummary( summary )
+        return summary
+
+    def _getAccessSummaryItems( self ):
+        items = AccessSummaryItems()
+        if not self.hasAnyProtection():
+            items.setPublic()
+            return items
+        items.addPrincipals(self.getAllowedToAccessList())
+        items.addPrincipals(self.getManagerList())
+        items.addPrincipals(self.getConferenceCreatorList())
+        if not self.isProtected():
+            # only restricted by domain
+            items.addResidual(self)
+        return items
+
+    def _updateAccessSummary( self, summary ):
+        if summary.needsRebuild():
+            children = []
+            if self.hasAnyProtection():
+                # the events may inherit a different protection; the changes
+                # of the children are not merged until the summary is valid
+                children = [conf.getAccessSummary(True) for conf in self.conferences]
+                children += [categ.getAccessSummary() for categ in self.subcategories.itervalues()]
+            summary.popDirtyChildren()
+            added, removed = summary.rebuild(self._getAccessSummaryItems(), children)
+            self._mergeOwnerAccessSummary(added, removed)
+        else:
+            if summary.hasDirtyItems():
+                added, removed = summary.setOwnItems(self._getAccessSummaryItems())
+                self._mergeOwnerAccessSummary(added, removed)
+            # they merge their changes into this summary
+            for child in summary.popDirtyChildren():
+                child.getAccessSummary()
+        summary.validate()
+
+    def _mergeOwnerAccessSummary( self, added, removed ):
+        if self.getOwner() is not None:
+            self.getOwner()._mergeAccessSummary(added, removed)
+
+    def _mergeAccessSummary( self, added, removed ):
+        """Merges the entries added to and removed from the summary of an
+            event or sub-category into the summary of the category, and
+            those above it
+        """
+        if not added and not removed:
+            return
+        summary = AccessSummary.getFrom(self)
+        if summary is None or summary.needsRebuild() or not self.hasAnyProtection():
+            # it will be computed again, or does not depend on its children
+            return
+        added, removed = summary.merge(added, removed)
+        self._mergeOwnerAccessSummary(added, removed)
+
+    def _addAccessSummaryChild( self, child ):
+        summary = AccessSummary.getFrom(child)
+        if summary is not None:
+            # it may inherit a different protection here
+            summary.invalidate(True)
+            self._mergeAccessSummary(list(summary.iteritems()), [])
+        self._invalidateAccessSummaryChild( child )
+
+    def _removeAccessSummaryChild( self, child ):
+        summary = AccessSummary.getFrom(child)
+        if summary is not None:
+            self._mergeAccessSummary([], [key for key, obj in summary.iteritems()])
+        summary = AccessSummary.getFrom(self)
+        if summary is not None:
+            summary.discardChild(child)
+
+    def invalidateAccessSummary( self, descendants=False ):
+        """Marks the entries the category contributes to its access summary
+            as out of date, or with `descendants` (the protection changed)
+            the whole summary, as well as the ones of the sub-categories,
+            which inherit the protection.
+           The summaries above only need to know about it if the summary was
+            valid, since they update their dirty children before being used.
+        """
+        if descendants:
+            for categ in self.subcategories.itervalues():
+                categ._invalidateSubCategoryAccessSummaries()
+        summary = AccessSummary.getFrom(self)
+        if summary is None:
+            return
+        wasDirty = summary.isDirty()
+        summary.invalidate(descendants)
+        if not wasDirty and self.getOwner() is not None:
+            self.getOwner()._invalidateAccessSummaryChild( self )
+
+    def _invalidateAccessSummaryChild( self, child ):
+        summary = AccessSummary.getFrom(self)
+        if summary is None or not self.hasAnyProtection():
+            # the ancestors only know that it is public
+            return
+        wasDirty = summary.isDirty()
+        summary.invalidateChild(child)
+        if not wasDirty and self.getOwner() is not None:
+            self.getOwner()._invalidateAccessSummaryChild( self )
+
+    def _invalidateSubCategoryAccessSummaries( self ):
+        summary = AccessSummary.getFrom(self)
+        if summary is not None:
+            summary.invalidate(True)
+        for categ in self.subcategories.itervalues():
+            categ._invalidateSubCategoryAccessSummaries()
+
     def canAccess( self, aw ):
         if not self.hasAnyProtection():
             return True
@@ -1444,6 +1586,7 @@ class Category(CommonObjectBase):
             if isinstance(prin, MaKaC.user.Avatar):
                 prin.linkTo(self, "creator")
             self._p_changed = 1
+            self.invalidateAccessSummary()
 
     def revokeConferenceCreation( self, prin ):
         if prin in self.__confCreators:
@@ -1451,6 +1594,7 @@ class Category(CommonObjectBase):
             if isinstance(prin, MaKaC.user.Avatar):
                 prin.unlinkTo(self, "creator")
             self._p_changed = 1
+            self.invalidateAccessSummary()
 
     def getConferenceCreatorList( self ):
         return self.__confCreators
@@ -2644,6 +2788,7 @@ class Conference(CommonObjectBase, Locatable):
             self.__creator.unlinkTo(self, "creator")
         creator.linkTo(self, "creator")
         self.__creator = creator
+        self.invalidateAccessSummary()
 
     def linkCreator(self):
         self.__creator.linkTo(self, "creator")
@@ -3348,6 +3493,7 @@ class Conference(CommonObjectBase, Locatable):
         """sets the access key of the conference"""
         self._accessKey = accessKey
         self.notifyModification()
+        self.invalidateAccessSummary()
 
     def getAccessKey(self):
         try:
@@ -3360,6 +3506,7 @@ class Conference(CommonObjectBase, Locatable):
         """sets the modification key of the conference"""
         self._modifKey = modifKey
         self.notifyModification()
+        self.invalidateAccessSummary()
 
     def getModifKey(self):
         try:
@@ -3402,6 +3549,7 @@ class Conference(CommonObjectBase, Locatable):
         for sc in newSession.getCoordinatorList():
             self.addSessionCoordinator(newSession,sc)
         self.notifyModification()
+        self.invalidateAccessSummary()
 
     def hasSession(self,session):
         if session != None and session.getConference()==self and \
@@ -3422,6 +3570,7 @@ class Conference(CommonObjectBase, Locatable):
 
             session.delete()
             self.notifyModification()
+            self.invalidateAccessSummary()
 
     def recoverSession(self, session, check, isCancelled):
         self.addSession(session, check, session.getId())
@@ -3502,6 +3651,7 @@ class Conference(CommonObjectBase, Locatable):
 
         newContrib._notify('created', self)
         self.notifyModification()
+        self.invalidateAccessSummary()
 
     def hasContribution(self,contrib):
         return contrib.getConference()==self and \
@@ -3524,6 +3674,7 @@ class Conference(CommonObjectBase, Locatable):
         #else:
         #    contrib.unindex()
         self.notifyModification()
+        self.invalidateAccessSummary()
 
     def recoverContribution(self, contrib):
         self.addContribution(contrib, contrib.getId())
@@ -3610,6 +3761,7 @@ class Conference(CommonObjectBase, Locatable):
         newTrack.setConference( self )
         newTrack.setId( trackId )
         self.notifyModification()
+        self.invalidateAccessSummary()
 
     def removeTrack( self, track ):
         if track in self.program:
@@ -3617,6 +3769,7 @@ class Conference(CommonObjectBase, Locatable):
             if track in self.program:
                 self.program.remove( track )
             self.notifyModification()
+            self.invalidateAccessSummary()
 
     def recoverTrack(self, track):
         self.addTrack(track)
@@ -3733,6 +3886,7 @@ class Conference(CommonObjectBase, Locatable):
     def isItselfProtected( self ):
         return self.__ac.isItselfProtected()
 
+    @memoizeAccess
     def hasAnyProtection( self ):
         """Tells whether a conference has any kind of protection over it:
             access or domain protection.
@@ -3791,6 +3945,82 @@ class Conference(CommonObjectBase, Locatable):
                 return True
         return False
 
+    def getAccessSummary( self, update=False ):
+        """Returns the `AccessSummary` of the conference and its contents,
+            updating it if it is out of date (or `update` is True)
+        """
+        summary = AccessSummary.getFrom(self)
+        if summary is None:
+            summary = self._accessSummary = AccessSummary()
+        if update or summary.isDirty():
+            added, removed = summary.rebuild(self._getAccessSummaryItems(), [])
+            summary.validate()
+            for owner in self.getOwnerList():
+                owner._mergeAccessSummary(added, removed)
+        return summary
+
+    def _getAccessSummaryItems( self ):
+        items = AccessSummaryItems()
+        items.setHasConferences()
+        if not self.hasAnyProtection():
+            items.setPublic()
+            return items
+        elif not self.isProtected():
+            # only restricted by domain
+            items.addResidual(self)
+            return items
+        items.addPrincipals(self.getAllowedToAccessList())
+        items.addPrincipals(self.getManagerList())
+        items.addPrincipals([self.getCreator()])
+        for track in self.getTrackList():
+            items.addPrincipals(track.getCoordinatorList())
+        paperReview = self.getConfPaperReview()
+        items.addPrincipals(paperReview.getPaperReviewManagersList())
+        items.addPrincipals(paperReview.getRefereesList())
+        items.addPrincipals(paperReview.getEditorsList())
+        items.addPrincipals(paperReview.getReviewersList())
+        # the users the plugins allow to access the event (isAllowedToAccess)
+        for principals in self._notify("getAllowedToAccessList", {"conf": self}):
+            items.addPrincipals(principals or [])
+
+        # access keys and email grants depend on the session/user
+        ac = self.getAccessController()
+        residual = self.getAccessKey() or self.getModifKey() or \
+                   ac.getAccessEmail() or ac.getModificationEmail()
+
+        parts = [(session, session.getCoordinatorList()) \
+                 for session in self.getSessionList()]
+        parts += [(contrib, contrib.getSubmitterList()) \
+                  for contrib in self.getContributionList()]
+        for obj, principals in parts:
+            items.setHasParts()
+            ac = obj.getAccessController()
+            # public parts of a protected conference are only public if the IP
+            # is allowed, leave it to canView
+            if obj.getAccessProtectionLevel() == -1 or \
+                   ac.getAccessEmail() or ac.getModificationEmail():
+                residual = True
+            items.addPrincipals(obj.getAllowedToAccessList())
+            items.addPrincipals(obj.getManagerList())
+            items.addPrincipals(principals)
+
+        if residual:
+            items.addResidual(self)
+        return items
+
+    def invalidateAccessSummary( self, descendants=False ):
+        """Marks the access summary of the conference as out of date, and
+            lets the categories containing it know, unless it already was
+        """
+        summary = AccessSummary.getFrom(self)
+        if summary is None:
+            return
+        wasDirty = summary.isDirty()
+        summary.invalidate()
+        if not wasDirty:
+            for owner in self.getOwnerList():
+                owner._invalidateAccessSummaryChild( self )
+
     def isAllowedToAccess( self, av):
         """tells if a user has privileges to access the current conference
             (independently that it is protected or not)
@@ -4506,6 +4736,7 @@ class Conference(CommonObjectBase, Locatable):
             track.addCoordinator( av )
             self._trackCoordinators.indexCoordinator( av, track )
             self.notifyModification()
+            self.invalidateAccessSummary()
 
     def removeTrackCoordinator( self, track, av ):
         """Removes a user as coordinator for a track.
@@ -4520,6 +4751,7 @@ class Conference(CommonObjectBase, Locatable):
             track.removeCoordinator( av )
             self._trackCoordinators.unindexCoordinator( av, track )
             self.notifyModification()
+            self.invalidateAccessSummary()
 
     def _rebuildAuthorIndex(self):
         self._authorIdx=AuthorIndex()
@@ -4844,6 +5076,7 @@ class Conference(CommonObjectBase, Locatable):
         if self.sessions.has_key(session.getId()):
             session.addCoordinator(av)
             self._sessionCoordinators.index(av,session)
+            self.invalidateAccessSummary()
 
     def removeSessionCoordinator( self, session, av ):
         """Removes a user as coordinator for a session.
@@ -4856,6 +5089,7 @@ class Conference(CommonObjectBase, Locatable):
         if self.sessions.has_key(session.getId()):
             session.removeCoordinator( av )
             self._sessionCoordinators.unindex(av,session)
+            self.invalidateAccessSummary()
 
     def _getSubmitterIdx(self):
         try:
@@ -4866,9 +5100,11 @@ class Conference(CommonObjectBase, Locatable):
 
     def addContribSubmitter(self,contrib,av):
         self._getSubmitterIdx().index(av,contrib)
+        self.invalidateAccessSummary()
 
     def removeContribSubmitter(self,contrib,av):
         self._getSubmitterIdx().unindex(av,contrib)
+        self.invalidateAccessSummary()
 
     def getContribsForSubmitter(self,av):
         return self._getSubmitterIdx().getContributions(av)
@@ -9622,6 +9858,7 @@ class Contribution(CommonObjectBase, Locatable):
     def revokeAllSubmitters(self):
         self._submitters = []
         self.notifyModification(raiseEvent = False)
+        self.invalidateAccessSummary()
 
     def getSubmitterEmailList(self):
         try:
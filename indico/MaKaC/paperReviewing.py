@@ -579,7 +579,7 @@ class ConferencePaperReview(Persistent):
             newReferee.linkTo(self._conference, "referee")
             if not self._userCompetences.has_key(newReferee):
                 self._userCompetences[newReferee] = []
-            self.notifyModification()
+            self._notifyTeamModification()
             if self._enableRefereeEmailNotif == True:
                 notification = ConferenceReviewingNotification(newReferee, 'Referee', self._conference)
                 GenericMailer.sendAndLog(notification, self._conference,
@@ -600,7 +600,7 @@ class ConferencePaperReview(Persistent):
                     del(self._userCompetences[referee])
             self._refereesList.remove(referee)
             referee.unlinkTo(self._conference, "referee")
-            self.notifyModification()
+            self._notifyTeamModification()
             if self._enableRefereeEmailNotif == True:
                 notification = ConferenceReviewingRemoveNotification(referee, 'Referee', self._conference)
                 GenericMailer.sendAndLog(notification, self._conference,
@@ -666,7 +666,7 @@ class ConferencePaperReview(Persistent):
             newEditor.linkTo(self._conference, "editor")
             if not self._userCompetences.has_key(newEditor):
                 self._userCompetences[newEditor] = []
-            self.notifyModification()
+            self._notifyTeamModification()
             if self._enableEditorEmailNotif == True:
                 notification = ConferenceReviewingNotification(newEditor, 'Layout Reviewer', self._conference)
                 GenericMailer.sendAndLog(notification, self._conference,
@@ -686,7 +686,7 @@ class ConferencePaperReview(Persistent):
                     del(self._userCompetences[editor])
             self._editorsList.remove(editor)
             editor.unlinkTo(self._conference, "editor")
-            self.notifyModification()
+            self._notifyTeamModification()
             if self._enableEditorEmailNotif == True:
                 notification = ConferenceReviewingRemoveNotification(editor, 'Layout Reviewer', self._conference)
                 GenericMailer.sendAndLog(notification, self._conference,
@@ -752,7 +752,7 @@ class ConferencePaperReview(Persistent):
             newReviewer.linkTo(self._conference, "reviewer")
             if not self._userCompetences.has_key(newReviewer):
                 self._userCompetences[newReviewer] = []
-            self.notifyModification()
+            self._notifyTeamModification()
             if self._enableReviewerEmailNotif == True:
                 notification = ConferenceReviewingNotification(newReviewer, 'Content Reviewer', self._conference)
                 GenericMailer.sendAndLog(notification, self._conference,
@@ -772,7 +772,7 @@ class ConferencePaperReview(Persistent):
                     del(self._userCompetences[reviewer])
             self._reviewersList.remove(reviewer)
             reviewer.unlinkTo(self._conference, "reviewer")
-            self.notifyModification()
+            self._notifyTeamModification()
             if self._enableReviewerEmailNotif == True:
                 notification = ConferenceReviewingRemoveNotification(reviewer, 'Content Reviewer', self._conference)
                 GenericMailer.sendAndLog(notification, self._conference,
@@ -838,7 +838,7 @@ class ConferencePaperReview(Persistent):
             newPaperReviewManager.linkTo(self._conference, "paperReviewManager")
             if not self._userCompetences.has_key(newPaperReviewManager):
                 self._userCompetences[newPaperReviewManager] = []
-            self.notifyModification()
+            self._notifyTeamModification()
         if self._enablePRMEmailNotif == True:
             notification = ConferenceReviewingNotification(newPaperReviewManager, 'Paper Review Manager', self._conference)
             GenericMailer.sendAndLog(notification, self._conference,
@@ -858,7 +858,7 @@ class ConferencePaperReview(Persistent):
                     del(self._userCompetences[paperReviewManager])
             self._paperReviewManagersList.remove(paperReviewManager)
             paperReviewManager.unlinkTo(self._conference, "paperReviewManager")
-            self.notifyModification()
+            self._notifyTeamModification()
             if self._enablePRMEmailNotif == True:
                 notification = ConferenceReviewingRemoveNotification(paperReviewManager, 'Paper Review Manager', self._conference)
                 GenericMailer.sendAndLog(notification, self._conference,
@@ -1041,6 +1041,13 @@ class ConferencePaperReview(Persistent):
         """
         self._p_changed = 1
 
+    def _notifyTeamModification(self):
+        """ Same as notifyModification, for changes to the reviewing team,
+            which is part of the access summary of the conference
+        """
+        self.notifyModification()
+        self._conference.invalidateAccessSummary()
+
 
 
 class Template(Persistent):
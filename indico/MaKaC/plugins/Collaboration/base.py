@@ -604,12 +604,15 @@ class CSBookingManager(Persistent, Observer):
         #TODO: use .linkTo on the user. To be done when the list of roles of a user is actually needed for smth...
         self.getManagers().setdefault(plugin, []).append(user)
         self._notifyModification()
+        # they are allowed to access the event
+        self._conf.invalidateAccessSummary()
 
     def removePluginManager(self, plugin, user):
         #TODO: use .unlinkTo on the user. To be done when the list of roles of a user is actually needed for smth...
         if user in self.getManagers().setdefault(plugin,[]):
             self.getManagers()[plugin].remove(user)
             self._notifyModification()
+            self._conf.invalidateAccessSummary()
 
     def getVideoServicesManagers(self):
         return self.getManagers().setdefault('all', [])
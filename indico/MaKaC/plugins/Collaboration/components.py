@@ -405,6 +405,15 @@ class PluginRightsContributor(Component):
         return Catalog.getIdx("cs_bookingmanager_conference").get(params["conf"].getId()).isPluginManagerOfAnyPlugin(user) or \
             RCCollaborationAdmin.hasRights(user=user) or RCCollaborationPluginAdmin.hasRights(user=user, plugins ='any')
 
+    def getAllowedToAccessList(self, obj, params):
+        """ Returns the users which isAllowedToAccess grants access to the event
+            for its bookings (the admins are not event-specific)
+        """
+        csbm = Catalog.getIdx("cs_bookingmanager_conference").get(params["conf"].getId())
+        if csbm is None:
+            return []
+        return csbm.getAllManagers()
+
     def isPluginTypeAdmin(self, obj, params={}):
         """ Returns True if the user is a Server Admin or a Collaboration admin
             user: an Avatar object
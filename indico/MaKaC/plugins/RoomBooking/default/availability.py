@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+##
+##
+## This file is part of Indico.
+## Copyright (C) 2002 - 2013 European Organization for Nuclear Research (CERN).
+##
+## Indico is free software; you can redistribute it and/or
+## modify it under the terms of the GNU General Public License as
+## published by the Free Software Foundation; either version 3 of the
+## License, or (at your option) any later version.
+##
+## Indico is distributed in the hope that it will be useful, but
+## WITHOUT ANY WARRANTY; without even the implied warranty of
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+## General Public License for more details.
+##
+## You should have received a copy of the GNU General Public License
+## along with Indico;if not, see <http://www.gnu.org/licenses/>.
+
+from MaKaC.plugins.RoomBooking.default.factory import Factory
+
+
+class RoomAvailability(object):
+    """
+    Tells for many rooms at once whether they are free for a candidate
+    reservation and whether they are blocked during its period.
+
+    The reservations and blockings of the candidate's days are loaded only
+    once and turned into the set of busy rooms and a map of blocked rooms,
+    instead of querying the indexes (and splitting the reservations found
+    into periods) again for every single room.
+
+    For every room the answers are the same as the ones of
+    `room.isAvailable(resvEx)` and `resvEx.getBlockingConflictState(user)`.
+    """
+
+    def __init__(self, resvEx, user=None):
+        self._user = user
+        self._location = resvEx.locationName
+        # All the periods of a reservation (and of the candidate) share the
+        # same times, so two reservations collide if they have periods
+        # starting on the same day and their times overlap
+        self._startTime = resvEx.startDT.time()
+        self._endTime = resvEx.endDT.time()
+        days = set(period.startDT.date() for period in resvEx.splitToPeriods())
+        # Pre-bookings are only taken into account for pre-bookings
+        self._confirmedOnly = resvEx.isConfirmed is not None
+        self._busyRooms = self._findBusyRooms(days)
+        self._blockedRooms = self._findBlockedRooms(resvEx.startDT.date(), resvEx.endDT.date())
+
+    @staticmethod
+    def _roomKey(room):
+        return room.locationName, room.id
+
+    def _getDayReservationsIndex(self):
+        from MaKaC.plugins.RoomBooking.default.reservation import Reservation
+        return Reservation.getDayReservationsIndexRoot()
+
+    def _getBlockings(self, startDate, endDate):
+        return Factory.newRoomBlocking().getByDateSpan(startDate, endDate)
+
+    def _findBusyRooms(self, days):
+        dayIndex = self._getDayReservationsIndex()
+        busy = set()
+        for day in days:
+            for resv in dayIndex.get(day, ()):
+                # same conditions as the ones used by getCollisions
+                if resv.isRejected != False or resv.isCancelled != False:
+                    continue
+                if self._confirmedOnly and resv.isConfirmed != True:
+                    continue
+                if self._location is not None and resv.locationName != self._location:
+                    continue
+                if resv.repeatability is not None and resv.dayIsExcluded(day):
+                    continue
+                roomKey = self._roomKey(resv.room)
+                if roomKey in busy:
+                    continue
+                if resv.startDT.time() < self._endTime and self._startTime < resv.endDT.time():
+                    busy.add(roomKey)
+        return busy
+
+    def _findBlockedRooms(self, startDate, endDate):
+        blocked = {}
+        for block in self._getBlockings(startDate, endDate):
+            if block.startDate <= endDate and startDate <= block.endDate:
+                for blockedRoom in block.blockedRooms:
+                    blocked.setdefault(blockedRoom.roomGUID, []).append(blockedRoom)
+        return blocked
+
+    def isAvailable(self, room):
+        return self._roomKey(room) not in self._busyRooms
+
+    def getBlockingConflictState(self, room):
+        """
+        Returns the blocking conflict type (None, 'active', 'pending') of
+        the room, honoring the override permissions of the user.
+        """
+        res = None
+        for rbl in self._blockedRooms.get(str(room.guid), ()):
+            if rbl.block.canOverride(self._user, room):
+                continue
+            if rbl.active == True:
+                return 'active'
+            elif rbl.active is None:
+                res = 'pending'
+        return res
@@ -29,6 +29,8 @@ from MaKaC.rb_reservation import ReservationBase, RepeatabilityEnum
 from MaKaC.rb_tools import qbeMatch, containsExactly_OR_containsAny, fromUTC
 from MaKaC.rb_location import CrossLocationQueries
 from MaKaC.plugins.RoomBooking.default.factory import Factory
+from MaKaC.plugins.RoomBooking.default.reservationStats import ReservationStats
+from MaKaC.plugins.RoomBooking.default.reservationTextIndex import ReservationTextIndex
 from MaKaC.common.logger import Logger
 from MaKaC.common.info import HelperMaKaCInfo
 from MaKaC.plugins.base import Observable
@@ -52,6 +54,9 @@ class Reservation( Persistent, ReservationBase, Observable ):
 
     __dalManager = Factory.getDALManager()
 
+    # What the reservation contributes to the ReservationStats counters
+    _statsEntry = None
+
     def __init__( self ):
         ReservationBase.__init__( self )
         self._excludedDays = []
@@ -137,6 +142,9 @@ class Reservation( Persistent, ReservationBase, Observable ):
         # Update room+day => reservations index
         self._addToRoomDayReservationsIndex()
 
+        self._updateStats()
+        ReservationTextIndex.index(self)
+
         self._notify('reservationCreated')
 
         # Warning:
@@ -145,6 +153,9 @@ class Reservation( Persistent, ReservationBase, Observable ):
 
     def update(self):
         ReservationBase.update(self)
+        # Also called after cancel() and reject()
+        self._updateStats()
+        ReservationTextIndex.index(self)
         self._notify('reservationUpdated')
 
     def getStartEndNotification(self):
@@ -193,8 +204,19 @@ class Reservation( Persistent, ReservationBase, Observable ):
         # Update room+day => reservations index
         self._removeFromRoomDayReservationsIndex()
 
+        self._updateStats(removed=True)
+        ReservationTextIndex.unindex(self)
+
         self._notify('reservationDeleted')
 
+    def _updateStats(self, removed=False):
+        if removed:
+            entry = None
+        else:
+            entry = ReservationStats.getEntry(self)
+        ReservationStats.update(self._statsEntry, entry)
+        self._statsEntry = entry
+
     def _addToDayReservationsIndex( self ):
         dayReservationsIndexBTree = Reservation.getDayReservationsIndexRoot()
 
@@ -306,6 +328,19 @@ class Reservation( Persistent, ReservationBase, Observable ):
                 # Intersection
                 resvCandidates = dayFilteredResvs & resvCandidates
 
+        # If we search by text, use the ReservationTextIndex for the most selective choice
+        textFilteredIds = ReservationTextIndex.getCandidates(resvEx)
+        if textFilteredIds is not None:
+            resvBTree = Reservation.getReservationsRoot()
+            if resvCandidates is None:
+                resvCandidates = [resvBTree[resvId] for resvId in textFilteredIds]
+            elif len(textFilteredIds) < len(resvCandidates):
+                # Intersection, without loading the candidates
+                resvCandidates = [resvBTree[resvId] for resvId in textFilteredIds
+                                  if resvBTree[resvId] in resvCandidates]
+            else:
+                resvCandidates = [resv for resv in resvCandidates if resv.id in textFilteredIds]
+
         # If we still have nothing, get all reservations and filter them later in the loop (slow!)
         if resvCandidates is None:
             resvCandidates = Reservation.getReservationsRoot().itervalues()
@@ -432,6 +467,7 @@ class Reservation( Persistent, ReservationBase, Observable ):
     def setExcludedDays( self, excludedDays ):
         ReservationBase.setExcludedDays( self, excludedDays )
         self._excludedDays = excludedDays
+        self._v_excludedDays = None
 
     def excludeDay( self, dayD, unindex = False ):
         """
@@ -443,6 +479,7 @@ class Reservation( Persistent, ReservationBase, Observable ):
         if not dayD in lst:
             lst.append( dayD )
         self._excludedDays = lst  # Force update
+        self._v_excludedDays = None
 
         if unindex:
             dayReservationsIndexBTree = Reservation.getDayReservationsIndexRoot()
@@ -463,6 +500,7 @@ class Reservation( Persistent, ReservationBase, Observable ):
         lst = self._excludedDays
         lst.remove( dayD )
         self._excludedDays = lst  # Force update
+        self._v_excludedDays = None
 
         # Re-indexing that day
         dayReservationsIndexBTree = Reservation.getDayReservationsIndexRoot()
@@ -475,7 +513,14 @@ class Reservation( Persistent, ReservationBase, Observable ):
 
     def dayIsExcluded( self, dayD ):
         ReservationBase.dayIsExcluded( self, dayD )
-        return dayD in self.getExcludedDays()
+        return dayD in self._getExcludedDaysSet()
+
+    def _getExcludedDaysSet( self ):
+        # Volatile, so it is recomputed whenever the object is reloaded
+        excludedDays = getattr( self, '_v_excludedDays', None )
+        if excludedDays is None:
+            excludedDays = self._v_excludedDays = frozenset( self._excludedDays )
+        return excludedDays
 
     def createSnapshot( self ):
         """
@@ -486,12 +531,20 @@ class Reservation( Persistent, ReservationBase, Observable ):
         result = {}
 
         for attr, val in self.__dict__.iteritems():
-            result[attr] = val
+            if not attr.startswith( '_v_' ):
+                result[attr] = val
 
         return result
 
     # Statistical
 
+    @staticmethod
+    def getStoredReservationStats( location = None, room = None ):
+        """ Documentation in base class. """
+        if room != None:
+            return ReservationStats.getRoomStats( room )
+        return ReservationStats.getLocationStats( location )
+
     @staticmethod
     def getNumberOfReservations( *args, **kwargs ):
         """
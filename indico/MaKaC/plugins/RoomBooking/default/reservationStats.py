@@ -0,0 +1,235 @@
+# -*- coding: utf-8 -*-
+##
+##
+## This file is part of Indico.
+## Copyright (C) 2002 - 2013 European Organization for Nuclear Research (CERN).
+##
+## Indico is free software; you can redistribute it and/or
+## modify it under the terms of the GNU General Public License as
+## published by the Free Software Foundation; either version 3 of the
+## License, or (at your option) any later version.
+##
+## Indico is distributed in the hope that it will be useful, but
+## WITHOUT ANY WARRANTY; without even the implied warranty of
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+## General Public License for more details.
+##
+## You should have received a copy of the GNU General Public License
+## along with Indico;if not, see <http://www.gnu.org/licenses/>.
+
+from datetime import datetime
+
+from persistent import Persistent
+from BTrees.IOBTree import IOBTree
+from BTrees.OOBTree import OOBTree
+from BTrees.Length import Length
+
+from MaKaC.plugins.RoomBooking.default.factory import Factory
+
+# Branch name in ZODB root
+# OOBTree with the counters of the rooms (IOBTree, by room id)
+# and of the locations (OOBTree, by location name).
+# It does not exist until the counters are built by reconcile().
+_RESERVATION_STATS = 'ReservationStats'
+
+STATUSES = ('Valid', 'Cancelled', 'Rejected')
+
+
+def getStatus(resv):
+    """
+    Returns the status (one of STATUSES) a reservation is counted as.
+    """
+    if resv.isCancelled:
+        return 'Cancelled'
+    elif resv.isRejected:
+        return 'Rejected'
+    return 'Valid'
+
+
+class ReservationCounters(Persistent):
+    """
+    Numbers of valid, cancelled and rejected reservations, split between
+    live and archival ones.
+
+    Reservations become archival when they end, so instead of counting
+    them as live or archival, the number of reservations of each end
+    date is kept until archive() is called. Until then, the ones that
+    ended in the meantime are added to the archival ones when reading.
+    """
+
+    def __init__(self):
+        # Length objects resolve concurrent changes of the same counter
+        self._total = dict((status, Length()) for status in STATUSES)
+        self._archival = dict((status, Length()) for status in STATUSES)
+        # (endDT, status) => number of reservations not archived yet
+        self._pending = OOBTree()
+        self._archivedUntil = datetime.min
+
+    def add(self, endDT, status, delta=1):
+        self._total[status].change(delta)
+        if endDT < self._archivedUntil:
+            self._archival[status].change(delta)
+        else:
+            key = (endDT, status)
+            count = self._pending.get(key, 0) + delta
+            if count:
+                self._pending[key] = count
+            else:
+                del self._pending[key]
+
+    def archive(self, now):
+        """
+        Counts the reservations that ended before now as archival ones.
+        """
+        for (endDT, status), count in list(self._pending.items(max=(now,))):
+            self._archival[status].change(count)
+            del self._pending[(endDT, status)]
+        self._archivedUntil = now
+
+    def getStats(self, now=None):
+        """
+        Returns the stats as described in ReservationBase.getReservationStats.
+        """
+        if now is None:
+            now = datetime.now()
+        archival = dict((status, self._archival[status]()) for status in STATUSES)
+        for (endDT, status), count in self._pending.items(max=(now,)):
+            archival[status] += count
+        stats = {}
+        for status in STATUSES:
+            stats['archival' + status] = archival[status]
+            stats['live' + status] = self._total[status]() - archival[status]
+        return stats
+
+    def reconcile(self, counts, now):
+        """
+        Fixes the counters so that they match `counts`, a dictionary
+        (endDT, status) => number of reservations.
+        Returns True if any of them was wrong.
+        """
+        self.archive(now)
+        total = dict.fromkeys(STATUSES, 0)
+        archival = dict.fromkeys(STATUSES, 0)
+        pending = {}
+        for (endDT, status), count in counts.iteritems():
+            total[status] += count
+            if endDT < now:
+                archival[status] += count
+            else:
+                pending[(endDT, status)] = count
+
+        fixed = False
+        for counters, values in ((self._total, total), (self._archival, archival)):
+            for status in STATUSES:
+                delta = values[status] - counters[status]()
+                if delta:
+                    counters[status].change(delta)
+                    fixed = True
+        for key in set(self._pending.keys()) | set(pending):
+            count = pending.get(key, 0)
+            if self._pending.get(key, 0) != count:
+                if count:
+                    self._pending[key] = count
+                else:
+                    del self._pending[key]
+                fixed = True
+        return fixed
+
+
+class ReservationStats(object):
+    """
+    Keeps the ReservationCounters of every room and location up to date.
+    """
+
+    @staticmethod
+    def getRoot():
+        return Factory.getDALManager().getRoot().get(_RESERVATION_STATS)
+
+    @staticmethod
+    def getEntry(resv):
+        """
+        Returns what a reservation contributes to the counters.
+        """
+        return resv.room.id, resv.locationName, resv.endDT, getStatus(resv)
+
+    @staticmethod
+    def update(oldEntry, newEntry):
+        """
+        Moves a reservation from the counters of oldEntry to the ones of
+        newEntry (any of them may be None).
+        """
+        root = ReservationStats.getRoot()
+        if root is None or oldEntry == newEntry:
+            return
+        if oldEntry is not None:
+            ReservationStats._add(root, oldEntry, -1)
+        if newEntry is not None:
+            ReservationStats._add(root, newEntry, 1)
+
+    @staticmethod
+    def _add(root, entry, delta):
+        roomId, location, endDT, status = entry
+        for tree, key in ((root['Rooms'], roomId), (root['Locations'], location)):
+            counters = tree.get(key)
+            if counters is None:
+                counters = tree[key] = ReservationCounters()
+            counters.add(endDT, status, delta)
+
+    @staticmethod
+    def getRoomStats(room):
+        root = ReservationStats.getRoot()
+        if root is None:
+            return None
+        counters = root['Rooms'].get(room.id)
+        return (counters or ReservationCounters()).getStats()
+
+    @staticmethod
+    def getLocationStats(location):
+        root = ReservationStats.getRoot()
+        if root is None:
+            return None
+        counters = root['Locations'].get(location)
+        return (counters or ReservationCounters()).getStats()
+
+    @staticmethod
+    def reconcile(logger=None):
+        """
+        Counts all the reservations again and fixes the counters that do
+        not match, building them if they do not exist yet.
+        Returns the number of counters that had to be fixed.
+        """
+        from MaKaC.plugins.RoomBooking.default.reservation import Reservation
+
+        now = datetime.now()
+        dalRoot = Factory.getDALManager().getRoot()
+        root = dalRoot.get(_RESERVATION_STATS)
+        building = root is None
+        if building:
+            root = OOBTree()
+            root['Rooms'] = IOBTree()
+            root['Locations'] = OOBTree()
+
+        counts = {'Rooms': {}, 'Locations': {}}
+        for resv in Reservation.getReservationsRoot().itervalues():
+            entry = ReservationStats.getEntry(resv)
+            if resv._statsEntry != entry:
+                resv._statsEntry = entry
+            roomId, location, endDT, status = entry
+            for treeName, key in (('Rooms', roomId), ('Locations', location)):
+                treeCounts = counts[treeName].setdefault(key, {})
+                treeCounts[(endDT, status)] = treeCounts.get((endDT, status), 0) + 1
+
+        fixed = 0
+        for treeName in ('Rooms', 'Locations'):
+            tree = root[treeName]
+            for key in set(tree.keys()) | set(counts[treeName]):
+                counters = tree.get(key)
+                if counters is None:
+                    counters = tree[key] = ReservationCounters()
+                if counters.reconcile(counts[treeName].get(key, {}), now):
+                    fixed += 1
+                    if logger and not building:
+                        logger.warning('Reservation counters of %s %r were wrong' % (treeName, key))
+        if building:
+            dalRoot[_RESERVATION_STATS] = root
+        return fixed
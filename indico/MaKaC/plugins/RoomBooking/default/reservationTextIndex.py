@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+##
+##
+## This file is part of Indico.
+## Copyright (C) 2002 - 2013 European Organization for Nuclear Research (CERN).
+##
+## Indico is free software; you can redistribute it and/or
+## modify it under the terms of the GNU General Public License as
+## published by the Free Software Foundation; either version 3 of the
+## License, or (at your option) any later version.
+##
+## Indico is distributed in the hope that it will be useful, but
+## WITHOUT ANY WARRANTY; without even the implied warranty of
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+## General Public License for more details.
+##
+## You should have received a copy of the GNU General Public License
+## along with Indico;if not, see <http://www.gnu.org/licenses/>.
+
+from BTrees.IOBTree import IOBTree, IOTreeSet, intersection, multiunion
+from BTrees.OOBTree import OOBTree
+
+from MaKaC.rb_tools import trigrams, PostingLists
+from MaKaC.plugins.RoomBooking.default.factory import Factory
+
+# Branch name in ZODB root
+# OOBTree field => (OOBTree trigram => ids of the reservations), plus the
+# indexed trigrams of every reservation under 'Entries'.
+# It does not exist until the index is built by ReservationTextIndex.build().
+_RESERVATION_TEXT_INDEX = 'ReservationTextIndex'
+
+# Fields matched by 'contains exactly or contains any word'
+_WORDS_FIELDS = ('bookedForName', 'reason')
+# Fields matched by substring
+_SUBSTRING_FIELDS = ('contactEmail', 'contactPhone', 'rejectionReason')
+
+_postings = PostingLists(IOTreeSet, intersection)
+
+
+class ReservationTextIndex(object):
+    """
+    Trigram index of the text fields of the reservations, used by
+    Reservation.getReservations to find the candidates of searches
+    on those fields. The candidates are a superset of the reservations
+    that match.
+    """
+
+    @staticmethod
+    def getRoot():
+        root = Factory.getDALManager().getRoot().get(_RESERVATION_TEXT_INDEX)
+        if root is not None and 'Index' in root:
+            # built by a version keeping all the fields together, unusable
+            # until rebuilt
+            return None
+        return root
+
+    @staticmethod
+    def _getKeys(resv):
+        keys = {}
+        for field in _WORDS_FIELDS + _SUBSTRING_FIELDS:
+            value = getattr(resv, field)
+            keys[field] = trigrams(value.lower()) if value else ()
+        return keys
+
+    @staticmethod
+    def index(resv):
+        """
+        (Re)indexes the reservation, if the index exists.
+        """
+        root = ReservationTextIndex.getRoot()
+        if root is not None:
+            _postings.indexEntry(root, resv.id, ReservationTextIndex._getKeys(resv))
+
+    @staticmethod
+    def unindex(resv):
+        root = ReservationTextIndex.getRoot()
+        if root is not None:
+            _postings.unindexEntry(root, resv.id)
+
+    @staticmethod
+    def build():
+        """
+        Creates the index (again) and indexes all the reservations.
+        """
+        from MaKaC.plugins.RoomBooking.default.reservation import Reservation
+        root = OOBTree()
+        for field in _WORDS_FIELDS + _SUBSTRING_FIELDS:
+            root[field] = OOBTree()
+        root['Entries'] = IOBTree()
+        Factory.getDALManager().getRoot()[_RESERVATION_TEXT_INDEX] = root
+        for resv in Reservation.getReservationsRoot().itervalues():
+            ReservationTextIndex.index(resv)
+
+    @staticmethod
+    def getCandidates(resvEx):
+        """
+        Returns the ids of the reservations that may match the text fields
+        of the example, or None if the index can't narrow them down.
+        """
+        root = ReservationTextIndex.getRoot()
+        if root is None or resvEx is None:
+            return None
+
+        sets = []
+        for field in _WORDS_FIELDS:
+            value = getattr(resvEx, field)
+            if not value or not value.strip():
+                continue
+            value = value.strip().lower()
+            if value[0] in ['"', "'"] and value[-1] in ['"', "'"]:
+                words = [value[1:-1]]
+            else:
+                words = value.split()
+            ids = ReservationTextIndex._getAnyCandidates(root, field, words)
+            if ids is not None:
+                sets.append(ids)
+        for field in _SUBSTRING_FIELDS:
+            value = getattr(resvEx, field)
+            if value:
+                ids = ReservationTextIndex._getAnyCandidates(root, field, [value.lower()])
+                if ids is not None:
+                    sets.append(ids)
+
+        if not sets:
+            return None
+        return _postings.intersect(sets)
+
+    @staticmethod
+    def _getAnyCandidates(root, field, texts):
+        # The reservations containing any of the texts
+        results = []
+        for text in texts:
+            ids = _postings.findSubstring(root[field], text)
+            if ids is None:
+                return None
+            results.append(ids)
+        return multiunion(results)
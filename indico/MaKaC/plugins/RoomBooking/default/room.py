@@ -24,6 +24,8 @@ from persistent.mapping import PersistentMapping
 from MaKaC.rb_room import RoomBase
 from MaKaC.rb_location import CrossLocationQueries, Location
 from MaKaC.plugins.RoomBooking.default.factory import Factory
+from MaKaC.plugins.RoomBooking.default.availability import RoomAvailability
+from MaKaC.plugins.RoomBooking.default.roomIndexes import RoomIndexes
 from MaKaC.rb_tools import qbeMatch
 from MaKaC.common.Configuration import Config
 from MaKaC.common import DBMgr
@@ -145,6 +147,7 @@ class Room( Persistent, RoomBase, Fossilizable ):
                 self.id = 1 # Can not use maxKey for 1st record in a tree
         # Add self to the BTree
         roomsBTree[self.id] = self
+        RoomIndexes.index(self)
         Catalog.getIdx('user_room').index_obj(self.guid)
 
     def update( self ):
@@ -166,6 +169,8 @@ class Room( Persistent, RoomBase, Fossilizable ):
         Catalog.getIdx('user_room').unindex_obj(self.guid)
         Catalog.getIdx('user_room').index_obj(self.guid)
 
+        RoomIndexes.index(self)
+
         self._p_changed = True
 
     def remove( self ):
@@ -173,6 +178,7 @@ class Room( Persistent, RoomBase, Fossilizable ):
         RoomBase.remove( self )
         roomsBTree = Room.getRoot()
         del roomsBTree[self.id]
+        RoomIndexes.unindex(self)
         if Catalog.getIdx('user_room').has_obj(self.guid):
             Catalog.getIdx('user_room').unindex_obj(self.guid)
 
@@ -225,13 +231,30 @@ class Room( Persistent, RoomBase, Fossilizable ):
         if roomID != None:
             return roomsBTree.get( roomID )
         if roomName != None:
-            for room in roomsBTree.itervalues():
+            roomIds = RoomIndexes.getByName( roomName )
+            if roomIds != None:
+                rooms = ( roomsBTree[roomId] for roomId in roomIds )
+            else:
+                rooms = roomsBTree.itervalues()
+            for room in rooms:
                 if room.name == roomName:
                     if location == None or room.locationName == location:
                         return room
             return None
 
-        for room in roomsBTree.itervalues():
+        if resvEx != None:
+            # Check the availability of all the rooms at once
+            availability = RoomAvailability(resvEx, user=ContextManager.get('currentUser'))
+
+        # Narrow the search down using the indexes
+        roomIds = RoomIndexes.getCandidates( location = location, roomEx = roomEx, minCapacity = minCapacity,
+                                             freeText = freeText, customAtts = customAtts )
+        if roomIds != None:
+            rooms = ( roomsBTree[roomId] for roomId in roomIds )
+        else:
+            rooms = roomsBTree.itervalues()
+
+        for room in rooms:
             # Apply all conditions =========
             if location != None:
                 if room.locationName != location:
@@ -248,10 +271,10 @@ class Room( Persistent, RoomBase, Fossilizable ):
                     continue
             if resvEx != None:
                 resvEx.room = room
-                aval = room.isAvailable( resvEx )
+                aval = availability.isAvailable( room )
                 if aval != available:
                     continue
-                blockState = resvEx.getBlockingConflictState(ContextManager.get('currentUser'))
+                blockState = availability.getBlockingConflictState( room )
                 if blockState == 'active':
                     continue
                 elif blockState == 'pending' and pendingBlockings:
@@ -321,6 +344,23 @@ class Room( Persistent, RoomBase, Fossilizable ):
         room.isActive = True
         return Room.countRooms( roomExample = room, location = location )
 
+    def getFreeTexts( self ):
+        """
+        Returns the texts in which the free text search looks, except the
+        ones of the responsible: string attributes, equipment and custom
+        attributes.
+        """
+        texts = []
+        for attrName in dir( self ):
+            if attrName[0] == '_':
+                continue
+            attrVal = getattr( self, attrName )
+            if attrVal.__class__.__name__ == 'str':
+                texts.append( attrVal )
+        texts.extend( self.getEquipment() )
+        texts.extend( value for value in self.customAtts.itervalues() if value )
+        return texts
+
     def getLocationName( self ):
         #from MaKaC.plugins.RoomBooking.default.factory import Factory
         #return Factory.locationName
@@ -396,19 +436,10 @@ class Room( Persistent, RoomBase, Fossilizable ):
         return False
 
     def __hasOneFreeText( self, freeText ):
-        # Look for freeText in all string and int attributes
-        for attrName in dir( self ):
-            if attrName[0] == '_':
-                continue
-            attrType = eval( 'self.' + attrName + '.__class__.__name__' )
-            if attrType == 'str':
-                attrVal = eval( 'self.' + attrName )
-                if attrVal.lower().find( freeText ) != -1:
-                    return True
-
-        # Look for freeText in equipment
-        if self.__hasEquipment( [ freeText ] ):
-            return True
+        # Look for freeText in string attributes, equipment and custom attributes
+        for text in self.getFreeTexts():
+            if freeText in text.lower():
+                return True
 
         # Look for freeText in responsible
         if self.responsibleId != None:
@@ -416,11 +447,6 @@ class Room( Persistent, RoomBase, Fossilizable ):
             if freeText in user.getFullName().lower()  or  freeText in user.getEmail().lower():
                 return True
 
-        # Look for freeText in custom attributes
-        for value in self.customAtts.itervalues():
-            if value and ( freeText in value.lower() ):
-                return True
-
         # Not found
         return False
 
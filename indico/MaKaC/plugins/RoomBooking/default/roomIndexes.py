@@ -0,0 +1,184 @@
+# -*- coding: utf-8 -*-
+##
+##
+## This file is part of Indico.
+## Copyright (C) 2002 - 2013 European Organization for Nuclear Research (CERN).
+##
+## Indico is free software; you can redistribute it and/or
+## modify it under the terms of the GNU General Public License as
+## published by the Free Software Foundation; either version 3 of the
+## License, or (at your option) any later version.
+##
+## Indico is distributed in the hope that it will be useful, but
+## WITHOUT ANY WARRANTY; without even the implied warranty of
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+## General Public License for more details.
+##
+## You should have received a copy of the GNU General Public License
+## along with Indico;if not, see <http://www.gnu.org/licenses/>.
+
+from BTrees.IOBTree import IOBTree, IOSet, IOTreeSet, intersection, multiunion
+from BTrees.OOBTree import OOBTree
+
+from MaKaC.rb_tools import trigrams, PostingLists
+from MaKaC.plugins.RoomBooking.default.factory import Factory
+
+# Branch name in ZODB root
+# OOBTree of indexes of room ids (see RoomIndexes), by index name.
+# It does not exist until the indexes are built by RoomIndexes.build().
+_ROOM_INDEXES = 'RoomIndexes'
+
+_INDEX_NAMES = ('Name', 'Location', 'Equipment', 'Capacity', 'CustomAttribute',
+                'Responsible', 'FreeText')
+
+_postings = PostingLists(IOTreeSet, intersection)
+
+
+class RoomIndexes(object):
+    """
+    Secondary indexes of the rooms, used by Room.getRooms to find the
+    candidate rooms of a search before checking them one by one:
+
+    Name - room name => ids
+    Location - location name => ids
+    Equipment - lowercase equipment name => ids
+    Capacity - capacity => ids
+    CustomAttribute - custom attribute name => ids of the rooms having it
+    Responsible - responsible id => ids
+    FreeText - trigrams of the texts searched by the free text search,
+               except the name and email of the responsible => ids
+
+    The candidates are a superset of the rooms that match: the searches
+    still check every candidate. Since the name and email of a user can
+    change without the rooms being saved, the free text search checks them
+    at search time, once per responsible.
+    """
+
+    @staticmethod
+    def getRoot():
+        root = Factory.getDALManager().getRoot().get(_ROOM_INDEXES)
+        if root is not None and 'Responsible' not in root:
+            # built by a version without it, unusable until rebuilt
+            return None
+        return root
+
+    @staticmethod
+    def _getKeys(room):
+        keys = dict((name, set()) for name in _INDEX_NAMES)
+        if room.name != None:
+            keys['Name'].add(room.name)
+        if room.locationName != None:
+            keys['Location'].add(room.locationName)
+        keys['Equipment'].update(eq.lower() for eq in room.getEquipment())
+        if isinstance(room.capacity, (int, long)):
+            keys['Capacity'].add(room.capacity)
+        keys['CustomAttribute'].update(room.customAtts.iterkeys())
+        if room.responsibleId != None:
+            keys['Responsible'].add(room.responsibleId)
+        for text in room.getFreeTexts():
+            keys['FreeText'].update(trigrams(text.lower()))
+        return keys
+
+    @staticmethod
+    def index(room):
+        """
+        (Re)indexes the room, if the indexes exist.
+        """
+        root = RoomIndexes.getRoot()
+        if root is not None:
+            _postings.indexEntry(root, room.id, RoomIndexes._getKeys(room))
+
+    @staticmethod
+    def unindex(room):
+        root = RoomIndexes.getRoot()
+        if root is not None:
+            _postings.unindexEntry(root, room.id)
+
+    @staticmethod
+    def build():
+        """
+        Creates the indexes (again) and indexes all the rooms.
+        """
+        from MaKaC.plugins.RoomBooking.default.room import Room
+        root = OOBTree()
+        for name in _INDEX_NAMES:
+            root[name] = IOBTree() if name == 'Capacity' else OOBTree()
+        root['Entries'] = IOBTree()
+        Factory.getDALManager().getRoot()[_ROOM_INDEXES] = root
+        for room in Room.getRoot().itervalues():
+            RoomIndexes.index(room)
+
+    @staticmethod
+    def getByName(name):
+        """
+        Returns the ids of the rooms with the given name,
+        or None if the indexes do not exist.
+        """
+        root = RoomIndexes.getRoot()
+        if root is None:
+            return None
+        return root['Name'].get(name, IOSet())
+
+    @staticmethod
+    def getCandidates(location=None, roomEx=None, minCapacity=None, freeText=None, customAtts=None):
+        """
+        Returns the ids of the rooms that may match a search (see
+        Room.getRooms), or None if the indexes can't narrow it down.
+        """
+        root = RoomIndexes.getRoot()
+        if root is None:
+            return None
+
+        sets = []
+        if location != None:
+            sets.append(root['Location'].get(location, IOSet()))
+        if roomEx != None:
+            # Equipment matches if it contains the required one
+            for required in roomEx.getEquipment():
+                if required:
+                    required = required.lower()
+                    sets.append(multiunion([ids for eq, ids in root['Equipment'].iteritems()
+                                            if required in eq]))
+            if roomEx.capacity != None:
+                capacity = max(roomEx.capacity, 1)
+                if minCapacity:
+                    capacities = root['Capacity'].values(min=capacity)
+                else:
+                    # Within 20%, a bit wider to be on the safe side
+                    capacities = root['Capacity'].values(min=int(capacity * 0.8) - 1,
+                                                         max=int(capacity * 1.2) + 1)
+                sets.append(multiunion(list(capacities)))
+        for condition in customAtts or ():
+            sets.append(root['CustomAttribute'].get(condition['name'], IOSet()))
+        if freeText != None:
+            ids = RoomIndexes._getFreeTextCandidates(root, freeText.lower().split())
+            if ids is not None:
+                sets.append(ids)
+
+        if not sets:
+            return None
+        return _postings.intersect(sets)
+
+    @staticmethod
+    def _getFreeTextCandidates(root, words):
+        from MaKaC.user import AvatarHolder
+        # Any of the words must be found
+        results = []
+        for word in words:
+            ids = _postings.findSubstring(root['FreeText'], word)
+            if ids is None:
+                return None
+            results.append(ids)
+        # or in the name or email of the responsible
+        ah = AvatarHolder()
+        for responsibleId, ids in root['Responsible'].iteritems():
+            user = ah.getById(responsibleId)
+            if user is None:
+                continue
+            fullName = user.getFullName().lower()
+            email = user.getEmail().lower()
+            for word in words:
+                if word in fullName or word in email:
+                    results.append(ids)
+                    break
+        return multiunion(results)
@@ -58,3 +58,15 @@ class RoomReservationTask(PeriodicUniqueTask):
     def run(self):
         from MaKaC.plugins.RoomBooking.notifications import sendStartNotifications
         sendStartNotifications(self.getLogger())
+
+
+class RoomReservationStatsTask(PeriodicUniqueTask):
+    """
+    Recounts the room reservations to fix the booking statistics counters.
+    Also counts the reservations that ended as archival ones.
+    """
+
+    def run(self):
+        from MaKaC.plugins.RoomBooking.default.reservationStats import ReservationStats
+        fixed = ReservationStats.reconcile(self.getLogger())
+        self.getLogger().info('Reservation counters checked, %d fixed' % fixed)
@@ -29,6 +29,7 @@ from MaKaC.common.Locators import Locator
 from MaKaC.errors import PluginError
 from MaKaC.common import DBMgr
 from MaKaC.common.logger import Logger
+from MaKaC.common.accessCache import AccessCache
 import zope.interface, types
 from persistent import Persistent
 import pkg_resources, types, inspect, re
@@ -53,6 +54,8 @@ def extension_point(event, *args, **kwargs):
     "light" version of notification - no need for inheritance
     """
     _self = kwargs.pop('self', None)
+    # memoized access checks may depend on what is about to be notified
+    AccessCache.notify(event)
     return PluginsHolder().getComponentsManager().notifyComponent(
         event, _self, *args, **kwargs)
 
@@ -432,10 +435,49 @@ class PluginsHolder (ObjectHolder):
 
 
 
+class PluginURLRouter(object):
+    """ Finds the RH whose URL pattern matches a path, out of a {compiled regex: RH} map.
+        The patterns are grouped by the static first segment of the URL they match
+        (e.g. "Collaboration" for r'^/Collaboration/admin'), so that only the ones of
+        that segment (and those without a static first segment) are tried for a path.
+    """
+
+    _segmentRE = re.compile(r'^\^?/([\w\-]+)(?:/|\$)')
+
+    def __init__(self, rhMap):
+        # first URL segment -> [(regex, rh)]
+        self._bySegment = {}
+        # patterns whose first segment is not static
+        self._other = []
+        for urlRE, rh in rhMap.iteritems():
+            m = self._segmentRE.match(urlRE.pattern)
+            if m:
+                self._bySegment.setdefault(m.group(1), []).append((urlRE, rh))
+            else:
+                self._other.append((urlRE, rh))
+
+    def __len__(self):
+        return sum(len(routes) for routes in self._bySegment.itervalues()) + len(self._other)
+
+    def _getSegment(self, path):
+        return path[1:].split('/', 1)[0]
+
+    def match(self, path):
+        """ Returns a (rh, match object) tuple for the path, or (None, None) if no pattern matches
+        """
+        for routes in (self._bySegment.get(self._getSegment(path), ()), self._other):
+            for urlRE, rh in routes:
+                m = urlRE.match(path)
+                if m:
+                    return rh, m
+        return None, None
+
+
 class RHMapMemory:
     """ Stores the RHMap for every python process in memory
     If there's no Map attribute, we fetch it from the database,
     otherwise just return it.
+    The router over the map is also built once per process.
     """
 
     ## Stores the unique Singleton instance-
@@ -452,6 +494,7 @@ class RHMapMemory:
                     DBMgr.getInstance().startRequest()
                     self._map=PluginsHolder().getRHMap().copy()
                     DBMgr.getInstance().endRequest()
+                self._router = PluginURLRouter(self._map)
 
     ## The constructor
     #  @param self The object pointer.
@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+##
+##
+## This file is part of Indico.
+## Copyright (C) 2002 - 2013 European Organization for Nuclear Research (CERN).
+##
+## Indico is free software; you can redistribute it and/or
+## modify it under the terms of the GNU General Public License as
+## published by the Free Software Foundation; either version 3 of the
+## License, or (at your option) any later version.
+##
+## Indico is distributed in the hope that it will be useful, but
+## WITHOUT ANY WARRANTY; without even the implied warranty of
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+## General Public License for more details.
+##
+## You should have received a copy of the GNU General Public License
+## along with Indico;if not, see <http://www.gnu.org/licenses/>.
+
+"""
+Occurrences of (repeating) reservations.
+
+The days on which a reservation takes place are computed arithmetically
+for every kind of repeatability, instead of walking through the calendar
+day by day.
+"""
+
+import calendar
+from datetime import datetime, timedelta
+
+from MaKaC.rb_tools import Period
+from MaKaC.errors import MaKaCError
+
+
+def nthWeekDayOfMonth( year, month, weekDay, weekNumber ):
+    """
+    Returns the date of the weekNumber-th (1-5) weekDay (0-6) of the
+    month, or None if the month does not have as many of them.
+    """
+    firstWeekDay, daysInMonth = calendar.monthrange( year, month )
+    day = 1 + ( weekDay - firstWeekDay ) % 7 + 7 * ( weekNumber - 1 )
+    if day > daysInMonth:
+        return None
+    return datetime( year, month, day ).date()
+
+
+class Occurrences( object ):
+    """
+    The occurrences of a reservation from startDT to endDT, according to
+    its repeatability (one of the RepeatabilityEnum) and except its
+    excluded days.
+
+    excludedDays may be any container of dates, preferably a set.
+    """
+
+    def __init__( self, startDT, endDT, repeatability, excludedDays = () ):
+        from MaKaC.rb_reservation import RepeatabilityEnum
+        self._startDT = startDT
+        self._endDT = endDT
+        self._repeatability = repeatability
+        self._excludedDays = excludedDays
+        self._firstDay = startDT.date()
+        self._startTime = startDT.time()
+        self._endTime = endDT.time()
+        # Repeatings take place only if they start before endDT
+        self._lastDay = endDT.date()
+        if self._startTime > self._endTime:
+            self._lastDay -= timedelta( 1 )
+
+        if repeatability == None:
+            self._iterDays = self._iterSingleDay
+        elif repeatability in RepeatabilityEnum.rep2diff:
+            self._step = RepeatabilityEnum.rep2diff[ repeatability ]
+            self._iterDays = self._iterConstantStepDays
+        elif repeatability == RepeatabilityEnum.onceAMonth:
+            self._iterDays = self._iterMonthlyDays
+        else:
+            raise MaKaCError('Unknown repeatability type.')
+
+    def iterDays( self, fromDay = None, toDay = None ):
+        """
+        Yields the dates of the occurrences between fromDay and toDay
+        (both included, both optional), in chronological order.
+        """
+        if fromDay == None or fromDay < self._firstDay:
+            fromDay = self._firstDay
+        if toDay == None or toDay > self._lastDay:
+            toDay = self._lastDay
+        if fromDay > toDay:
+            return iter( () )
+        return self._iterDays( fromDay, toDay )
+
+    def iterPeriods( self, fromDay = None, toDay = None ):
+        """
+        Yields the Periods of the occurrences between fromDay and toDay.
+        """
+        if self._repeatability == None:
+            for day in self.iterDays( fromDay, toDay ):
+                yield Period( self._startDT, self._endDT )
+            return
+        for day in self.iterDays( fromDay, toDay ):
+            yield Period( datetime.combine( day, self._startTime ),
+                          datetime.combine( day, self._endTime ) )
+
+    def getNext( self, afterDay ):
+        """
+        Returns the Period of the first occurrence after afterDay,
+        or None if there is none.
+        """
+        for period in self.iterPeriods( fromDay = afterDay + timedelta( 1 ) ):
+            return period
+        return None
+
+    def hasAny( self, fromDay, toDay ):
+        """
+        Does any occurrence take place between fromDay and toDay?
+        """
+        for day in self.iterDays( fromDay, toDay ):
+            return True
+        return False
+
+    # ==== Private ===================================================
+
+    def _iterSingleDay( self, fromDay, toDay ):
+        # Single day reservations have no excluded days
+        if fromDay == self._firstDay:
+            yield self._firstDay
+
+    def _iterConstantStepDays( self, fromDay, toDay ):
+        step = self._step
+        # First repeating not before fromDay
+        offset = -( -( fromDay - self._firstDay ).days // step )
+        day = self._firstDay + timedelta( offset * step )
+        step = timedelta( step )
+        excludedDays = self._excludedDays
+        while day <= toDay:
+            if day not in excludedDays:
+                yield day
+            day += step
+
+    def _iterMonthlyDays( self, fromDay, toDay ):
+        weekDay = self._firstDay.weekday()
+        weekNumber = ( self._firstDay.day - 1 ) // 7 + 1
+        excludedDays = self._excludedDays
+        year, month = fromDay.year, fromDay.month
+        while ( year, month ) <= ( toDay.year, toDay.month ):
+            day = nthWeekDayOfMonth( year, month, weekDay, weekNumber )
+            if day != None and fromDay <= day <= toDay and day not in excludedDays:
+                yield day
+            month += 1
+            if month > 12:
+                year, month = year + 1, 1
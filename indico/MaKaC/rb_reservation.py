@@ -23,9 +23,10 @@ Responsible: Piotr Wlodarek
 """
 
 from datetime import datetime, timedelta, date
-from MaKaC.rb_tools import iterdays, weekNumber, doesPeriodOverlap, overlap, Period, Impersistant, checkPresence, fromUTC, toUTC, formatDateTime, formatDate,\
+from MaKaC.rb_tools import iterdays, weekNumber, doesPeriodOverlap, findOverlappingPeriods, overlap, Period, Impersistant, checkPresence, fromUTC, toUTC, formatDateTime, formatDate,\
     datespan
 from MaKaC.rb_room import RoomBase
+from MaKaC.rb_occurrences import Occurrences
 from MaKaC.rb_location import ReservationGUID, Location, CrossLocationQueries
 from MaKaC.accessControl import AccessWrapper
 from MaKaC.errors import MaKaCError
@@ -736,11 +737,15 @@ class ReservationBase( Fossilizable ):
 
         # Two reservations does not overlap <=> there are no overlaping periods.
 
-        # Therefore every period of r1 must be checked against every period of r2
+        # Periods of both reservations are sorted, so they can be swept
+        # together instead of checking every period of r1 against every
+        # period of r2.
 
         # 1) Get all reservations that may have impact on the candidate.
-        # 2) Split candidate and other reservations into 1-day periods.
-        # 3) Check every candidate period against every other period.
+        # 2) Split candidate and other reservations into 1-day periods,
+        #    within the time span of the candidate.
+        # 3) Sweep the candidate periods and the periods of every other
+        #    reservation.
         # 4) Remember and return collisions.
 
         if ( rooms == None and self.room == None ) or self.startDT == None or self.endDT == None:
@@ -780,22 +785,19 @@ class ReservationBase( Fossilizable ):
         if len( resvs ) == 0:
             return [] # No collisions
 
-        potentialColliders = []
         for resv in resvs:
-            potentialColliders.append( ( resv, resv.splitToPeriods(endDT=self.endDT) ) )
-
-        for r in potentialColliders:
-            resv = r[0]
-            colliderPeriods = r[1]
-            for candidatePeriod in candidatePeriods:
-                for colliderPeriod in colliderPeriods:
-                    if doesPeriodOverlap( candidatePeriod, colliderPeriod ):
-                        if boolResult:
-                            # There is at least one collision
-                            return True
-                        else:
-                            # Collect collisions
-                            collisions.append( Collision( overlap( candidatePeriod, colliderPeriod ), resv ) )
+            if resv.repeatability == None:
+                colliderPeriods = resv.splitToPeriods( endDT = self.endDT )
+            else:
+                # Repeatings before the candidate's first day can't collide
+                colliderPeriods = resv.splitToPeriods( endDT = self.endDT, startDT = self.startDT )
+            for i, j in findOverlappingPeriods( candidatePeriods, colliderPeriods ):
+                if boolResult:
+                    # There is at least one collision
+                    return True
+                else:
+                    # Collect collisions
+                    collisions.append( Collision( overlap( candidatePeriods[i], colliderPeriods[j] ), resv ) )
         return collisions
 
     def getNextRepeating( self, afterDT = None ):
@@ -808,72 +810,7 @@ class ReservationBase( Fossilizable ):
         if not afterDT:
             afterDT = datetime.now()
         # Do not look in the specified date
-        afterDT = datetime( afterDT.year, afterDT.month, afterDT.day, 23, 59, 59 )
-
-        # No repeatings after afterDT
-        if afterDT > self.endDT:
-            return None
-
-        # Non-repeating reservation
-        if self.repeatability == None:
-            if afterDT < self.startDT:
-                return Period( self.startDT, self.endDT )
-            else:
-                return None
-
-        # Before first repeating
-        if afterDT < self.startDT:
-            retEndDT = datetime( self.startDT.year, self.startDT.month, self.startDT.day, self.endDT.hour, self.endDT.minute )
-
-            if self.dayIsExcluded( self.startDT.date() ):
-                return self.getNextRepeating( self.startDT )  # Recurrently ask for next
-            return Period( self.startDT, retEndDT )
-
-        # Constant period repeatings
-        if self.repeatability in ( RepeatabilityEnum.daily, RepeatabilityEnum.onceAWeek,
-                                   RepeatabilityEnum.onceEvery2Weeks,
-                                   RepeatabilityEnum.onceEvery3Weeks ):
-            # Number of days between repeatings
-            diff = RepeatabilityEnum.rep2diff[ self.repeatability ]
-            # Candidate for next repeating: next day
-            repCandidateDT = afterDT + timedelta( 1 )
-            # How much to early is the candidate? (days)
-            toEarly = (diff - (( repCandidateDT - self.startDT ).days % diff )) % diff
-            # Add differene
-            repCandidateDT = repCandidateDT + timedelta( toEarly )
-            # Now it should represent next repeating
-            retStartDT = datetime( repCandidateDT.year, repCandidateDT.month, repCandidateDT.day, self.startDT.hour, self.startDT.minute )
-            retEndDT = datetime( repCandidateDT.year, repCandidateDT.month, repCandidateDT.day, self.endDT.hour, self.endDT.minute )
-
-            if retStartDT > self.endDT:
-                return None
-            if self.dayIsExcluded( retStartDT.date() ):
-                return self.getNextRepeating( retStartDT )  # Recurrently ask for next
-            return Period( retStartDT, retEndDT )
-
-        # Monthly repeatings
-        if self.repeatability == RepeatabilityEnum.onceAMonth:
-            # Candidate for next repeating: next day
-            repCandidateDT = afterDT + timedelta( 1 )
-
-            weekDayDiff = self.weekDay - repCandidateDT.weekday()
-            if weekDayDiff < 0:
-                weekDayDiff += 7
-            repCandidateDT += timedelta( weekDayDiff ) # Try next day...
-
-            while weekNumber( repCandidateDT ) != self.weekNumber:
-                repCandidateDT += timedelta( 7 )  # Try next week...
-
-            retStartDT = datetime( repCandidateDT.year, repCandidateDT.month, repCandidateDT.day, self.startDT.hour, self.startDT.minute )
-            retEndDT = datetime( repCandidateDT.year, repCandidateDT.month, repCandidateDT.day, self.endDT.hour, self.endDT.minute )
-
-            if retStartDT > self.endDT:
-                return None
-            if self.dayIsExcluded( retStartDT.date() ):
-                return self.getNextRepeating( retStartDT )  # Recurrently ask for next
-            return Period( retStartDT, retEndDT )
-
-        raise MaKaCError('Unknown repeatability type.')
+        return self.getOccurrences().getNext( afterDT.date() )
 
     def overlapsOn( self, startDT, endDT ):
         """
@@ -903,52 +840,15 @@ class ReservationBase( Fossilizable ):
 
         overlapStartDT, overlapEndDT = overlap( self.startDT, self.endDT, startDT, endDT )
 
-        # DAILY REPEATINGS
-        if self.repeatability == RepeatabilityEnum.daily:
-            for day in iterdays( overlapStartDT, overlapEndDT ):
-                if not self.dayIsExcluded( day.date() ):
-                    return True
-            return False
-
-        weekdaysInPeriod = []
-        for day in iterdays( overlapStartDT, overlapEndDT ):
-            if day.weekday() == self.weekDay:
-                if not self.dayIsExcluded( day.date() ):
-                    weekdaysInPeriod.append( day )
-        if len( weekdaysInPeriod ) == 0:
-            return False
-
-        # ONCE A WEEK
-        if self.repeatability == RepeatabilityEnum.onceAWeek:
-            return True
-
-        # ONCE EVERY 2 OR 3 WEEKS
-        if self.repeatability in ( RepeatabilityEnum.onceEvery2Weeks, RepeatabilityEnum.onceEvery3Weeks ):
-            # Check if candidate weekday is in the overlaping period
-            for weekday in weekdaysInPeriod:
-                if self.repeatability == RepeatabilityEnum.onceEvery2Weeks:
-                    # Check if the weekday is in the SECOND week (not the following week)
-                    # => There must be exactly 14 days between previous repeating
-                    # and the present one. So, the difference between initial repeating
-                    # (startDT) and any next repeating must divide by 14.
-                    if (weekday - self.startDT).days % 14 == 0:
-                        return True
-                if self.repeatability == RepeatabilityEnum.onceEvery3Weeks:
-                    # By analogy to the above, difference must divide by 21.
-                    if (weekday - self.startDT).days % 21 == 0:
-                        return True
-            return False
-
-        # ONCE A MONTH
-        if self.repeatability == RepeatabilityEnum.onceAMonth:
-            requiredWeekNumber = self.weekNumber
-            # Does the period contain weekNumber?
-            for weekday in weekdaysInPeriod:
-                if weekNumber( weekday ) == requiredWeekNumber:
-                    return True
-            return False
+        # Is there any repeating during the overlaping days?
+        return self.getOccurrences().hasAny( overlapStartDT.date(), overlapEndDT.date() )
 
-        raise MaKaCError("Unknown repeatability type")
+    def getOccurrences( self ):
+        """
+        Returns the Occurrences (see rb_occurrences) of the reservation,
+        taking its repeatability and excluded days into consideration.
+        """
+        return Occurrences( self.startDT, self.endDT, self.repeatability, self._getExcludedDaysSet() )
 
     # Excluded days management ----------------------------------------------
 
@@ -1015,6 +915,12 @@ class ReservationBase( Fossilizable ):
         if not isinstance( dayD, date ):
             raise MaKaCError('dayD must be of date type (NOT datetime)')
 
+    def _getExcludedDaysSet( self ):
+        """
+        Returns the excluded days as a set, for fast lookups.
+        """
+        return frozenset()
+
 
     # Statistical ------------------------------------------------------------
 
@@ -1075,32 +981,12 @@ class ReservationBase( Fossilizable ):
         liveValid, liveCancelled, liveRejected
         archivalValid, archivalCancelled, archivalRejected
         """
+        from MaKaC.rb_factory import Factory
         location = kwargs.get( 'location', Location.getDefaultLocation().friendlyName )
-        allResvs = ReservationBase.getReservations( location = location )     # Run Forest, run! :)
-        stats = { \
-                     'liveValid': 0,
-                     'liveCancelled': 0,
-                     'liveRejected': 0,
-                     'archivalValid': 0,
-                     'archivalCancelled': 0,
-                     'archivalRejected': 0,
-                 }
-        for r in allResvs:
-            if r.isArchival:
-                if r.isCancelled:
-                    stats['archivalCancelled'] += 1
-                elif r.isRejected:
-                    stats['archivalRejected'] += 1
-                else: # r.isValid (must be)
-                    stats['archivalValid'] += 1
-            else: # live
-                if r.isCancelled:
-                    stats['liveCancelled'] += 1
-                elif r.isRejected:
-                    stats['liveRejected'] += 1
-                else: # r.isValid (must be)
-                    stats['liveValid'] += 1
-
+        stats = Factory.newReservation().getStoredReservationStats( location = location )
+        if stats == None:
+            allResvs = ReservationBase.getReservations( location = location )     # Run Forest, run! :)
+            stats = ReservationBase._countReservationStats( allResvs )
         return stats
 
     @staticmethod
@@ -1116,8 +1002,24 @@ class ReservationBase( Fossilizable ):
         liveValid, liveCancelled, liveRejected
         archivalValid, archivalCancelled, archivalRejected
         """
-        location = Location.getDefaultLocation().friendlyName
-        allResvs = ReservationBase.getReservations( rooms = [ room ] )     # Run Forest, run! :)
+        from MaKaC.rb_factory import Factory
+        stats = Factory.newReservation().getStoredReservationStats( room = room )
+        if stats == None:
+            allResvs = ReservationBase.getReservations( rooms = [ room ] )     # Run Forest, run! :)
+            stats = ReservationBase._countReservationStats( allResvs )
+        return stats
+
+    @staticmethod
+    def getStoredReservationStats( location = None, room = None ):
+        """
+        Returns the statistics (see getReservationStats) of the location
+        or of the room as kept up to date by the plugin, or None if the
+        plugin does not keep them.
+        """
+        return None
+
+    @staticmethod
+    def _countReservationStats( resvs ):
         stats = { \
                      'liveValid': 0,
                      'liveCancelled': 0,
@@ -1126,7 +1028,7 @@ class ReservationBase( Fossilizable ):
                      'archivalCancelled': 0,
                      'archivalRejected': 0,
                  }
-        for r in allResvs:
+        for r in resvs:
             if r.isArchival:
                 if r.isCancelled:
                     stats['archivalCancelled'] += 1
@@ -1372,18 +1274,12 @@ class ReservationBase( Fossilizable ):
         For repeating ones, the list will include all repeatings.
         """
         if startDT is None:
-            lastDT = self.startDT - timedelta( 1 )   # One day before the beginning
-        else:
-            lastDT = startDT - timedelta( 1 )
-
-        periods = []
+            startDT = self.startDT
 
-        while True:
-            period = self.getNextRepeating( lastDT )
-            if period is None or (endDT != None and period.startDT > endDT):
-                return periods
-            lastDT = period.startDT
-            periods.append( period )
+        periods = list( self.getOccurrences().iterPeriods( startDT.date(), endDT and endDT.date() ) )
+        if endDT != None and periods and periods[-1].startDT > endDT:
+            periods.pop()
+        return periods
 
 
     # ==== Private ===================================================
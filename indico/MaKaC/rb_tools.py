@@ -152,6 +152,97 @@ def containsExactly_OR_containsAny( attrValExample, attrValCandidate ):
     return False
 
 
+def trigrams( s ):
+    """
+    Returns the set of 3-character substrings of s, as used by the
+    indexes for substring searches: if s1 is in s2, its trigrams are
+    all in the ones of s2. Unicode is indexed as UTF-8.
+    """
+    if isinstance( s, unicode ):
+        s = s.encode( 'utf-8' )
+    return set( s[i:i + 3] for i in xrange( len( s ) - 2 ) )
+
+
+class PostingLists( object ):
+    """
+    Operations on posting lists: BTrees mapping each key (e.g. a trigram)
+    to the tree set of the values (ids, words...) it was found in. The tree
+    set type and the intersection function are the ones of the values,
+    e.g. IOTreeSet and BTrees.IOBTree.intersection for integer ids.
+    """
+
+    def __init__( self, treeSetType, intersection ):
+        self._treeSetType = treeSetType
+        self._intersection = intersection
+
+    def insert( self, postings, key, value ):
+        values = postings.get( key )
+        if values is None:
+            values = postings[key] = self._treeSetType()
+        values.insert( value )
+
+    def remove( self, postings, key, value ):
+        values = postings.get( key )
+        if values is not None and value in values:
+            values.remove( value )
+            if not values:
+                del postings[key]
+
+    def intersect( self, sets ):
+        """
+        Returns the values which are in all the sets, starting with the
+        smallest ones.
+        """
+        sets = sorted( sets, key = len )
+        result = sets[0]
+        for values in sets[1:]:
+            if not result:
+                break
+            result = self._intersection( result, values )
+        return result
+
+    def findSubstring( self, postings, s ):
+        """
+        Returns the values whose texts (indexed by trigram) may contain s,
+        i.e. the ones having all its trigrams, or None if s is too short
+        to have any.
+        """
+        sTrigrams = trigrams( s )
+        if not sTrigrams:
+            return None
+        result = None
+        for trigram in sTrigrams:
+            values = postings.get( trigram )
+            if values is None:
+                return self._treeSetType()
+            result = self._intersection( result, values )
+            if not result:
+                break
+        return result
+
+    def indexEntry( self, root, entryId, keys ):
+        """
+        (Re)indexes an entry of a group of posting lists: root maps the name
+        of each posting list to it, and 'Entries' to a BTree keeping the
+        keys of every entry, so that it can be unindexed. keys maps posting
+        list names to the keys of the entry in them.
+        """
+        self.unindexEntry( root, entryId )
+        for name, values in keys.iteritems():
+            for value in values:
+                self.insert( root[name], value, entryId )
+        root['Entries'][entryId] = dict( ( name, list( values ) ) for name, values in keys.iteritems() )
+
+    def unindexEntry( self, root, entryId ):
+        keys = root['Entries'].get( entryId )
+        if keys is None:
+            return
+        for name, values in keys.iteritems():
+            for value in values:
+                self.remove( root[name], value, entryId )
+        del root['Entries'][entryId]
+
+
 def doesPeriodOverlap( *args, **kwargs ):
     """
     Returns true if periods do overlap. This requires both dates and times to overlap.
@@ -173,6 +264,30 @@ def __doesPeriodOverlap( startDT1, endDT1, startDT2, endDT2 ):
         return False
     return True
 
+def findOverlappingPeriods( periods1, periods2 ):
+    """
+    Yields the (index1, index2) pairs of overlapping periods (see
+    doesPeriodOverlap) of the two lists, ordered by index1 and then index2.
+
+    Both lists must be sorted by start, with end dates growing with the
+    start dates - which is the case for the periods of a reservation.
+    They are swept together instead of comparing every period of the
+    first list with every period of the second one.
+    """
+    first = 0
+    count2 = len( periods2 )
+    for i, period1 in enumerate( periods1 ):
+        startDate = period1.startDT.date()
+        endDate = period1.endDT.date()
+        # Periods that end before this one starts can't overlap the next ones either
+        while first < count2 and periods2[first].endDT.date() < startDate:
+            first += 1
+        j = first
+        while j < count2 and periods2[j].startDT.date() <= endDate:
+            if doesPeriodOverlap( period1, periods2[j] ):
+                yield i, j
+            j += 1
+
 def overlap( *args, **kwargs ):
     """
     Returns two datetimes - the common part of two given periods.
@@ -243,12 +358,7 @@ def weekNumber( dt ):
     Lets assume dt is Friday.
     Then weekNumber( dt ) will return WHICH Friday of the month it is: 1st - 5th.
     """
-    weekDay = dt.weekday()
-    weekNumber = 0
-    for day in iterdays( datetime( dt.year, dt.month, 1 ), dt ):
-        if day.weekday() == weekDay:
-            weekNumber += 1
-    return weekNumber
+    return ( dt.day - 1 ) // 7 + 1
 
 class Impersistant( object ):
 
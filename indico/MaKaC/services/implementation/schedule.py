@@ -470,10 +470,10 @@ class ConferenceScheduleAddSession(ScheduleOperation, conferenceServices.Confere
         if sessionDict.has_key('sessions'):
             #Append the new type to the existing list
             sessionDict['sessions'].append(sessionId)
-            websession._p_changed = 1
         else:
             #Create a new entry for the dictionary containing the new type
             sessionDict['sessions'] = [sessionId]
+        websession.setVar("ContributionFilterConf%s"%conferenceId, sessionDict)
 
 class ConferenceScheduleDeleteSession(ScheduleOperation, conferenceServices.ConferenceScheduleModifBase):
 
@@ -32,6 +32,7 @@ import MaKaC.errors
 
 from MaKaC.common import DBMgr, Config
 from MaKaC.common.contextManager import ContextManager
+from MaKaC.common.accessCache import AccessCache
 from MaKaC.common.mail import GenericMailer
 
 from MaKaC.services.interface.rpc.common import CausedError, NoReportError, CSRFError
@@ -117,6 +118,8 @@ class ServiceRunner(Observable):
                     GenericMailer.flushQueue(False)
 
                     DBMgr.getInstance().sync()
+                    # memoize access checks, from scratch on every attempt
+                    AccessCache.enable()
 
                     try:
                         result = processRequest(method, copy.deepcopy(params), req)
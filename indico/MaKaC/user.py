@@ -23,8 +23,9 @@ import httplib
 import urllib
 import base64
 import operator
+import threading
+import time
 from xml.dom.minidom import parseString
-from datetime import datetime, timedelta
 from persistent import Persistent
 from BTrees.OOBTree import OOTreeSet, union
 
@@ -39,7 +40,8 @@ from MaKaC.errors import UserError, MaKaCError
 from MaKaC.trashCan import TrashCanManager
 from MaKaC.externUsers import ExtUserHolder
 from MaKaC.i18n import _
-from MaKaC.authentication.LDAPAuthentication import ldapFindGroups, ldapUserInGroup
+from MaKaC.authentication.LDAPAuthentication import ldapFindGroups, \
+    ldapFindGroupMemberUids, ldapUserInAnyGroup
 from MaKaC.plugins.base import PluginsHolder
 from MaKaC.common.logger import Logger
 from MaKaC.fossils.user import IAvatarFossil, IAvatarAllDetailsFossil,\
@@ -174,6 +176,115 @@ class Group(Persistent, Fossilizable):
         d["groupId"] = self.getId()
         return d
 
+class GroupMembershipCache(object):
+    """
+    Remembers whether avatars belong to external groups, whose members are
+    only known to a directory service (LDAP, NICE), so that access checks
+    don't have to ask it every time.
+    Entries are kept in a bounded LRU in each process and shared between
+    processes through the `GenericCache` backend. Non-members are remembered
+    for a shorter time.
+    """
+
+    _instance = None
+
+    def __init__(self, maxSize, ttl, negativeTTL):
+        # MaKaC.common.cache imports this module (through MaKaC.common.utils)
+        from MaKaC.common.cache import GenericCache
+        self._maxSize = maxSize
+        self._ttl = ttl
+        self._negativeTTL = negativeTTL
+        # key -> (member, expiration time), least recently used first
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._shared = GenericCache('GroupMembership')
+        self.hits = 0
+        self.sharedHits = 0
+        self.misses = 0
+
+    @classmethod
+    def getInstance(cls):
+        if cls._instance is None:
+            config = Config.getInstance()
+            cls._instance = cls(config.getGroupMembershipCacheSize(),
+                                config.getGroupMembershipCacheTTL(),
+                                config.getGroupNonMembershipCacheTTL())
+        return cls._instance
+
+    def _makeKey(self, group, avatar):
+        return (group.groupType, group.getName(), avatar.getId())
+
+    def _getLocal(self, key):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None or entry[1] <= time.time():
+                return None
+            # mark the entry as the most recently used one
+            self._entries[key] = entry
+            return entry[0]
+
+    def _setLocal(self, key, member, expiration):
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (member, expiration)
+            if len(self._entries) > self._maxSize:
+                self._entries.popitem(last=False)
+
+    def getMany(self, groups, avatar):
+        """
+        Returns, for each group, whether the avatar belongs to it, or None if
+        it is not known. The shared backend is asked (once) only about the
+        groups which are not cached in this process.
+        """
+        keys = [self._makeKey(group, avatar) for group in groups]
+        result = map(self._getLocal, keys)
+        missing = [key for key, member in zip(keys, result) if member is None]
+        self.hits += len(keys) - len(missing)
+        if missing:
+            now = time.time()
+            shared = self._shared.get_multi(missing)
+            for i, key in enumerate(keys):
+                if result[i] is None and shared.get(key) is not None:
+                    member, expiration = shared[key]
+                    if expiration > now:
+                        self._setLocal(key, member, expiration)
+                        result[i] = member
+                        self.sharedHits += 1
+            self.misses += result.count(None)
+        return result
+
+    def get(self, group, avatar):
+        return self.getMany([group], avatar)[0]
+
+    def set(self, group, avatar, member):
+        ttl = self._ttl if member else self._negativeTTL
+        expiration = time.time() + ttl
+        key = self._makeKey(group, avatar)
+        self._setLocal(key, member, expiration)
+        self._shared.set(key, (member, expiration), ttl)
+
+    def check(self, group, avatar, checker):
+        """
+        Returns whether the avatar belongs to the group, calling `checker()`
+        to find out if it is not cached
+        """
+        member = self.get(group, avatar)
+        if member is None:
+            member = bool(checker())
+            self.set(group, avatar, member)
+        return member
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def getStats(self):
+        return {'size': len(self._entries),
+                'hits': self.hits,
+                'sharedHits': self.sharedHits,
+                'misses': self.misses}
+
+
 class NiceGroup(Group):
 
     groupType = "Nice"
@@ -253,32 +364,19 @@ class CERNGroup(Group):
 
         if avatar == None:
             return False
-        try:
-            if avatar in self._v_memberCache.keys():
-                if self._v_memberCache[avatar] + timedelta(0,600) > datetime.now():
-                    return True
-                else:
-                    del self._v_memberCache[avatar]
-        except:
-            self._v_memberCache = {}
-            self._v_nonMemberCache = {}
-        if avatar in self._v_nonMemberCache:
-            if self._v_nonMemberCache[avatar] + timedelta(0,600) > datetime.now():
-                return False
-            else:
-                del self._v_nonMemberCache[avatar]
+        return GroupMembershipCache.getInstance().check(
+            self, avatar, lambda: self._checkMembership(avatar))
+
+    def _checkMembership( self, avatar ):
         ids = avatar.getIdentityList()
         for id in ids:
             if id.getAuthenticatorTag() == "Nice":
                 if self._checkNice( id.getLogin(), avatar ):
-                    self._v_memberCache[avatar] = datetime.now()
                     return True
         #check also with all emails contained in account
         for email in avatar.getEmails():
             if self._checkNice( email, avatar ):
-                self._v_memberCache[avatar] = datetime.now()
                 return True
-        self._v_nonMemberCache[avatar] = datetime.now()
         return False
 
     def _checkNice( self, id, avatar ):
@@ -313,7 +411,6 @@ class CERNGroup(Group):
             raise MaKaCError( _("Nice authentication problem: %s")%data)
         if doc.getElementsByTagName("boolean"):
             if doc.getElementsByTagName("boolean")[0].childNodes[0].nodeValue.encode("utf-8") == "true":
-                self._v_memberCache[avatar] = datetime.now()
                 return True
         return False
 
@@ -372,7 +469,15 @@ class LDAPGroup(Group):
     def containsUser(self, avatar):
 
         # used when checking acces to private events restricted for certain groups
-        if not avatar:
+        return LDAPGroup.containsUserInAny([self], avatar)
+
+    @staticmethod
+    def containsUserInAny(groups, avatar):
+        """
+        Tells whether the avatar belongs to any of the LDAP groups, asking the
+        server only once for all of them
+        """
+        if not avatar or not groups:
             return False
         login = None
         for aid in avatar.getIdentityList():
@@ -380,7 +485,22 @@ class LDAPGroup(Group):
                 login = aid.getLogin()
         if not login:
             return False
-        return ldapUserInGroup(login, self.getName())
+        cache = GroupMembershipCache.getInstance()
+        known = cache.getMany(groups, avatar)
+        if True in known:
+            return True
+        unknown = [group for group, member in zip(groups, known)
+                   if member is None]
+        if not unknown:
+            return False
+        ret = ldapUserInAnyGroup(login, [group.getName() for group in unknown])
+        # a positive answer doesn't tell which of the groups matched
+        if len(unknown) == 1:
+            cache.set(unknown[0], avatar, ret)
+        elif not ret:
+            for group in unknown:
+                cache.set(group, avatar, False)
+        return ret
 
     def containsMember(self, avatar):
         return 0
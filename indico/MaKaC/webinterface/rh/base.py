@@ -24,12 +24,13 @@ which action to carry out in order to handle the request made. This means that
 each of the possible HTTP ports of the system will have a rh which will know
 what to do depending on the parameter values received, etc.
 """
-import copy, time, os, sys, random, re, socket
+import copy, time, os, sys, random, re, socket, types
 import StringIO
 from datetime import datetime, timedelta
 
 try:
-    from indico.web.wsgi.indico_wsgi_handler_utils import Field
+    from indico.web.wsgi.indico_wsgi_handler_utils import Field, \
+         DeferredChunkedResponse
     from indico.web.wsgi import webinterface_handler_config as apache
 except ImportError:
     pass
@@ -56,6 +57,7 @@ from xml.sax.saxutils import escape
 from MaKaC.common.utils import truncate
 from MaKaC.common.logger import Logger
 from MaKaC.common.contextManager import ContextManager
+from MaKaC.common.accessCache import AccessCache
 from indico.util.i18n import _, availableLocales
 
 from MaKaC.plugins import PluginsHolder
@@ -542,6 +544,8 @@ class RH(RequestHandlerBase):
                     try:
                         # clear the fossile cache at the start of each request
                         fossilize.clearCache()
+                        # memoize access checks, from scratch on every attempt
+                        AccessCache.enable()
                         # delete all queued emails
                         GenericMailer.flushQueue(False)
                         # clear the existing redis pipeline
@@ -594,13 +598,23 @@ class RH(RequestHandlerBase):
                         # Raise a conflict error if enabled. This allows detecting conflict-related issues easily.
                         if retry > (MAX_RETRIES - forcedConflicts):
                             raise ConflictError
-                        self._endRequestSpecific2RH( True ) # I.e. implemented by Room Booking request handlers
-                        DBMgr.getInstance().endRequest( True )
+                        if isinstance(res, types.GeneratorType):
+                            # the chunks of a streamed response are only generated once
+                            # the request is committed, since it can be retried until
+                            # then; the connections are closed after writing them
+                            self._commitSpecific2RH()
+                            DBMgr.getInstance().commit()
+                            res = DeferredChunkedResponse(res, self._endStreamedRequest)
+                        else:
+                            self._endRequestSpecific2RH( True ) # I.e. implemented by Room Booking request handlers
+                            DBMgr.getInstance().endRequest( True )
 
                         Logger.get('requestHandler').info('Request %s successful' % (id(self._req)))
+                        # drop the fossil attribute cache (logging its statistics)
+                        fossilize.clearCache()
                         #request succesfull, now, doing tas that must be done only once
                         try:
-                            GenericMailer.flushQueue(True) # send emails
+                            GenericMailer.flushQueue(True) # send emails or store them in the outbox
                             self._deleteTempFiles()
                         except:
                             Logger.get('mail').exception('Mail sending operation failed')
@@ -788,6 +802,25 @@ class RH(RequestHandlerBase):
         """
         pass
 
+    def _commitSpecific2RH( self ):
+        """
+        Works like DBMgr.getInstance().commit() but is specific to
+        request handler, like _endRequestSpecific2RH but the connection
+        to the other database is kept open.
+
+        I.e. all Room Booking request handlers override this method.
+        """
+        pass
+
+    def _endStreamedRequest( self ):
+        """
+        Closes the connections, which were kept open after committing the
+        request to generate a streamed response. Whatever was changed
+        while generating it is discarded.
+        """
+        self._endRequestSpecific2RH( False )
+        DBMgr.getInstance().endRequest( False )
+
     def _syncSpecific2RH( self ):
         """
         Works like DBMgr.getInstance().sync() but is specific to
@@ -847,6 +880,11 @@ class RoomBookingDBMixin:     # It's _not_ RH
             else: CrossLocationDB.rollback()
             CrossLocationDB.disconnect()
 
+    def _commitSpecific2RH( self ):
+        minfo = info.HelperMaKaCInfo.getMaKaCInfoInstance()
+        if minfo.getRoomBookingModuleActive():
+            CrossLocationDB.commit()
+
     def _syncSpecific2RH( self ):
         minfo = info.HelperMaKaCInfo.getMaKaCInfoInstance()
         if minfo.getRoomBookingModuleActive():
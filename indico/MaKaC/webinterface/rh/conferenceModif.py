@@ -1363,6 +1363,7 @@ class RHConfPerformAddTrack( RHConferenceModifBase ):
             else:
                     #Create a new entry for the dictionary containing the new type
                     dict['tracks'] = [t.getId()]
+            websession.setVar("ContributionFilterConf%s"%self._conf.getId(), dict)
             self._redirect( urlHandlers.UHConfModifProgram.getURL( self._conf ) )
 
 class RHConfDelTracks( RHConferenceModifBase ):
@@ -2929,6 +2930,7 @@ class RHConfAddContribType(RHConferenceModifBase):
             else:
                 #Create a new entry for the dictionary containing the new type
                 dict['types'] = [ct.getId()]
+            websession.setVar("ContributionFilterConf%s"%self._conf.getId(), dict)
 
             self._redirect(urlHandlers.UHConferenceModification.getURL(self._conf))
         else:
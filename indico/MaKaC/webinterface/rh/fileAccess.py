@@ -63,7 +63,6 @@ class RHFileAccess(RHFileBase, RHDisplayBaseProtected):
                              fname=self._file.getFileName(),
                              last_modified=self._file.getCreationDate(),
                              size=self._file.getSize(),
-                             data=self._file.readBin(),
                              ftype=self._file.getFileType(),
                              fpath=self._file.getFilePath())
             return send_file(self._req, self._file)
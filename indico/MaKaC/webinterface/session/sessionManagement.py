@@ -17,6 +17,8 @@
 ## You should have received a copy of the GNU General Public License
 ## along with Indico;if not, see <http://www.gnu.org/licenses/>.
 import uuid
+import cPickle
+from cStringIO import StringIO
 
 from MaKaC import *
 import ZODB
@@ -26,8 +28,10 @@ from BTrees import OOBTree
 import MaKaC.common.info as info
 
 import base
-from MaKaC.common import DBMgr
+from MaKaC.common import DBMgr, Config
 from MaKaC.common.logger import Logger
+from indico.util.redis import client as redis_client
+from indico.util.redis import write_client as redis_write_client
 
 
 class PSession( base.Session, Persistent ):
@@ -157,12 +161,168 @@ class PSessionManager( base.MPSessionManager, Persistent ):
     def __init__( self ):
         base.MPSessionManager.__init__( self, PSession, OOBTree.OOBTree() )
 
+class RSession(PSession):
+    """
+    A PSession which is stored in redis instead of the ZODB.
+
+    Since it is not attached to a ZODB connection, changes to it are flagged
+    using `_v_modified` so the session manager knows that it has to be
+    written back. Setting an attribute (or `_p_changed`) flags it as well,
+    but values stored with `setVar` which are modified in place have to be
+    stored again with `setVar`.
+    """
+
+    # attributes which are not worth writing the session back for
+    _untrackedAttributes = frozenset(['_Session__access_time', '_csrf_token'])
+
+    def __init__(self, request, id):
+        PSession.__init__(self, request, id)
+        # new sessions are only stored once something is put into them
+        self._v_modified = False
+
+    def __setattr__(self, name, value):
+        PSession.__setattr__(self, name, value)
+        if name == '_p_changed':
+            modified = bool(value)
+        else:
+            modified = (not name.startswith(('_v_', '_p_')) and
+                        name not in self._untrackedAttributes)
+        if modified:
+            PSession.__setattr__(self, '_v_modified', True)
+
+    @property
+    def csrf_token(self):
+        try:
+            return self._csrf_token
+        except AttributeError:
+            self._csrf_token = str(uuid.uuid4())
+            # anonymous sessions are not worth storing just for their token
+            if self.csrf_protected:
+                self._v_modified = True
+            return self._csrf_token
+
+    def reset_csrf_token(self):
+        if hasattr(self, '_csrf_token'):
+            del self._csrf_token
+            self._v_modified = True
+
+    def is_dirty(self):
+        return self.has_info()
+
+
+def _dumpSession(session):
+    """
+    Pickles a session. Persistent objects which are stored in the ZODB (e.g.
+    the session's user) are only referenced by their oid.
+    """
+    def persistent_id(obj):
+        if obj is not session and getattr(obj, '_p_jar', None) is not None:
+            return obj._p_oid
+        return None
+
+    f = StringIO()
+    pickler = cPickle.Pickler(f, cPickle.HIGHEST_PROTOCOL)
+    pickler.persistent_id = persistent_id
+    pickler.dump(session)
+    return f.getvalue()
+
+
+def _loadSession(data):
+    """
+    Unpickles a session created by `_dumpSession`, loading any referenced
+    persistent objects from the current ZODB connection.
+    """
+    conn = DBMgr.getInstance().getDBConnection()
+    unpickler = cPickle.Unpickler(StringIO(data))
+    unpickler.persistent_load = conn.get
+    return unpickler.load()
+
+
+class RedisSessionMapping(object):
+    """
+    Mapping storing each session in its own redis key.  The keys expire
+    together with the sessions they contain, so no cleanup is necessary.
+    """
+
+    _prefix = 'websessions:'
+
+    def _key(self, sessionId):
+        return self._prefix + sessionId
+
+    def _ttl(self, session):
+        return max(1, int(base.DEFAULT_SESSION_VALIDITY - session.get_creation_age()))
+
+    def __getitem__(self, sessionId):
+        data = redis_client.get(self._key(sessionId))
+        if data is None:
+            raise KeyError(sessionId)
+        return _loadSession(data)
+
+    def get(self, sessionId, default=None):
+        try:
+            return self[sessionId]
+        except KeyError:
+            return default
+
+    def has_key(self, sessionId):
+        return bool(redis_client.exists(self._key(sessionId)))
+
+    __contains__ = has_key
+
+    def __setitem__(self, sessionId, session):
+        self.set(sessionId, session)
+
+    def set(self, sessionId, session, client=None):
+        if client is None:
+            client = redis_write_client
+        client.setex(self._key(sessionId), self._ttl(session), _dumpSession(session))
+
+    def __delitem__(self, sessionId):
+        redis_write_client.delete(self._key(sessionId))
+
+    def keys(self):
+        return [key[len(self._prefix):] for key in redis_client.keys(self._prefix + '*')]
+
+    def iteritems(self):
+        for sessionId in self.keys():
+            session = self.get(sessionId)
+            # the session may have expired in the meantime
+            if session is not None:
+                yield sessionId, session
+
+    def items(self):
+        return list(self.iteritems())
+
+    def values(self):
+        return [session for __, session in self.iteritems()]
+
+
+class RedisSessionManager(base.MPSessionManager):
+    """
+    Session manager keeping the sessions in redis.  Sessions are only
+    written when they have been modified and expire automatically.
+    """
+
+    def __init__(self):
+        base.MPSessionManager.__init__(self, RSession, RedisSessionMapping())
+
+
+_redisSessionManager = None
+
+
 #helper function
 #   this should go in a PSessionManager static method but the fact that it
 #   inherits from Persistent, becoming therefore an extension class, seems
 #   to make it not possible to use static/class methods. To be changed when
 #   ZODB migrates Persistent to non-extension classes
-def getSessionManager(debug=0):
+def getSessionManager(debug=0, backend=None):
+    global _redisSessionManager
+    if backend is None:
+        backend = Config.getInstance().getSessionBackend()
+    if backend == 'redis':
+        if _redisSessionManager is None:
+            _redisSessionManager = RedisSessionManager()
+        return _redisSessionManager
     root = DBMgr.getInstance().getDBConnection().root()
     try:
         sm = root["SessionManagers"]["main"]
@@ -173,6 +333,17 @@ def getSessionManager(debug=0):
     return sm
 
 
+def migrateSession(session):
+    """
+    Converts a ZODB-based PSession into a RSession which can be stored in
+    redis.  The data dictionary is copied since the original one belongs to
+    the ZODB.
+    """
+    state = dict(session.__getstate__())
+    state['datadict'] = PersistentMapping(state.get('datadict') or {})
+    rsession = RSession.__new__(RSession)
+    rsession.__setstate__(state)
+    return rsession
 
 
 if __name__ == "__main__":
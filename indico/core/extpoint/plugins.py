@@ -41,6 +41,9 @@ class IPluginRightsContributor(IContributor):
     def isAllowedToAccess(self, obj):
         pass
 
+    def getAllowedToAccessList(self, obj, params):
+        pass
+
     def isPluginTypeAdmin(self, obj, params):
         pass
 
@@ -161,11 +161,15 @@ class BistateBatchUploaderAgent(PushSyncAgent):
             k /= 2
         return "{0:<40} {1:<20} {2}".format(obj, objId, ' '.join(parts))
 
-    def _getMetadata(self, records, logger=None):
+    def _getMetadata(self, records, logger=None, stream=None):
         """
         Retrieves the MARCXML metadata for the record
+
+        If a `stream` is given, the metadata is written to it record by record
+        instead of being returned.
         """
-        xg = XMLGen()
+        # only flush complete records, so that unfinished ones can be removed
+        xg = XMLGen(stream=stream, bufferSize=None)
         mg = MARCXMLGenerator(xg)
         # set the permissions
         mg.setPermissionsOf(self._access)
@@ -175,6 +179,8 @@ class BistateBatchUploaderAgent(PushSyncAgent):
 
         for record, recId, operation in records:
             deleted = operation & STATUS_DELETED
+            # where the record starts in the buffer (which is empty if it was flushed)
+            recordStart = len(xg.xml)
             try:
                 if deleted:
                     mg.generate(recId, overrideCache=True, deleted=True)
@@ -193,21 +199,22 @@ class BistateBatchUploaderAgent(PushSyncAgent):
                     logger.exception("Something went wrong while processing '%s' (recId=%s) (owner=%s)! Possible metadata errors." %
                                      (record, recId, record.getOwner()))
                     # avoid duplicate record
-                self._removeUnfinishedRecord(mg._XMLGen)
+                self._removeUnfinishedRecord(mg._XMLGen, recordStart)
+            xg.flush()
 
         xg.closeTag("collection")
 
+        if stream is not None:
+            xg.flush()
+            return None
         return xg.getXml()
 
-    def _removeUnfinishedRecord(self, xg):
+    def _removeUnfinishedRecord(self, xg, recordStart):
         """
-        gets rid of a remaining '<record>' tag
+        gets rid of whatever was written for a record which could not be
+        completed, starting with its '<record>' tag
         """
-        # remove any line breaks, etc...
-        while not xg.xml[-1].strip():
-            xg.xml.pop()
-        # remove '<record>'
-        xg.xml.pop()
+        del xg.xml[recordStart:]
 
     def _generateRecords(self, data, lastTS, dbi=None):
         return BistateRecordProcessor.computeRecords(data, self._access, dbi=dbi)
@@ -171,9 +171,8 @@ class AgentCommand(ConsoleLiveSyncCommand):
         logger.info('Generating metadata...')
 
         with open(fname, 'w') as f:
-            data = agent._getMetadata(batch)
             logger.info('Writing file %s' % fname)
-            f.write(data)
+            agent._getMetadata(batch, stream=f)
 
     def _export(self, args):
         logger = _basicStreamHandler()
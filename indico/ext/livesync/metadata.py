@@ -69,7 +69,6 @@ class MARCXMLGenerator:
             self.subContToXMLMarc(obj, out=out, overrideCache=overrideCache)
         else:
             raise Exception("unknown object type: %s" % obj.__class__)
-        return out.getXml()
 
     def confToXMLMarc(self, obj, out=None, overrideCache=False):
         if not out:
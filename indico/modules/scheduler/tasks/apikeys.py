@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+##
+##
+## This file is part of Indico.
+## Copyright (C) 2002 - 2013 European Organization for Nuclear Research (CERN).
+##
+## Indico is free software; you can redistribute it and/or
+## modify it under the terms of the GNU General Public License as
+## published by the Free Software Foundation; either version 3 of the
+## License, or (at your option) any later version.
+##
+## Indico is distributed in the hope that it will be useful, but
+## WITHOUT ANY WARRANTY; without even the implied warranty of
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+## General Public License for more details.
+##
+## You should have received a copy of the GNU General Public License
+## along with Indico;if not, see <http://www.gnu.org/licenses/>.
+
+from ZODB.POSException import ConflictError
+
+from MaKaC.common import DBMgr, Config
+from indico.modules.scheduler.tasks import PeriodicUniqueTask
+from indico.util.redis import api_key_usage
+from indico.web.http_api.auth import APIKeyHolder
+
+
+MAX_RETRIES = 10
+
+
+def flush_api_key_usage(dbi, logger):
+    usage = api_key_usage.get_usage()
+    if not usage:
+        logger.info("No buffered API key usage")
+        return
+
+    logger.info("Writing usage of {0} API keys".format(len(usage)))
+
+    for _retry in xrange(MAX_RETRIES):
+        dbi.sync()
+        akh = APIKeyHolder()
+        for key, data in usage.iteritems():
+            if not akh.hasKey(key):
+                # the key has been deleted or replaced in the meantime
+                continue
+            akh.getById(key).used(data['ip'], data['path'], data['query'], data['authenticated'],
+                                  dt=data['dt'], count=data['count'])
+        try:
+            dbi.commit()
+        except ConflictError:
+            dbi.abort()
+        else:
+            # only forget about the usage once it is in the database
+            api_key_usage.confirm_usage()
+            break
+    else:
+        logger.error("Could not write API key usage, keeping it for the next run")
+
+
+class APIKeyUsageTask(PeriodicUniqueTask):
+    """
+    Writes the API key usage buffered in redis to the database
+    """
+
+    def run(self):
+        if not Config.getInstance().getRedisConnectionURL():
+            return
+        flush_api_key_usage(DBMgr.getInstance(), self.getLogger())
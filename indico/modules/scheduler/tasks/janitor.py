@@ -17,7 +17,7 @@
 ## You should have received a copy of the GNU General Public License
 ## along with Indico;if not, see <http://www.gnu.org/licenses/>.
 
-from MaKaC.common import DBMgr
+from MaKaC.common import DBMgr, Config
 from MaKaC.webinterface.session.sessionManagement import getSessionManager
 from indico.modules.scheduler.tasks import PeriodicTask
 
@@ -30,6 +30,10 @@ def delete_web_sessions(dbi, logger):
     to_delete = []
     batchsize = 1000
 
+    if Config.getInstance().getSessionBackend() == 'redis':
+        logger.info("Websessions are stored in redis and expire automatically")
+        return
+
     sm = getSessionManager()
 
     logger.info("Checking which websessions should be deleted")
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+##
+##
+## This file is part of Indico.
+## Copyright (C) 2002 - 2013 European Organization for Nuclear Research (CERN).
+##
+## Indico is free software; you can redistribute it and/or
+## modify it under the terms of the GNU General Public License as
+## published by the Free Software Foundation; either version 3 of the
+## License, or (at your option) any later version.
+##
+## Indico is distributed in the hope that it will be useful, but
+## WITHOUT ANY WARRANTY; without even the implied warranty of
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+## General Public License for more details.
+##
+## You should have received a copy of the GNU General Public License
+## along with Indico;if not, see <http://www.gnu.org/licenses/>.
+
+import smtplib
+import socket
+import time
+
+from MaKaC.common.mail import SMTPSession, getOutbox
+from MaKaC.errors import MaKaCError
+from indico.modules.scheduler.tasks import PeriodicUniqueTask
+
+
+BATCH_SIZE = 100
+MAX_ATTEMPTS = 10
+RETRY_DELAY = 60
+MAX_RETRY_DELAY = 6 * 3600
+
+
+def _is_permanent_failure(exc):
+    if isinstance(exc, smtplib.SMTPRecipientsRefused):
+        return True
+    return isinstance(exc, smtplib.SMTPResponseException) and exc.smtp_code >= 500
+
+
+def _retry_delay(attempts):
+    return min(RETRY_DELAY * 2 ** (attempts - 1), MAX_RETRY_DELAY)
+
+
+def send_outbox(outbox, logger, batch_size=BATCH_SIZE, now=None):
+    """Sends the emails which are due over a single SMTP connection.
+
+    Emails rejected temporarily by the server are retried with an
+    exponential backoff; if the server cannot be reached at all the run is
+    stopped and the remaining emails are left in the outbox untouched.
+    Returns the number of emails sent.
+    """
+    if now is None:
+        now = time.time()
+    sent = 0
+    with SMTPSession() as session:
+        while True:
+            batch = outbox.getDue(batch_size, now)
+            if not batch:
+                break
+            for mailId, msgData in batch:
+                try:
+                    session.send(msgData)
+                except (smtplib.SMTPConnectError, smtplib.SMTPServerDisconnected, socket.error, MaKaCError):
+                    logger.exception("Could not send mail to {0}, SMTP server unavailable".format(msgData['to']))
+                    return sent
+                except smtplib.SMTPException, e:
+                    attempts = msgData.get('attempts', 0) + 1
+                    if _is_permanent_failure(e) or attempts >= MAX_ATTEMPTS:
+                        logger.error("Discarding mail to {0} after {1} attempt(s): {2!r}".format(msgData['to'],
+                                                                                                 attempts, e))
+                        outbox.remove(mailId)
+                    else:
+                        delay = _retry_delay(attempts)
+                        logger.warning("Mail to {0} rejected ({1!r}), retrying in {2}s".format(msgData['to'], e,
+                                                                                               delay))
+                        msgData['attempts'] = attempts
+                        outbox.defer(mailId, msgData, now + delay)
+                else:
+                    outbox.remove(mailId)
+                    sent += 1
+            if len(batch) < batch_size:
+                break
+    return sent
+
+
+class MailOutboxTask(PeriodicUniqueTask):
+    """
+    Sends the emails stored in the outbox by the web server processes
+    """
+
+    def run(self):
+        outbox = getOutbox()
+        if outbox is None:
+            return
+        logger = self.getLogger()
+        sent = send_outbox(outbox, logger)
+        if sent:
+            logger.info("Sent {0} mails from the outbox".format(sent))
@@ -20,7 +20,7 @@
 from seleniumTestCase import LoggedInSeleniumTestCase, setUpModule
 import unittest, time, re, datetime
 
-from indico.tests.python.unit.plugins_tests.RoomBooking_tests.roomblocking_test import RoomBooking_Feature
+from indico.tests.python.unit.plugins_tests.RoomBooking_tests.util import RoomBooking_Feature
 from indico.tests.python.unit.plugins import Plugins_Feature
 
 class RoomBookingTests(LoggedInSeleniumTestCase):
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+##
+##
+## This file is part of Indico.
+## Copyright (C) 2002 - 2013 European Organization for Nuclear Research (CERN).
+##
+## Indico is free software; you can redistribute it and/or
+## modify it under the terms of the GNU General Public License as
+## published by the Free Software Foundation; either version 3 of the
+## License, or (at your option) any later version.
+##
+## Indico is distributed in the hope that it will be useful, but
+## WITHOUT ANY WARRANTY; without even the implied warranty of
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+## General Public License for more details.
+##
+## You should have received a copy of the GNU General Public License
+## along with Indico;if not, see <http://www.gnu.org/licenses/>.
+
+import unittest
+
+from MaKaC.common.accessCache import AccessCache, memoizeAccess
+from MaKaC.common.contextManager import ContextManager
+
+
+class Protected(object):
+
+    def __init__(self, owner=None, allowed=()):
+        self.owner = owner
+        self.allowed = list(allowed)
+        self.calls = 0
+
+    @memoizeAccess
+    def isAllowedToAccess(self, av):
+        self.calls += 1
+        if av in self.allowed:
+            return True
+        return self.owner is not None and self.owner.isAllowedToAccess(av)
+
+
+class TestAccessCache(unittest.TestCase):
+
+    def setUp(self):
+        ContextManager.destroy()
+        self.root = Protected(allowed=['alice'])
+        self.leaf = Protected(owner=Protected(owner=self.root))
+
+    def tearDown(self):
+        ContextManager.destroy()
+
+    def testDisabled(self):
+        for i in range(3):
+            self.assertTrue(self.leaf.isAllowedToAccess('alice'))
+        self.assertEqual(self.root.calls, 3)
+
+    def testMemoized(self):
+        AccessCache.enable()
+        for i in range(3):
+            self.assertTrue(self.leaf.isAllowedToAccess('alice'))
+            self.assertFalse(self.leaf.isAllowedToAccess('bob'))
+        self.assertEqual(self.root.calls, 2)
+        self.assertEqual(self.leaf.owner.isAllowedToAccess('alice'), True)
+        self.assertEqual(self.leaf.owner.calls, 2)
+
+    def testInvalidation(self):
+        AccessCache.enable()
+        self.assertFalse(self.leaf.isAllowedToAccess('bob'))
+        self.root.allowed.append('bob')
+        AccessCache.notify('infoChanged')
+        self.assertFalse(self.leaf.isAllowedToAccess('bob'))
+        AccessCache.notify('accessGranted')
+        self.assertTrue(self.leaf.isAllowedToAccess('bob'))
+
+    def testUnhashable(self):
+        AccessCache.enable()
+        self.root.allowed.append(('carol',))
+        self.assertFalse(self.leaf.isAllowedToAccess(['carol']))
+        self.assertEqual(self.root.calls, 1)
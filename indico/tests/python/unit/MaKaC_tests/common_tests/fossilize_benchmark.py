@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+##
+##
+## This file is part of Indico.
+## Copyright (C) 2002 - 2013 European Organization for Nuclear Research (CERN).
+##
+## Indico is free software; you can redistribute it and/or
+## modify it under the terms of the GNU General Public License as
+## published by the Free Software Foundation; either version 3 of the
+## License, or (at your option) any later version.
+##
+## Indico is distributed in the hope that it will be useful, but
+## WITHOUT ANY WARRANTY; without even the implied warranty of
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+## General Public License for more details.
+##
+## You should have received a copy of the GNU General Public License
+## along with Indico;if not, see <http://www.gnu.org/licenses/>.
+
+"""
+Benchmark of fossilize() on a synthetic timetable of 5000 contributions,
+comparing the compiled fossil plans with re-deriving them for every object
+(which is what fossilize used to do).
+
+Run it directly: python fossilize_benchmark.py [number of contributions]
+"""
+
+import sys
+import time
+from datetime import datetime, timedelta
+
+from MaKaC.common.fossilize import IFossil, Fossilizable, fossilizes, fossilize
+
+
+class IPersonBenchFossil(IFossil):
+    def getFullName(self):
+        pass
+
+    def getAffiliation(self):
+        pass
+
+    def getEmail(self):
+        pass
+    getEmail.name = 'contact.email'
+
+
+class IContributionBenchFossil(IFossil):
+    def getId(self):
+        pass
+
+    def getTitle(self):
+        pass
+
+    def getStartDate(self):
+        pass
+    getStartDate.convert = lambda date, tz=None: date.isoformat()
+
+    def getDuration(self):
+        pass
+    getDuration.convert = lambda duration: duration.seconds / 60
+
+    def getSpeakerList(self):
+        pass
+    getSpeakerList.result = IPersonBenchFossil
+    getSpeakerList.name = 'speakers'
+
+    def getRoom(self):
+        pass
+    getRoom.name = 'location.room'
+
+    def isScheduled(self):
+        pass
+
+    def description(self):
+        pass
+
+
+class Person(Fossilizable):
+    fossilizes(IPersonBenchFossil)
+
+    def __init__(self, i):
+        self._i = i
+
+    def getFullName(self):
+        return 'Doe, John %d' % self._i
+
+    def getAffiliation(self):
+        return 'CERN'
+
+    def getEmail(self):
+        return 'john.doe%d@cern.ch' % self._i
+
+
+class Contribution(Fossilizable):
+    fossilizes(IContributionBenchFossil)
+
+    def __init__(self, i, speakers):
+        self._i = i
+        self._speakers = speakers
+        self.description = 'Lorem ipsum dolor sit amet'
+
+    def getId(self):
+        return str(self._i)
+
+    def getTitle(self):
+        return 'Contribution %d' % self._i
+
+    def getStartDate(self):
+        return datetime(2013, 1, 1) + timedelta(minutes=self._i)
+
+    def getDuration(self):
+        return timedelta(minutes=20)
+
+    def getSpeakerList(self):
+        return self._speakers
+
+    def getRoom(self):
+        return '40-S2-C01'
+
+    def isScheduled(self):
+        return True
+
+
+def run(name, func):
+    ts = time.time()
+    func()
+    print "%-32s %8.3f s" % (name, time.time() - ts)
+
+
+def main():
+    numContribs = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    people = [Person(i) for i in xrange(50)]
+    contribs = [Contribution(i, people[i % 50:i % 50 + 3]) for i in xrange(numContribs)]
+
+    def recompiling():
+        for contrib in contribs:
+            Fossilizable.clearPlanCache()
+            fossilize(contrib, tz='UTC')
+
+    def compiled():
+        Fossilizable.clearPlanCache()
+        fossilize(contribs, tz='UTC')
+
+    print "Fossilizing %d contributions" % numContribs
+    run("plans derived for every object", recompiling)
+    run("compiled plans", compiled)
+
+
+if __name__ == '__main__':
+    main()
@@ -23,7 +23,8 @@
 
 from MaKaC.common.fossilize import IFossil, Fossilizable, fossilizes, fossilize, \
     NonFossilizableException, addFossil,\
-    InvalidFossilException
+    InvalidFossilException, clearCache
+from MaKaC.common.contextManager import ContextManager
 import unittest
 
 class ISomeFossil(IFossil):
@@ -347,3 +348,31 @@ class TestFossilize(unittest.TestCase):
         d1 = DerivedClass(10, 50, 'bar')
         self.assertEquals(s1.fossilize(IAttributeFossil), {'_type':'SimpleClass', '_fossil':'attribute', "a": 10, "b": 20, "c":"foo"})
         self.assertEquals(fossilize(d1, IAttributeFossil), {'_type':'DerivedClass', '_fossil':'attribute', "a": 10, "b": 50, "c":"bar"})
+
+    def testAttributeCache(self):
+        "Attribute cache only used for persistent objects and bounded"
+
+        s1 = SimpleClass(10, 20, 'foo')
+        s2 = SimpleClass(11, 21, 'bar')
+        s1._p_oid = 'oid1'
+        s2._p_oid = 'oid2'
+        self.assertEquals(fossilize(s1, IAttributeFossil, useAttrCache=True)['a'], 10)
+        s1.a = 12
+        self.assertEquals(fossilize(s1, IAttributeFossil, useAttrCache=True)['a'], 10)
+        self.assertEquals(fossilize(s1, IAttributeFossil)['a'], 12)
+
+        cache = ContextManager.get('fossilAttrCache')
+        self.assertEquals((cache.hits, cache.misses), (3, 3))
+
+        oldSize = Fossilizable.attrCacheSize
+        Fossilizable.attrCacheSize = 1
+        try:
+            clearCache()
+            fossilize(s1, IAttributeFossil, useAttrCache=True)
+            fossilize(s2, IAttributeFossil, useAttrCache=True)
+            s1.a = 13
+            self.assertEquals(fossilize(s1, IAttributeFossil, useAttrCache=True)['a'], 13)
+            self.assertEquals(len(ContextManager.get('fossilAttrCache')), 1)
+        finally:
+            Fossilizable.attrCacheSize = oldSize
+            clearCache()
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+##
+##
+## This file is part of Indico.
+## Copyright (C) 2002 - 2013 European Organization for Nuclear Research (CERN).
+##
+## Indico is free software; you can redistribute it and/or
+## modify it under the terms of the GNU General Public License as
+## published by the Free Software Foundation; either version 3 of the
+## License, or (at your option) any later version.
+##
+## Indico is distributed in the hope that it will be useful, but
+## WITHOUT ANY WARRANTY; without even the implied warranty of
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+## General Public License for more details.
+##
+## You should have received a copy of the GNU General Public License
+## along with Indico;if not, see <http://www.gnu.org/licenses/>.
+
+import unittest
+
+from MaKaC.common.indexes import Index, SearchableIndex
+
+
+class TestSearchableIndex(unittest.TestCase):
+    "Searchable Index - results identical to a plain Index"
+
+    words = ['john.doe@cern.ch', 'John.Doe@CERN.ch', 'jane@example.org', 'Jo', 'jo', 'xyz', 'Doe']
+
+    def setUp(self):
+        self._plain = Index()
+        self._searchable = SearchableIndex()
+        for i, word in enumerate(self.words):
+            for idx in (self._plain, self._searchable):
+                idx._addItem(word, str(i))
+                idx._addItem(word, str(i + 100))
+
+    def _checkSame(self, idx, queries):
+        for query in queries:
+            for cs in (0, 1):
+                for exact in (0, 1):
+                    self.assertEquals(sorted(idx._match(query, cs, exact) or []),
+                                      sorted(self._plain._match(query, cs, exact) or []),
+                                      (query, cs, exact))
+
+    def testMatch(self):
+        "Matching substrings, short strings and exact words"
+        self._checkSame(self._searchable, ['doe', 'DOE', 'j', 'jo', 'e@c', '@', 'cern.ch', 'nope', 'Jo', 'Doe'])
+
+    def testWithdraw(self):
+        "Withdrawn words are not found anymore"
+        for idx in (self._plain, self._searchable):
+            for i, word in enumerate(self.words):
+                idx._withdrawItem(word, str(i))
+            idx._withdrawItem('xyz', '105')
+        self.assertEquals(self._searchable._match('xy', 0, 0), [])
+        self.assertFalse('xyz' in self._searchable._foldedWords)
+        self._checkSame(self._searchable, ['doe', 'xyz', 'jo', 'Jo'])
+
+    def testBuildSearchIndex(self):
+        "Legacy indexes fall back to scanning until the search index is built"
+        legacy = SearchableIndex()
+        del legacy._trigrams
+        legacy.setIndex(dict(self._plain.dump()))
+        self.assertFalse(legacy.hasSearchIndex())
+        self._checkSame(legacy, ['doe', 'jo'])
+        legacy.buildSearchIndex()
+        self.assertTrue(legacy.hasSearchIndex())
+        self._checkSame(legacy, ['doe', 'jo'])
+
+    def testConvertStorage(self):
+        "Indexes using the old dict storage keep working and can be converted"
+        legacy = SearchableIndex()
+        del legacy._trigrams
+        legacy.setIndex(dict((word, list(items)) for word, items in self._plain.dump().iteritems()))
+        legacy._addItem('new@example.org', '42')
+        self._plain._addItem('new@example.org', '42')
+        self.assertEquals(legacy.getLength(), self._plain.getLength())
+        self.assertTrue(legacy.convertStorage())
+        self.assertFalse(legacy.convertStorage())
+        self.assertTrue(legacy.hasSearchIndex())
+        self.assertEquals(legacy.getLength(), self._plain.getLength())
+        self._checkSame(legacy, ['doe', 'jo', 'new', 'xyz'])
+
+        legacy._withdrawItem('xyz', '5')
+        legacy._withdrawItem('xyz', '105')
+        self.assertEquals(legacy.getLength(), self._plain.getLength() - 1)
+        self.assertEquals(legacy._match('xyz', 1, 1), None)
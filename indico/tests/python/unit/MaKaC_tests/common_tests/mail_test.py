@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+##
+##
+## This file is part of Indico.
+## Copyright (C) 2002 - 2013 European Organization for Nuclear Research (CERN).
+##
+## Indico is free software; you can redistribute it and/or
+## modify it under the terms of the GNU General Public License as
+## published by the Free Software Foundation; either version 3 of the
+## License, or (at your option) any later version.
+##
+## Indico is distributed in the hope that it will be useful, but
+## WITHOUT ANY WARRANTY; without even the implied warranty of
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+## General Public License for more details.
+##
+## You should have received a copy of the GNU General Public License
+## along with Indico;if not, see <http://www.gnu.org/licenses/>.
+
+import asyncore
+import logging
+import shutil
+import smtpd
+import socket
+import tempfile
+import threading
+import unittest
+
+from MaKaC.common import Config
+from MaKaC.common.mail import SpoolMailOutbox, SMTPSession
+from indico.modules.scheduler.tasks import outbox as outbox_task
+
+
+class DebuggingSMTPServer(smtpd.SMTPServer):
+    """
+    Local SMTP server keeping the received messages and counting the
+    connections; recipients listed in `responses` get the given reply.
+    """
+
+    def __init__(self):
+        smtpd.SMTPServer.__init__(self, ('127.0.0.1', 0), None)
+        self.port = self.socket.getsockname()[1]
+        self.connections = 0
+        self.messages = []
+        self.responses = {}
+
+    def handle_accept(self):
+        self.connections += 1
+        smtpd.SMTPServer.handle_accept(self)
+
+    def process_message(self, peer, mailfrom, rcpttos, data):
+        for rcpt in rcpttos:
+            if rcpt in self.responses:
+                return self.responses[rcpt]
+        self.messages.append((mailfrom, rcpttos, data))
+
+
+def _mail(to, subject='Test'):
+    msg = "From: indico@localhost\r\nTo: %s\r\nSubject: %s\r\n\r\nHello" % (to, subject)
+    return {'msg': msg, 'toList': [to], 'ccList': [], 'bccList': [], 'fromAddr': 'indico@localhost', 'to': to}
+
+
+class TestSpoolMailOutbox(unittest.TestCase):
+
+    def setUp(self):
+        self._dir = tempfile.mkdtemp()
+        self._outbox = SpoolMailOutbox(self._dir)
+
+    def tearDown(self):
+        shutil.rmtree(self._dir)
+
+    def testEmpty(self):
+        self.assertEqual(SpoolMailOutbox(self._dir + '/missing').getDue(10), [])
+        self.assertEqual(self._outbox.getDue(10), [])
+
+    def testOrder(self):
+        self._outbox.add(_mail('b@example.com'), due=200)
+        self._outbox.add(_mail('a@example.com'), due=100)
+        self._outbox.add(_mail('c@example.com'), due=300)
+        due = self._outbox.getDue(10, now=250)
+        self.assertEqual([data['to'] for mailId, data in due], ['a@example.com', 'b@example.com'])
+        self.assertEqual(len(self._outbox.getDue(1, now=250)), 1)
+
+    def testDeferRemove(self):
+        mailId = self._outbox.add(_mail('a@example.com'), due=100)
+        data = self._outbox.getDue(10, now=100)[0][1]
+        data['attempts'] = 1
+        self._outbox.defer(mailId, data, 500)
+        self.assertEqual(self._outbox.getDue(10, now=100), [])
+        [(mailId, data)] = self._outbox.getDue(10, now=500)
+        self.assertEqual(data['attempts'], 1)
+        self._outbox.remove(mailId)
+        self._outbox.remove(mailId)
+        self.assertEqual(self._outbox.getDue(10, now=500), [])
+
+
+class TestSendOutbox(unittest.TestCase):
+
+    def setUp(self):
+        self._server = DebuggingSMTPServer()
+        self._thread = threading.Thread(target=asyncore.loop, kwargs={'timeout': 0.1})
+        self._thread.daemon = True
+        self._thread.start()
+        self._config = Config.getInstance()
+        self._oldValues = dict((k, self._config._configVars[k]) for k in ('SmtpServer', 'SmtpLogin', 'SmtpUseTLS'))
+        self._config.updateValues({'SmtpServer': ('127.0.0.1', self._server.port), 'SmtpLogin': '',
+                                   'SmtpUseTLS': 'no'})
+        self._dir = tempfile.mkdtemp()
+        self._outbox = SpoolMailOutbox(self._dir)
+        self._logger = logging.getLogger('indico.tests.outbox')
+
+    def tearDown(self):
+        self._config.updateValues(self._oldValues)
+        self._server.close()
+        self._thread.join()
+        shutil.rmtree(self._dir)
+
+    def testSession(self):
+        with SMTPSession() as session:
+            session.send(_mail('a@example.com'))
+            session.send(_mail('b@example.com'))
+        self.assertEqual(self._server.connections, 1)
+        self.assertEqual([rcpt for mailfrom, rcpt, data in self._server.messages],
+                         [['a@example.com'], ['b@example.com']])
+
+    def testBatches(self):
+        for i in xrange(5):
+            self._outbox.add(_mail('user%d@example.com' % i), due=100 + i)
+        self.assertEqual(outbox_task.send_outbox(self._outbox, self._logger, batch_size=2, now=200), 5)
+        self.assertEqual(self._server.connections, 1)
+        self.assertEqual(len(self._server.messages), 5)
+        self.assertEqual(self._outbox.getDue(10, now=200), [])
+
+    def testRetry(self):
+        self._server.responses['later@example.com'] = '451 Try again later'
+        self._server.responses['never@example.com'] = '554 Rejected'
+        self._outbox.add(_mail('later@example.com'), due=100)
+        self._outbox.add(_mail('never@example.com'), due=101)
+        self._outbox.add(_mail('ok@example.com'), due=102)
+        self.assertEqual(outbox_task.send_outbox(self._outbox, self._logger, now=200), 1)
+        # the permanent failure is dropped, the temporary one is retried later
+        self.assertEqual(self._outbox.getDue(10, now=200), [])
+        [(mailId, data)] = self._outbox.getDue(10, now=200 + outbox_task.RETRY_DELAY)
+        self.assertEqual(data['to'], 'later@example.com')
+        self.assertEqual(data['attempts'], 1)
+
+        del self._server.responses['later@example.com']
+        self.assertEqual(outbox_task.send_outbox(self._outbox, self._logger, now=200 + outbox_task.RETRY_DELAY), 1)
+        self.assertEqual(len(self._server.messages), 2)
+
+    def testServerDown(self):
+        self._outbox.add(_mail('a@example.com'), due=100)
+        sock = socket.socket()
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+        sock.close()
+        self._config.updateValues({'SmtpServer': ('127.0.0.1', port)})
+        self.assertEqual(outbox_task.send_outbox(self._outbox, self._logger, now=200), 0)
+        [(mailId, data)] = self._outbox.getDue(10, now=200)
+        self.assertNotIn('attempts', data)
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+##
+##
+## This file is part of Indico.
+## Copyright (C) 2002 - 2013 European Organization for Nuclear Research (CERN).
+##
+## Indico is free software; you can redistribute it and/or
+## modify it under the terms of the GNU General Public License as
+## published by the Free Software Foundation; either version 3 of the
+## License, or (at your option) any later version.
+##
+## Indico is distributed in the hope that it will be useful, but
+## WITHOUT ANY WARRANTY; without even the implied warranty of
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+## General Public License for more details.
+##
+## You should have received a copy of the GNU General Public License
+## along with Indico;if not, see <http://www.gnu.org/licenses/>.
+
+"""
+Benchmark of XMLGen generating the MARCXML of a synthetic event with 5000
+contributions, comparing the in-memory and the streaming mode.
+
+Run it directly: python xmlGen_benchmark.py [number of contributions]
+"""
+
+import sys
+import time
+
+from MaKaC.common.xmlGen import XMLGen
+
+
+class MeasuringStream(object):
+    """Discards what is written, keeping track of the size of the chunks"""
+
+    def __init__(self):
+        self.written = 0
+        self.maxChunk = 0
+
+    def write(self, data):
+        self.written += len(data)
+        self.maxChunk = max(self.maxChunk, len(data))
+
+
+def generateEvent(out, numContribs):
+    out.openTag("collection", [["xmlns", "http://www.loc.gov/MARC21/slim"]])
+    for i in xrange(numContribs):
+        out.openTag("record")
+        out.writeTag("leader", "00000nmm  2200000uu 4500")
+        out.openTag("datafield", [["tag", "035"], ["ind1", " "], ["ind2", " "]])
+        out.writeTag("subfield", "INDICO.1t%d" % i, [["code", "a"]])
+        out.closeTag("datafield")
+        out.openTag("datafield", [["tag", "245"], ["ind1", " "], ["ind2", " "]])
+        out.writeTag("subfield", "Contribution <%d> on the \x0bphysics of \xc3\xa9lectrons & co" % i,
+                     [["code", "a"]])
+        out.closeTag("datafield")
+        out.openTag("datafield", [["tag", "520"], ["ind1", " "], ["ind2", " "]])
+        out.writeTag("subfield", "Lorem ipsum dolor sit amet, consectetur adipisicing elit. " * 20,
+                     [["code", "a"]])
+        out.closeTag("datafield")
+        for j in xrange(5):
+            out.openTag("datafield", [["tag", "700"], ["ind1", " "], ["ind2", " "]])
+            out.writeTag("subfield", "Speaker%d, Someone" % j, [["code", "a"]])
+            out.writeTag("subfield", "CERN", [["code", "u"]])
+            out.closeTag("datafield")
+        out.closeTag("record")
+    out.closeTag("collection")
+
+
+def run(name, func):
+    ts = time.time()
+    size, peak = func()
+    print "%-12s %8.3f s  %10d bytes generated, %10d bytes kept in memory at most" % \
+        (name, time.time() - ts, size, peak)
+
+
+def main():
+    numContribs = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+
+    def inMemory():
+        xg = XMLGen()
+        generateEvent(xg, numContribs)
+        xml = xg.getXml()
+        return len(xml), len(xml)
+
+    def streaming():
+        stream = MeasuringStream()
+        xg = XMLGen(stream=stream)
+        generateEvent(xg, numContribs)
+        xg.flush()
+        return stream.written, stream.maxChunk
+
+    print "Generating MARCXML for %d contributions" % numContribs
+    run("in memory", inMemory)
+    run("streaming", streaming)
+
+
+if __name__ == '__main__':
+    main()
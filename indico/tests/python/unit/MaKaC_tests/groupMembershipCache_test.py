@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+##
+##
+## This file is part of Indico.
+## Copyright (C) 2002 - 2013 European Organization for Nuclear Research (CERN).
+##
+## Indico is free software; you can redistribute it and/or
+## modify it under the terms of the GNU General Public License as
+## published by the Free Software Foundation; either version 3 of the
+## License, or (at your option) any later version.
+##
+## Indico is distributed in the hope that it will be useful, but
+## WITHOUT ANY WARRANTY; without even the implied warranty of
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+## General Public License for more details.
+##
+## You should have received a copy of the GNU General Public License
+## along with Indico;if not, see <http://www.gnu.org/licenses/>.
+
+import unittest
+
+from MaKaC.user import GroupMembershipCache
+
+
+class SharedCache(object):
+    """
+    Stands in for the `GenericCache` backend shared between processes
+    """
+
+    def __init__(self):
+        self.data = {}
+
+    def get_multi(self, keys):
+        return dict((key, self.data.get(key)) for key in keys)
+
+    def set(self, key, val, time=0):
+        self.data[key] = val
+
+
+class FakeGroup(object):
+
+    groupType = 'Fake'
+
+    def __init__(self, name):
+        self._name = name
+
+    def getName(self):
+        return self._name
+
+
+class FakeAvatar(object):
+
+    def __init__(self, id):
+        self._id = id
+
+    def getId(self):
+        return self._id
+
+
+class TestGroupMembershipCache(unittest.TestCase):
+
+    def setUp(self):
+        self.shared = SharedCache()
+        self.cache = self._newCache()
+        self.group = FakeGroup('physics')
+        self.avatar = FakeAvatar('1')
+        self.checks = 0
+
+    def _newCache(self, maxSize=10):
+        cache = GroupMembershipCache(maxSize, 600, 60)
+        cache._shared = self.shared
+        return cache
+
+    def _checker(self, member):
+        def checker():
+            self.checks += 1
+            return member
+        return checker
+
+    def testCheck(self):
+        for i in range(3):
+            self.assertTrue(self.cache.check(self.group, self.avatar,
+                                             self._checker(True)))
+        self.assertEqual(self.checks, 1)
+        self.assertEqual(self.cache.getStats(), {'size': 1, 'hits': 2,
+                                                 'sharedHits': 0, 'misses': 1})
+
+    def testNonMember(self):
+        self.cache.set(self.group, self.avatar, False)
+        self.assertFalse(self.cache.check(self.group, self.avatar,
+                                          self._checker(True)))
+        self.assertEqual(self.checks, 0)
+        (member, expiration), = self.shared.data.values()
+        self.assertFalse(member)
+
+    def testShared(self):
+        self.cache.set(self.group, self.avatar, True)
+        other = self._newCache()
+        self.assertEqual(other.getMany([self.group, FakeGroup('it')],
+                                       self.avatar), [True, None])
+        self.assertEqual(other.getStats(), {'size': 1, 'hits': 0,
+                                            'sharedHits': 1, 'misses': 1})
+
+    def testExpired(self):
+        self.cache.set(self.group, self.avatar, True)
+        for key, (member, expiration) in self.shared.data.items():
+            self.shared.data[key] = (member, 0)
+        self.cache.clear()
+        self.assertEqual(self.cache.get(self.group, self.avatar), None)
+
+    def testBounded(self):
+        cache = self._newCache(maxSize=2)
+        groups = [FakeGroup(str(i)) for i in range(3)]
+        for group in groups:
+            cache.set(group, self.avatar, True)
+        # the least recently used entry is gone
+        self.assertEqual(cache.getStats()['size'], 2)
+        # not even in the shared backend
+        cache._shared = SharedCache()
+        self.assertEqual(cache.getMany(groups, self.avatar),
+                         [None, True, True])
@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+##
+##
+## This file is part of Indico.
+## Copyright (C) 2002 - 2013 European Organization for Nuclear Research (CERN).
+##
+## Indico is free software; you can redistribute it and/or
+## modify it under the terms of the GNU General Public License as
+## published by the Free Software Foundation; either version 3 of the
+## License, or (at your option) any later version.
+##
+## Indico is distributed in the hope that it will be useful, but
+## WITHOUT ANY WARRANTY; without even the implied warranty of
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+## General Public License for more details.
+##
+## You should have received a copy of the GNU General Public License
+## along with Indico;if not, see <http://www.gnu.org/licenses/>.
+
+"""
+Tests for the pooled LDAP lookups, against a stand-in for the LDAP server
+"""
+
+import unittest
+
+try:
+    import ldap
+except ImportError:
+    ldap = None
+
+from MaKaC.authentication import LDAPAuthentication
+from MaKaC.authentication.LDAPAuthentication import LDAPConnector, \
+     LDAPConnectionPool, ldapUserInAnyGroup
+
+PEOPLE_DN = 'ou=people,dc=example,dc=com'
+GROUPS_DN = 'ou=groups,dc=example,dc=com'
+
+
+def groupDN(name):
+    return 'cn=%s,%s' % (name, GROUPS_DN)
+
+
+class FakeLDAPObject(object):
+    """
+    Knows about a fixed set of users and groups and understands just the
+    queries done by LDAPConnector
+    """
+
+    def __init__(self, memberships):
+        self.memberships = memberships
+        self.membershipSearches = 0
+        self.down = False
+
+    def bind_s(self, *args):
+        pass
+
+    def unbind_s(self):
+        pass
+
+    def search_s(self, base, scope, filterstr, attrlist=None):
+        if self.down:
+            raise ldap.SERVER_DOWN()
+        if base == GROUPS_DN:
+            name = filterstr[len('cn='):]
+            groups = set(g for gs in self.memberships.itervalues() for g in gs)
+            return [(groupDN(name), {})] if name in groups else []
+        elif base == PEOPLE_DN:
+            login = filterstr[len('uid='):]
+            if login in self.memberships:
+                return [('uid=%s,%s' % (login, PEOPLE_DN), {})]
+            return []
+        # membership query over the user object
+        self.membershipSearches += 1
+        login = base.split(',')[0][len('uid='):]
+        for name in self.memberships.get(login, []):
+            if '(memberof=%s)' % groupDN(name) in filterstr:
+                return [(base, {})]
+        return []
+
+
+@unittest.skipIf(ldap is None, 'python-ldap is not installed')
+class TestLDAPMembership(unittest.TestCase):
+
+    def setUp(self):
+        self.server = FakeLDAPObject({'alice': ['physics', 'it'],
+                                      'bob': ['it'],
+                                      'carol': ['hr']})
+        self.opened = 0
+        test = self
+
+        def open(connector):
+            test.opened += 1
+            connector.ldapPeopleFilter = 'uid={0}'
+            connector.ldapPeopleDN = PEOPLE_DN
+            connector.ldapGroupsFilter = 'cn={0}'
+            connector.ldapGroupsDN = GROUPS_DN
+            connector.ldapMembershipQuery = 'memberof={0}'
+            connector.ldapAccessCredentials = ('cn=reader,dc=example,dc=com',
+                                               'secret')
+            connector.l = test.server
+            return connector.l
+
+        self._open = LDAPConnector.__dict__['open']
+        LDAPConnector.open = open
+        LDAPConnector._groupDNs.clear()
+        self._pool = LDAPAuthentication._pool
+        LDAPAuthentication._pool = LDAPConnectionPool(2)
+
+    def tearDown(self):
+        LDAPConnector.open = self._open
+        LDAPConnector._groupDNs.clear()
+        LDAPAuthentication._pool = self._pool
+
+    def testSingleQuery(self):
+        self.assertTrue(ldapUserInAnyGroup('bob', ['physics', 'hr', 'it']))
+        self.assertEqual(self.server.membershipSearches, 1)
+        self.assertFalse(ldapUserInAnyGroup('bob', ['physics', 'hr']))
+        self.assertEqual(self.server.membershipSearches, 2)
+        # groups which do not exist are not even looked for
+        self.assertFalse(ldapUserInAnyGroup('bob', ['nonexistent']))
+        self.assertEqual(self.server.membershipSearches, 2)
+
+    def testPoolReuse(self):
+        for i in range(5):
+            ldapUserInAnyGroup('alice', ['it'])
+            ldapUserInAnyGroup('bob', ['physics'])
+        self.assertEqual(self.opened, 1)
+
+    def testPoolServerDown(self):
+        pool = LDAPAuthentication._pool
+        pool.run(LDAPConnector.userInAnyGroup, 'alice', ['it'])
+        self.server.down = True
+        self.assertRaises(ldap.SERVER_DOWN, pool.run,
+                          LDAPConnector.userInAnyGroup, 'alice', ['it'])
+        self.server.down = False
+        self.assertTrue(pool.run(LDAPConnector.userInAnyGroup, 'alice', ['it']))
+        # the dropped connection was replaced once (retry) and then again
+        self.assertEqual(self.opened, 3)
@@ -22,6 +22,7 @@ from datetime import datetime
 from pytz import timezone
 
 from MaKaC.user import Avatar
+from MaKaC.accessControl import AccessWrapper, AccessSummary, AccessSummaryItems
 from MaKaC.conference import AvatarHolder, ConferenceHolder
 from MaKaC import conference
 from indico.tests.python.unit.util import IndicoTestCase, with_context
@@ -163,4 +164,118 @@ class TestProtection(IndicoTestCase):
         self.assertEqual(self._session1.getAccessController().getPublicChildren(), [])
         self.assertEqual(self._conf.getAccessController().getPublicChildren(), [self._session2])
 
+    @with_context('database')
+    def testCategoryCanView(self):
+        # the events of the root category are moved to the new one
+        categ = conference.CategoryManager().getById('0').newSubCategory(1)
+        self.assertEqual(categ.getConferenceList(), [self._conf])
+
+        user = Avatar()
+        user.setName("fake2")
+        user.setSurName("fake2")
+        user.setEmail("faked2@fake.fake")
+        user.setId("fake2")
+        AvatarHolder().add(user)
+        aw = AccessWrapper(user)
+
+        self.assertEqual(categ.canAccess(aw), False)
+        self.assertEqual(categ.canView(aw), True)
+
+        self._conf.setProtection(1)
+        self.assertEqual(categ.canView(aw), False)
+        self.assertEqual(categ.canView(AccessWrapper(self._avatar)), True)
+
+        self._contrib1.grantAccess(user)
+        self.assertEqual(categ.canView(aw), True)
+        self._contrib1.revokeAccess(user)
+        self.assertEqual(categ.canView(aw), False)
+
+        self._session2.setProtection(-1)
+        self.assertEqual(categ.canView(aw), True)
+        self._session2.setProtection(0)
+        self.assertEqual(categ.canView(aw), False)
+
+        categ.setProtection(-1)
+        self.assertEqual(categ.canView(aw), True)
+
+    @with_context('database')
+    def testAccessSummaryMerge(self):
+        summary = AccessSummary()
+        items = AccessSummaryItems()
+        items.setHasConferences()
+        items.addPrincipals([self._avatar])
+
+        added, removed = summary.rebuild(items, [])
+        self.assertEqual(sorted(added), sorted(items.items()))
+        self.assertEqual(removed, [])
+        # a child with the same entries does not change the summary
+        self.assertEqual(summary.merge(items.items(), []), ([], []))
+        self.assertEqual(summary.setOwnItems(AccessSummaryItems()), ([], []))
+        self.assertEqual(summary.containsUser(self._avatar), True)
+        # until it does not have them anymore
+        added, removed = summary.merge([], items.keys())
+        self.assertEqual(added, [])
+        self.assertEqual(sorted(removed), sorted(items.keys()))
+        self.assertEqual(summary.containsUser(self._avatar), False)
+        self.assertEqual(summary.hasConferences(), False)
+
+    @with_context('database')
+    def testCategoryAccessSummaryUpdate(self):
+        categ = conference.CategoryManager().getById('0').newSubCategory(1)
+        self._conf.setProtection(1)
+        conf2 = categ.newConference(self._avatar)
+        conf2.setProtection(1)
+
+        user = Avatar()
+        user.setName("fake2")
+        user.setSurName("fake2")
+        user.setEmail("faked2@fake.fake")
+        user.setId("fake2")
+        AvatarHolder().add(user)
+        aw = AccessWrapper(user)
+
+        self._conf.grantAccess(user)
+        conf2.grantAccess(user)
+        self.assertEqual(categ.canView(aw), True)
+
+        self._conf.revokeAccess(user)
+        self.assertEqual(AccessSummary.getFrom(categ).isDirty(), True)
+        # the other event still counts
+        self.assertEqual(categ.canView(aw), True)
+        conf2.revokeAccess(user)
+        self.assertEqual(categ.canView(aw), False)
+
+        conf2.grantAccess(user)
+        self.assertEqual(categ.canView(aw), True)
+        categ.removeConference(conf2)
+        self.assertEqual(categ.canView(aw), False)
+
+    @with_context('database')
+    def testCategoryCanViewContents(self):
+        categ = conference.CategoryManager().getById('0').newSubCategory(1)
+        self._conf.setProtection(1)
 
+        user = Avatar()
+        user.setName("fake2")
+        user.setSurName("fake2")
+        user.setEmail("faked2@fake.fake")
+        user.setId("fake2")
+        AvatarHolder().add(user)
+        aw = AccessWrapper(user)
+
+        self.assertEqual(categ.canView(aw), False)
+        self._session1.addCoordinator(user)
+        self.assertEqual(categ.canView(aw), True)
+        self._session1.removeCoordinator(user)
+        self.assertEqual(categ.canView(aw), False)
+
+        paperReview = self._conf.getConfPaperReview()
+        paperReview.addReferee(user)
+        self.assertEqual(categ.canView(aw), True)
+        paperReview.removeReferee(user)
+        self.assertEqual(categ.canView(aw), False)
+
+        self.assertEqual(self._conf.getAccessSummary().getResidualList(), [])
+        self._conf.setModifKey("key")
+        self.assertEqual(self._conf.getAccessSummary().getResidualList(),
+                         [self._conf])
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+##
+##
+## This file is part of Indico.
+## Copyright (C) 2002 - 2013 European Organization for Nuclear Research (CERN).
+##
+## Indico is free software; you can redistribute it and/or
+## modify it under the terms of the GNU General Public License as
+## published by the Free Software Foundation; either version 3 of the
+## License, or (at your option) any later version.
+##
+## Indico is distributed in the hope that it will be useful, but
+## WITHOUT ANY WARRANTY; without even the implied warranty of
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+## General Public License for more details.
+##
+## You should have received a copy of the GNU General Public License
+## along with Indico;if not, see <http://www.gnu.org/licenses/>.
+
+import random
+import unittest
+from datetime import datetime, timedelta
+
+from MaKaC.rb_occurrences import Occurrences, nthWeekDayOfMonth
+from MaKaC.rb_reservation import RepeatabilityEnum
+
+
+def _isOccurrence(day, startDT, repeatability):
+    "Day by day definition of the repeatings"
+    days = (day - startDT.date()).days
+    if repeatability in RepeatabilityEnum.rep2diff:
+        return days % RepeatabilityEnum.rep2diff[repeatability] == 0
+    return day.weekday() == startDT.weekday() and \
+        (day.day - 1) // 7 == (startDT.day - 1) // 7
+
+
+class TestOccurrences(unittest.TestCase):
+    "Occurrences - same days as walking through the calendar"
+
+    def testNthWeekDayOfMonth(self):
+        "n-th week day of a month"
+        self.assertEquals(nthWeekDayOfMonth(2006, 9, 4, 1), datetime(2006, 9, 1).date())
+        self.assertEquals(nthWeekDayOfMonth(2006, 9, 4, 5), datetime(2006, 9, 29).date())
+        self.assertEquals(nthWeekDayOfMonth(2006, 9, 0, 4), datetime(2006, 9, 25).date())
+        self.assertEquals(nthWeekDayOfMonth(2006, 9, 0, 5), None)
+
+    def testRepeatings(self):
+        "All the kinds of repeatings, with excluded days and date ranges"
+        rnd = random.Random(11)
+        for n in xrange(300):
+            repeatability = rnd.choice(RepeatabilityEnum.rep2diff.keys() + [RepeatabilityEnum.onceAMonth])
+            startDT = datetime(2006, 1, 1, 10) + timedelta(rnd.randint(0, 365))
+            endDT = startDT.replace(hour=12) + timedelta(rnd.randint(0, 500))
+            days = [startDT.date() + timedelta(i) for i in xrange((endDT - startDT).days + 1)]
+            excludedDays = set(rnd.sample(days, min(len(days), 20)))
+            fromDay = rnd.choice(days) - timedelta(10)
+            toDay = fromDay + timedelta(rnd.randint(0, 100))
+
+            allDays = [day for day in days
+                       if _isOccurrence(day, startDT, repeatability) and day not in excludedDays]
+            expected = [day for day in allDays if fromDay <= day <= toDay]
+            nextDays = [day for day in allDays if fromDay <= day]
+
+            occurrences = Occurrences(startDT, endDT, repeatability, excludedDays)
+            self.assertEquals(list(occurrences.iterDays(fromDay, toDay)), expected)
+            self.assertEquals(occurrences.hasAny(fromDay, toDay), bool(expected))
+            period = occurrences.getNext(fromDay - timedelta(1))
+            self.assertEquals(period and period.startDT,
+                              nextDays and datetime.combine(nextDays[0], startDT.time()) or None)
+
+    def testSingleDay(self):
+        "Non-repeating reservations"
+        startDT, endDT = datetime(2006, 1, 1, 10), datetime(2006, 1, 1, 12)
+        occurrences = Occurrences(startDT, endDT, None, set([startDT.date()]))
+        self.assertEquals([(p.startDT, p.endDT) for p in occurrences.iterPeriods()], [(startDT, endDT)])
+        self.assertEquals(occurrences.getNext(startDT.date()), None)
+        self.assertFalse(occurrences.hasAny(endDT.date() + timedelta(1), endDT.date() + timedelta(5)))
@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+##
+##
+## This file is part of Indico.
+## Copyright (C) 2002 - 2013 European Organization for Nuclear Research (CERN).
+##
+## Indico is free software; you can redistribute it and/or
+## modify it under the terms of the GNU General Public License as
+## published by the Free Software Foundation; either version 3 of the
+## License, or (at your option) any later version.
+##
+## Indico is distributed in the hope that it will be useful, but
+## WITHOUT ANY WARRANTY; without even the implied warranty of
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+## General Public License for more details.
+##
+## You should have received a copy of the GNU General Public License
+## along with Indico;if not, see <http://www.gnu.org/licenses/>.
+
+import random
+import unittest
+from datetime import datetime, timedelta
+
+from BTrees.IOBTree import IOBTree, IOTreeSet, intersection
+from BTrees.OOBTree import OOBTree
+
+from MaKaC.rb_tools import Period, doesPeriodOverlap, findOverlappingPeriods, \
+     trigrams, PostingLists
+
+
+class TestFindOverlappingPeriods(unittest.TestCase):
+    "Sweeping sorted periods - same result as checking every pair"
+
+    def _repeatings(self, rnd, count):
+        start = datetime(2012, 1, 1) + timedelta(rnd.randint(0, 30), hours=rnd.randint(7, 18))
+        duration = timedelta(minutes=30 * rnd.randint(1, 6))
+        step = timedelta(rnd.choice((1, 7, 14)))
+        return [Period(start + step * i, start + step * i + duration) for i in xrange(count)]
+
+    def _checkSame(self, periods1, periods2):
+        expected = [(i, j) for i, p1 in enumerate(periods1) for j, p2 in enumerate(periods2)
+                    if doesPeriodOverlap(p1, p2)]
+        self.assertEquals(list(findOverlappingPeriods(periods1, periods2)), expected)
+
+    def testRepeatings(self):
+        "Repeating periods"
+        rnd = random.Random(7)
+        for n in xrange(200):
+            self._checkSame(self._repeatings(rnd, rnd.randint(0, 40)),
+                            self._repeatings(rnd, rnd.randint(0, 40)))
+
+    def testSinglePeriods(self):
+        "Single periods, back to back or spanning several days"
+        p1 = Period(datetime(2012, 3, 1, 8), datetime(2012, 3, 1, 9))
+        p2 = Period(datetime(2012, 3, 1, 9), datetime(2012, 3, 1, 10))
+        p3 = Period(datetime(2012, 2, 28, 8, 30), datetime(2012, 3, 2, 8, 45))
+        self._checkSame([p1], [p2])
+        self._checkSame([p1], [p3])
+        self._checkSame([p3], [p1, p2])
+        self.assertEquals(list(findOverlappingPeriods([p3], [p1, p2])), [(0, 0)])
+
+
+class TestPostingLists(unittest.TestCase):
+    "Posting lists of trigrams, as used by the room booking indexes"
+
+    def setUp(self):
+        self.postings = PostingLists(IOTreeSet, intersection)
+        self.root = OOBTree()
+        self.root['Text'] = OOBTree()
+        self.root['Entries'] = IOBTree()
+
+    def _index(self, entryId, text):
+        self.postings.indexEntry(self.root, entryId, {'Text': trigrams(text)})
+
+    def _find(self, s):
+        values = self.postings.findSubstring(self.root['Text'], s)
+        return None if values is None else list(values)
+
+    def testFindSubstring(self):
+        self._index(1, 'group meeting')
+        self._index(2, 'interview')
+        self._index(3, 'meeting with the interview committee')
+        self.assertEquals(self._find('meeting'), [1, 3])
+        self.assertEquals(self._find('view'), [2, 3])
+        self.assertEquals(self._find('nothing'), [])
+        # too short to have trigrams
+        self.assertEquals(self._find('me'), None)
+
+    def testReindex(self):
+        self._index(1, 'group meeting')
+        self._index(2, 'seminar')
+        self._index(1, 'seminar')
+        self.assertEquals(self._find('meeting'), [])
+        self.assertEquals(self._find('seminar'), [1, 2])
+        # the trigrams no entry has any more are dropped
+        self.assertFalse('eet' in self.root['Text'])
+        self.postings.unindexEntry(self.root, 2)
+        self.assertEquals(self._find('seminar'), [1])
+        self.assertEquals(list(self.root['Entries'].keys()), [1])
+        # nothing to do for entries which are not indexed
+        self.postings.unindexEntry(self.root, 2)
+
+    def testIntersect(self):
+        sets = [IOTreeSet(range(10)), IOTreeSet([3, 5, 20]), IOTreeSet(range(4, 8))]
+        self.assertEquals(list(self.postings.intersect(sets)), [5])
+        self.assertEquals(list(self.postings.intersect(sets[:1])), range(10))
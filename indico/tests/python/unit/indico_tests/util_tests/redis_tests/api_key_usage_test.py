@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+##
+##
+## This file is part of Indico.
+## Copyright (C) 2002 - 2013 European Organization for Nuclear Research (CERN).
+##
+## Indico is free software; you can redistribute it and/or
+## modify it under the terms of the GNU General Public License as
+## published by the Free Software Foundation; either version 3 of the
+## License, or (at your option) any later version.
+##
+## Indico is distributed in the hope that it will be useful, but
+## WITHOUT ANY WARRANTY; without even the implied warranty of
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+## General Public License for more details.
+##
+## You should have received a copy of the GNU General Public License
+## along with Indico;if not, see <http://www.gnu.org/licenses/>.
+import os
+from indico.tests.python.unit.util import IndicoTestCase
+import indico.util.redis.api_key_usage as api_key_usage
+
+
+# skip tests if redis is not available
+def setup_module():
+    import nose
+    if not os.path.exists('/usr/sbin/redis-server'):
+        raise nose.SkipTest
+    try:
+        import redis
+    except ImportError:
+        raise nose.SkipTest
+
+
+class MockAPIKey(object):
+    def __init__(self, key):
+        self.key = key
+
+    def getKey(self):
+        return self.key
+
+
+class TestAPIKeyUsage(IndicoTestCase):
+    _requires = ['redis.Redis']
+
+    def testGetEmpty(self):
+        self.assertEqual(api_key_usage.get_usage(client=self._redis), {})
+
+    def testRecordAndGet(self):
+        ak1 = MockAPIKey('key1')
+        ak2 = MockAPIKey('key2')
+        self.assertTrue(api_key_usage.record_usage(ak1, '127.0.0.1', '/export/categ/0', 'from=today', True,
+                                                   client=self._redis))
+        api_key_usage.record_usage(ak1, '127.0.0.2', '/export/categ/1', '', False, client=self._redis)
+        api_key_usage.record_usage(ak2, None, '/export/event/1', 'detail=contributions', True, client=self._redis)
+
+        usage = api_key_usage.get_usage(client=self._redis)
+        self.assertEqual(frozenset(usage), frozenset(['key1', 'key2']))
+        self.assertEqual(usage['key1']['count'], 2)
+        self.assertEqual(usage['key1']['ip'], '127.0.0.2')
+        self.assertEqual(usage['key1']['path'], '/export/categ/1')
+        self.assertEqual(usage['key1']['query'], '')
+        self.assertFalse(usage['key1']['authenticated'])
+        self.assertEqual(usage['key2']['count'], 1)
+        self.assertEqual(usage['key2']['ip'], None)
+        self.assertTrue(usage['key2']['authenticated'])
+
+        # confirming the usage removes everything from redis
+        api_key_usage.confirm_usage(client=self._redis)
+        self.assertFalse(self._redis.keys())
+        self.assertEqual(api_key_usage.get_usage(client=self._redis), {})
+
+    def testUnconfirmed(self):
+        ak = MockAPIKey('key1')
+        api_key_usage.record_usage(ak, '127.0.0.1', '/export/categ/0', '', True, client=self._redis)
+        self.assertEqual(api_key_usage.get_usage(client=self._redis)['key1']['count'], 1)
+        # new uses are kept apart from the usage which is being written
+        api_key_usage.record_usage(ak, '127.0.0.2', '/export/categ/1', '', True, client=self._redis)
+        api_key_usage.record_usage(ak, '127.0.0.2', '/export/categ/1', '', True, client=self._redis)
+        # a failed flush gets the same usage again
+        usage = api_key_usage.get_usage(client=self._redis)
+        self.assertEqual(usage['key1']['count'], 1)
+        self.assertEqual(usage['key1']['ip'], '127.0.0.1')
+        api_key_usage.confirm_usage(client=self._redis)
+        self.assertEqual(api_key_usage.get_usage(client=self._redis)['key1']['count'], 2)
+        api_key_usage.confirm_usage(client=self._redis)
+        self.assertEqual(api_key_usage.get_usage(client=self._redis), {})
@@ -0,0 +1,239 @@
+# -*- coding: utf-8 -*-
+##
+##
+## This file is part of Indico.
+## Copyright (C) 2002 - 2013 European Organization for Nuclear Research (CERN).
+##
+## Indico is free software; you can redistribute it and/or
+## modify it under the terms of the GNU General Public License as
+## published by the Free Software Foundation; either version 3 of the
+## License, or (at your option) any later version.
+##
+## Indico is distributed in the hope that it will be useful, but
+## WITHOUT ANY WARRANTY; without even the implied warranty of
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+## General Public License for more details.
+##
+## You should have received a copy of the GNU General Public License
+## along with Indico;if not, see <http://www.gnu.org/licenses/>.
+
+"""
+Tests for the (streamed) responses of the WSGI request object
+"""
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from datetime import datetime
+from wsgiref.util import setup_testing_defaults, FileWrapper
+
+from indico.web.wsgi.indico_wsgi_handler import SimulatedModPythonRequest
+from indico.web.wsgi.indico_wsgi_handler_utils import _check_result, \
+     DeferredChunkedResponse
+from indico.web.wsgi.indico_wsgi_file_handler import stream_file, \
+     DeferredFileResponse
+from indico.web.wsgi.webinterface_handler_config import SERVER_RETURN, \
+     HTTP_NOT_MODIFIED, HTTP_PARTIAL_CONTENT, HTTP_RANGE_NOT_SATISFIABLE
+from indico.web.rh.file import set_file_headers, send_file
+
+
+class FakeFile(object):
+
+    def __init__(self, path):
+        self._path = path
+
+    def getFilePath(self):
+        return self._path
+
+    def getFileName(self):
+        return os.path.basename(self._path)
+
+
+class TestResponse(unittest.TestCase):
+
+    def setUp(self):
+        self.environ = {}
+        setup_testing_defaults(self.environ)
+        self.written = []
+        self.started = []
+
+        def start_response(status, headers, exc_info=None):
+            self.started.append(status)
+            return self.written.append
+
+        self.req = SimulatedModPythonRequest(self.environ, start_response)
+
+    def testBuffer(self):
+        self.req.write('<html>', flush=0)
+        self.req.write(u'\xe9t\xe9', flush=0)
+        self.assertEqual(self.req.get_buffer(), '<html>\xc3\xa9t\xc3\xa9')
+        self.assertEqual(self.written, [])
+        self.req.flush()
+        self.assertEqual(self.written, ['<html>\xc3\xa9t\xc3\xa9'])
+        self.assertEqual(self.req.get_buffer(), '')
+        self.assertEqual(self.req.bytes_sent, 11)
+
+    def testStream(self):
+        self.req.stream(('x' * 10 for i in xrange(10)), chunk_size=25)
+        self.assertEqual(self.written, ['x' * 30, 'x' * 30, 'x' * 30, 'x' * 10])
+        self.assertEqual(self.started, ['200 OK'])
+
+    def testCheckResultChunks(self):
+        def generate():
+            yield '<html><body>'
+            for i in xrange(3):
+                yield '<p>%d</p>' % i
+            yield u'</body></html>'
+
+        _check_result(self.req, generate())
+        self.assertEqual(self.req.content_type, 'text/html')
+        self.assertEqual(''.join(self.written),
+                         '<html><body><p>0</p><p>1</p><p>2</p></body></html>')
+
+    def testCheckResultDeferred(self):
+        generated = []
+        closed = []
+
+        def generate():
+            for i in xrange(3):
+                generated.append(i)
+                yield '<p>%d</p>' % i
+
+        response = DeferredChunkedResponse(generate(), lambda: closed.append(True))
+        # nothing is generated before the response is written
+        self.assertEqual(generated, [])
+        _check_result(self.req, response)
+        self.assertEqual(generated, [0, 1, 2])
+        self.assertEqual(''.join(self.written), '<p>0</p><p>1</p><p>2</p>')
+        self.assertEqual(closed, [True])
+
+    def testCheckResultDeferredHead(self):
+        closed = []
+        self.environ['REQUEST_METHOD'] = 'HEAD'
+        response = DeferredChunkedResponse(iter(['<p>0</p>']), lambda: closed.append(True))
+        _check_result(self.req, response)
+        self.assertEqual(self.written, [])
+        self.assertEqual(closed, [True])
+
+    def testCheckResultString(self):
+        _check_result(self.req, 'plain text')
+        self.assertEqual(self.req.content_type, 'text/plain')
+        self.assertEqual(self.written, ['plain text'])
+
+
+class TestSendFile(unittest.TestCase):
+
+    def setUp(self):
+        self.environ = {}
+        setup_testing_defaults(self.environ)
+        self.written = []
+
+        def start_response(status, headers, exc_info=None):
+            return self.written.append
+
+        self.start_response = start_response
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'slides.pdf')
+        with open(self.path, 'wb') as f:
+            f.write(''.join(chr(i % 256) for i in xrange(1000)))
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def _request(self, headers={}, file_wrapper=True):
+        for name, value in headers.iteritems():
+            self.environ['HTTP_' + name.upper().replace('-', '_')] = value
+        if file_wrapper:
+            self.environ['wsgi.file_wrapper'] = FileWrapper
+        else:
+            self.environ.pop('wsgi.file_wrapper', None)
+        self.req = SimulatedModPythonRequest(self.environ, self.start_response)
+        return self.req
+
+    def testFileWrapper(self):
+        req = self._request()
+        stream_file(req, self.path, x_sendfile=False)
+        # nothing is read until the server iterates the wrapper
+        self.assertEqual(self.written, [])
+        wrapper = req.pop_file_wrapper()
+        self.assertEqual(''.join(wrapper), open(self.path, 'rb').read())
+        self.assertEqual(req.headers_out['Content-Length'], '1000')
+
+    def testWriteAfterFile(self):
+        req = self._request()
+        req.sendfile(self.path)
+        req.write('trailer')
+        self.assertEqual(req.pop_file_wrapper(), None)
+        self.assertEqual(''.join(self.written), open(self.path, 'rb').read() + 'trailer')
+
+    def testRange(self):
+        req = self._request({'Range': 'bytes=10-19'}, file_wrapper=False)
+        stream_file(req, self.path, x_sendfile=False)
+        self.assertEqual(req.status, 206)
+        self.assertEqual(''.join(self.written), open(self.path, 'rb').read()[10:20])
+        self.assertEqual(req.headers_out['Content-Range'], 'bytes 10-19/1000')
+
+    def testNotModified(self):
+        mtime = os.path.getmtime(self.path)
+        since = time.strftime('%a, %d %b %Y %X GMT', time.gmtime(mtime))
+        req = self._request({'If-Modified-Since': since})
+        try:
+            stream_file(req, self.path, x_sendfile=False)
+        except SERVER_RETURN, status:
+            self.assertEqual(int(str(status)), HTTP_NOT_MODIFIED)
+        else:
+            self.fail('the file was sent again')
+
+    def testETag(self):
+        req = self._request({'If-None-Match': '"1234"'})
+        self.assertRaises(SERVER_RETURN, stream_file, req, self.path,
+                          etag='"1234"', x_sendfile=False)
+        req = self._request({'If-None-Match': '"5678"'})
+        stream_file(req, self.path, etag='"1234"', x_sendfile=False)
+        self.assertEqual(req.headers_out['ETag'], '"1234"')
+        self.assertNotEqual(req.pop_file_wrapper(), None)
+
+    def testDeferred(self):
+        req = self._request(file_wrapper=False)
+        response = stream_file(req, self.path, x_sendfile=False, deferred=True)
+        self.assertTrue(isinstance(response, DeferredFileResponse))
+        # only the headers are set, until the response is sent
+        self.assertEqual(self.written, [])
+        self.assertEqual(req.headers_out['Content-Length'], '1000')
+        _check_result(req, response)
+        self.assertEqual(''.join(self.written), open(self.path, 'rb').read())
+
+    def _sendFile(self, req):
+        set_file_headers(req, 'slides.pdf', self.path, datetime.now(), 'PDF',
+                         size=1000)
+        result = send_file(req, FakeFile(self.path))
+        self.assertEqual(self.written, [])
+        _check_result(req, result)
+        return result
+
+    def testSendFileRange(self):
+        req = self._request({'Range': 'bytes=990-'}, file_wrapper=False)
+        self._sendFile(req)
+        self.assertEqual(req.status, HTTP_PARTIAL_CONTENT)
+        self.assertEqual(req.headers_out['Content-Length'], '10')
+        self.assertEqual(req.headers_out['Content-Range'], 'bytes 990-999/1000')
+        self.assertEqual(''.join(self.written), open(self.path, 'rb').read()[990:])
+
+    def testSendFileNotModified(self):
+        mtime = os.path.getmtime(self.path)
+        since = time.strftime('%a, %d %b %Y %X GMT', time.gmtime(mtime))
+        req = self._request({'If-Modified-Since': since})
+        self.assertEqual(self._sendFile(req), "")
+        self.assertEqual(req.status, HTTP_NOT_MODIFIED)
+        # not the length of the file, which is not sent
+        self.assertEqual(req.headers_out.get('Content-Length'), None)
+        self.assertEqual(''.join(self.written), '')
+
+    def testSendFileRangeNotSatisfiable(self):
+        req = self._request({'Range': 'bytes=2000-'})
+        self.assertEqual(self._sendFile(req), "")
+        self.assertEqual(req.status, HTTP_RANGE_NOT_SATISFIABLE)
+        self.assertEqual(req.headers_out.get('Content-Length'), None)
+        self.assertEqual(''.join(self.written), '')
@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+##
+##
+## This file is part of Indico.
+## Copyright (C) 2002 - 2013 European Organization for Nuclear Research (CERN).
+##
+## Indico is free software; you can redistribute it and/or
+## modify it under the terms of the GNU General Public License as
+## published by the Free Software Foundation; either version 3 of the
+## License, or (at your option) any later version.
+##
+## Indico is distributed in the hope that it will be useful, but
+## WITHOUT ANY WARRANTY; without even the implied warranty of
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+## General Public License for more details.
+##
+## You should have received a copy of the GNU General Public License
+## along with Indico;if not, see <http://www.gnu.org/licenses/>.
+
+"""
+Tests for the route table of the legacy publisher
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from indico.web.wsgi.indico_wsgi_route_table import LegacyHandler, LegacyModule, \
+     LegacyRouteTable
+from MaKaC.common import general
+
+
+MODULE = """
+calls = []
+
+def index(req, **params):
+    calls.append(params)
+    return 'index'
+
+def display(req, confId, view='standard'):
+    return (confId, view)
+"""
+
+
+class TestLegacyHandler(unittest.TestCase):
+
+    def setUp(self):
+        def display(req, confId, view='standard'):
+            return (confId, view)
+
+        def index(req, **params):
+            return params
+
+        self.display = LegacyHandler('display', display)
+        self.index = LegacyHandler('index', index)
+
+    def testBindAll(self):
+        form = {'confId': '1', 'anything': 'else'}
+        self.assertEqual(self.index(None, form), form)
+
+    def testBindExact(self):
+        self.assertEqual(self.display(None, {'confId': '1'}), ('1', 'standard'))
+        self.assertEqual(self.display(None, {'confId': '1', 'view': 'nicecompact'}),
+                         ('1', 'nicecompact'))
+
+    def testBindWrong(self):
+        # unexpected arguments are dropped, missing ones are None
+        self.assertEqual(self.display(None, {'confId': '1', 'foo': 'bar'}),
+                         ('1', 'standard'))
+        self.assertEqual(self.display(None, {}), (None, 'standard'))
+
+
+class TestLegacyModule(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'conferenceDisplay.py')
+        with open(self.path, 'w') as f:
+            f.write(MODULE)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def testHandlers(self):
+        module = LegacyModule(self.path)
+        index = module.getHandler('index')
+        self.assertEqual(index(None, {'confId': '1'}), 'index')
+        self.assertEqual(module.getHandler('display')(None, {'confId': '1'}),
+                         ('1', 'standard'))
+        # the module was executed only once
+        self.assertEqual(module.getHandler('index'), index)
+        self.assertEqual(module._globals['calls'], [{'confId': '1'}])
+        self.assertEqual(module.getHandler('calls'), None)
+        self.assertEqual(module.getHandler('nonexistent'), None)
+
+    def testStale(self):
+        module = LegacyModule(self.path)
+        self.assertFalse(module.isStale())
+        os.utime(self.path, (0, 0))
+        self.assertTrue(module.isStale())
+
+
+class TestLegacyRouteTable(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'conferenceDisplay.py')
+        with open(self.path, 'w') as f:
+            f.write(MODULE)
+        self._development = general.DEVELOPMENT
+
+    def tearDown(self):
+        general.DEVELOPMENT = self._development
+        shutil.rmtree(self.dir)
+
+    def testDevelopment(self):
+        # the modules are executed on every request, so that they reload
+        # their request handlers
+        general.DEVELOPMENT = 1
+        table = LegacyRouteTable()
+        table.preload(self.dir, {})
+        self.assertEqual(table._modules, {})
+        table.getHandler(self.path, 'index')(None, {})
+        handler = table.getHandler(self.path, 'index')
+        self.assertNotEqual(table.getModule(self.path),
+                            table.getModule(self.path))
+        self.assertEqual(handler._func.func_globals['calls'], [])
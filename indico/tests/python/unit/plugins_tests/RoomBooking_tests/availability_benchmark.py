@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+##
+##
+## This file is part of Indico.
+## Copyright (C) 2002 - 2013 European Organization for Nuclear Research (CERN).
+##
+## Indico is free software; you can redistribute it and/or
+## modify it under the terms of the GNU General Public License as
+## published by the Free Software Foundation; either version 3 of the
+## License, or (at your option) any later version.
+##
+## Indico is distributed in the hope that it will be useful, but
+## WITHOUT ANY WARRANTY; without even the implied warranty of
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+## General Public License for more details.
+##
+## You should have received a copy of the GNU General Public License
+## along with Indico;if not, see <http://www.gnu.org/licenses/>.
+
+"""
+Benchmark of the room availability check used by the room search, on a
+synthetic dataset of 1000 rooms and 200000 reservations, comparing the
+per-room collision checks with the bulk RoomAvailability engine.
+
+Run it directly: python availability_benchmark.py [rooms] [reservations]
+"""
+
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+from MaKaC.rb_tools import Period, doesPeriodOverlap
+from MaKaC.rb_reservation import RepeatabilityEnum
+from MaKaC.plugins.RoomBooking.default.availability import RoomAvailability
+
+
+class FakeRoom(object):
+    locationName = 'Universe'
+
+    def __init__(self, id):
+        self.id = id
+        self.guid = 'Universe|%d' % id
+
+
+class FakeReservation(object):
+    locationName = 'Universe'
+    isRejected = False
+    isCancelled = False
+    isConfirmed = True
+
+    def __init__(self, room, startDT, endDT, repeatability=None):
+        self.room = room
+        self.startDT = startDT
+        self.endDT = endDT
+        self.repeatability = repeatability
+
+    def dayIsExcluded(self, day):
+        return False
+
+    def splitToPeriods(self, endDT=None):
+        if self.repeatability is None:
+            return [Period(self.startDT, self.endDT)]
+        step = timedelta(RepeatabilityEnum.rep2diff[self.repeatability])
+        duration = datetime.combine(self.startDT.date(), self.endDT.time()) - self.startDT
+        periods = []
+        start = self.startDT
+        while start <= self.endDT and (endDT is None or start <= endDT):
+            periods.append(Period(start, start + duration))
+            start += step
+        return periods
+
+
+class InMemoryRoomAvailability(RoomAvailability):
+    def __init__(self, resvEx, dayIndex):
+        self._dayIndex = dayIndex
+        RoomAvailability.__init__(self, resvEx)
+
+    def _getDayReservationsIndex(self):
+        return self._dayIndex
+
+    def _getBlockings(self, startDate, endDate):
+        return []
+
+
+def generateData(numRooms, numResvs, firstDay):
+    rooms = [FakeRoom(i) for i in xrange(numRooms)]
+    dayIndex = {}
+    roomDayIndex = {}
+    rnd = random.Random(42)
+    for i in xrange(numResvs):
+        room = rnd.choice(rooms)
+        start = datetime.combine(firstDay + timedelta(rnd.randint(0, 364)), datetime.min.time()) + \
+            timedelta(hours=rnd.randint(7, 18))
+        duration = timedelta(minutes=30 * rnd.randint(1, 6))
+        if rnd.random() < 0.1:
+            repeatability = rnd.choice((RepeatabilityEnum.daily, RepeatabilityEnum.onceAWeek))
+            end = start + timedelta(rnd.randint(7, 60)) + duration
+        else:
+            repeatability = None
+            end = start + duration
+        resv = FakeReservation(room, start, end, repeatability)
+        for period in resv.splitToPeriods():
+            day = period.startDT.date()
+            dayIndex.setdefault(day, []).append(resv)
+            roomDayIndex.setdefault((room.id, day), []).append(resv)
+    return rooms, dayIndex, roomDayIndex
+
+
+def isAvailablePerRoom(room, resvEx, roomDayIndex):
+    """What room.isAvailable(resvEx) does, for each room"""
+    candidatePeriods = resvEx.splitToPeriods()
+    resvs = set()
+    for period in candidatePeriods:
+        resvs.update(roomDayIndex.get((room.id, period.startDT.date()), ()))
+    for resv in resvs:
+        for colliderPeriod in resv.splitToPeriods(endDT=resvEx.endDT):
+            for candidatePeriod in candidatePeriods:
+                if doesPeriodOverlap(candidatePeriod, colliderPeriod):
+                    return False
+    return True
+
+
+def run(name, func):
+    ts = time.time()
+    result = func()
+    print "%-16s %8.3f s" % (name, time.time() - ts)
+    return result
+
+
+def main():
+    numRooms = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    numResvs = int(sys.argv[2]) if len(sys.argv) > 2 else 200000
+    firstDay = datetime(2013, 1, 1).date()
+
+    print "Generating %d rooms and %d reservations..." % (numRooms, numResvs)
+    rooms, dayIndex, roomDayIndex = generateData(numRooms, numResvs, firstDay)
+
+    # "Find a free room on Tuesdays from 10 to 12 for three months"
+    resvEx = FakeReservation(None, datetime(2013, 3, 5, 10), datetime(2013, 6, 4, 12),
+                             RepeatabilityEnum.onceAWeek)
+
+    perRoom = run("per room", lambda: [room for room in rooms
+                                       if isAvailablePerRoom(room, resvEx, roomDayIndex)])
+
+    def bulk():
+        availability = InMemoryRoomAvailability(resvEx, dayIndex)
+        return [room for room in rooms if availability.isAvailable(room)]
+    bulkResult = run("bulk", bulk)
+
+    assert perRoom == bulkResult
+    print "%d of %d rooms are free" % (len(bulkResult), numRooms)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+##
+##
+## This file is part of Indico.
+## Copyright (C) 2002 - 2013 European Organization for Nuclear Research (CERN).
+##
+## Indico is free software; you can redistribute it and/or
+## modify it under the terms of the GNU General Public License as
+## published by the Free Software Foundation; either version 3 of the
+## License, or (at your option) any later version.
+##
+## Indico is distributed in the hope that it will be useful, but
+## WITHOUT ANY WARRANTY; without even the implied warranty of
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+## General Public License for more details.
+##
+## You should have received a copy of the GNU General Public License
+## along with Indico;if not, see <http://www.gnu.org/licenses/>.
+
+import unittest
+from datetime import datetime, timedelta
+
+from MaKaC.plugins.RoomBooking.default.reservationStats import ReservationCounters
+
+
+class TestReservationCounters(unittest.TestCase):
+    "Reservation counters - live/archival split over time"
+
+    now = datetime(2013, 6, 1, 12)
+
+    def setUp(self):
+        self._counters = ReservationCounters()
+        self._counters.add(self.now - timedelta(10), 'Valid')
+        self._counters.add(self.now - timedelta(10), 'Cancelled')
+        self._counters.add(self.now + timedelta(1), 'Valid')
+        self._counters.add(self.now + timedelta(2), 'Valid')
+        self._counters.add(self.now + timedelta(2), 'Rejected')
+
+    def _check(self, now, **expected):
+        stats = dict.fromkeys(['liveValid', 'liveCancelled', 'liveRejected',
+                               'archivalValid', 'archivalCancelled', 'archivalRejected'], 0)
+        stats.update(expected)
+        self.assertEquals(self._counters.getStats(now), stats)
+
+    def testStats(self):
+        "Reservations become archival when they end"
+        self._check(self.now, liveValid=2, liveRejected=1, archivalValid=1, archivalCancelled=1)
+        self._check(self.now + timedelta(1, 1), liveValid=1, liveRejected=1, archivalValid=2,
+                    archivalCancelled=1)
+
+    def testArchive(self):
+        "Archiving does not change the stats"
+        self._counters.archive(self.now + timedelta(1, 1))
+        self._check(self.now + timedelta(1, 1), liveValid=1, liveRejected=1, archivalValid=2,
+                    archivalCancelled=1)
+        # a cancellation moves a reservation between counters
+        self._counters.add(self.now + timedelta(1), 'Valid', -1)
+        self._counters.add(self.now + timedelta(1), 'Cancelled')
+        self._check(self.now + timedelta(3), archivalValid=2, archivalCancelled=2, archivalRejected=1)
+
+    def testReconcile(self):
+        "Reconciling fixes wrong counters"
+        counts = {(self.now - timedelta(10), 'Valid'): 1,
+                  (self.now + timedelta(3), 'Rejected'): 2}
+        self.assertTrue(self._counters.reconcile(counts, self.now))
+        self._check(self.now, liveRejected=2, archivalValid=1)
+        self.assertFalse(self._counters.reconcile(counts, self.now))
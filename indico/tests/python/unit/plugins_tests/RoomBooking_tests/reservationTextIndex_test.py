@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+##
+##
+## This file is part of Indico.
+## Copyright (C) 2002 - 2013 European Organization for Nuclear Research (CERN).
+##
+## Indico is free software; you can redistribute it and/or
+## modify it under the terms of the GNU General Public License as
+## published by the Free Software Foundation; either version 3 of the
+## License, or (at your option) any later version.
+##
+## Indico is distributed in the hope that it will be useful, but
+## WITHOUT ANY WARRANTY; without even the implied warranty of
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+## General Public License for more details.
+##
+## You should have received a copy of the GNU General Public License
+## along with Indico;if not, see <http://www.gnu.org/licenses/>.
+
+from datetime import date
+
+from indico.tests.python.unit.util import with_context
+from indico.tests.python.unit.plugins_tests.RoomBooking_tests.util import RoomBookingTestCase
+from MaKaC.rb_location import Location
+from MaKaC.plugins.RoomBooking.default.reservation import Reservation
+from MaKaC.plugins.RoomBooking.default.reservationTextIndex import ReservationTextIndex, \
+     _RESERVATION_TEXT_INDEX
+
+
+class TestReservationTextIndex(RoomBookingTestCase):
+
+    def _createReservations(self):
+        day = date(2011, 1, 1)
+        self._resv1 = self._createResv(self._room1, self._avatar1, day, day)
+        self._resv1.reason = 'Group meeting'
+        self._resv2 = self._createResv(self._room2, self._avatar2, day, day)
+        self._resv2.reason = 'Interview'
+        self._resv3 = self._createResv(self._room3, self._avatar3, day, day)
+        self._resv3.reason = 'Meeting with the interview committee'
+        for resv in (self._resv1, self._resv2, self._resv3):
+            resv.update()
+        ReservationTextIndex.build()
+
+    def _example(self, **attrs):
+        resvEx = Location.getDefaultLocation().factory.newReservation()
+        for name, value in attrs.iteritems():
+            setattr(resvEx, name, value)
+        return resvEx
+
+    def _candidates(self, **attrs):
+        candidates = ReservationTextIndex.getCandidates(self._example(**attrs))
+        return None if candidates is None else sorted(candidates)
+
+    def _search(self, **attrs):
+        resvEx = self._example(**attrs)
+        resvs = Reservation.getReservations(resvExample=resvEx)
+        self.assertEqual(self._ids(resvs),
+                         self._ids(self._callWithout(_RESERVATION_TEXT_INDEX, Reservation.getReservations,
+                                                     resvExample=resvEx)))
+        return self._ids(resvs)
+
+    @with_context('database')
+    def testWords(self):
+        self._createReservations()
+        self.assertEqual(self._search(reason='meeting'), self._ids([self._resv1, self._resv3]))
+        # any of the words
+        self.assertEqual(self._candidates(reason='group interview'),
+                         self._ids([self._resv1, self._resv2, self._resv3]))
+        # the exact text if quoted
+        self.assertEqual(self._candidates(reason='"group meeting"'), self._ids([self._resv1]))
+        self.assertEqual(self._search(reason='"interview committee"'), self._ids([self._resv3]))
+        self.assertEqual(self._search(reason='nothing'), [])
+
+    @with_context('database')
+    def testFields(self):
+        self._createReservations()
+        self.assertEqual(self._search(bookedForName='fake-2'), self._ids([self._resv2]))
+        # the fields are indexed separately, and combined
+        self.assertEqual(self._candidates(reason='fake'), [])
+        self.assertEqual(self._candidates(reason='meeting', contactEmail='fake3@'),
+                         self._ids([self._resv3]))
+        self._resv1.contactEmail = 'someone@example.com'
+        self._resv1.update()
+        self.assertEqual(self._search(contactEmail='someone@'), self._ids([self._resv1]))
+        self.assertEqual(self._search(contactEmail='fake1@'), [])
+
+    @with_context('database')
+    def testShortQueries(self):
+        self._createReservations()
+        # not enough for a trigram: the index can't narrow the search down
+        self.assertEqual(self._candidates(reason='me'), None)
+        self.assertEqual(self._candidates(reason='meeting in'), None)
+        self.assertEqual(self._search(reason='in'), self._ids([self._resv1, self._resv2, self._resv3]))
+
+    @with_context('database')
+    def testUpdate(self):
+        self._createReservations()
+        self._resv1.reason = 'Seminar'
+        self._resv1.update()
+        self.assertEqual(self._search(reason='seminar'), self._ids([self._resv1]))
+        self.assertEqual(self._candidates(reason='meeting'), self._ids([self._resv3]))
+        self._resv3.remove()
+        self.assertEqual(self._candidates(reason='meeting'), [])
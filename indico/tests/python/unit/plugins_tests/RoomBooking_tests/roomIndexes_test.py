@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+##
+##
+## This file is part of Indico.
+## Copyright (C) 2002 - 2013 European Organization for Nuclear Research (CERN).
+##
+## Indico is free software; you can redistribute it and/or
+## modify it under the terms of the GNU General Public License as
+## published by the Free Software Foundation; either version 3 of the
+## License, or (at your option) any later version.
+##
+## Indico is distributed in the hope that it will be useful, but
+## WITHOUT ANY WARRANTY; without even the implied warranty of
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+## General Public License for more details.
+##
+## You should have received a copy of the GNU General Public License
+## along with Indico;if not, see <http://www.gnu.org/licenses/>.
+
+from indico.tests.python.unit.util import with_context
+from indico.tests.python.unit.plugins_tests.RoomBooking_tests.util import RoomBookingTestCase
+from MaKaC.rb_location import Location
+from MaKaC.plugins.RoomBooking.default.room import Room
+from MaKaC.plugins.RoomBooking.default.roomIndexes import RoomIndexes, _ROOM_INDEXES
+
+
+class TestRoomIndexes(RoomBookingTestCase):
+
+    def _checkSearch(self, **kwargs):
+        rooms = Room.getRooms(**kwargs)
+        self.assertEqual(self._ids(rooms),
+                         self._ids(self._callWithout(_ROOM_INDEXES, Room.getRooms, **kwargs)))
+        return self._ids(rooms)
+
+    def _example(self, **attrs):
+        roomEx = Location.getDefaultLocation().factory.newRoom()
+        for name, value in attrs.iteritems():
+            setattr(roomEx, name, value)
+        return roomEx
+
+    @with_context('database')
+    def testFreeText(self):
+        RoomIndexes.build()
+        self.assertEqual(self._checkSearch(freeText='dummyroom3'), [self._room3.id])
+        self.assertEqual(self._checkSearch(freeText='nowhere 1234'), self._ids(self._rooms))
+        self.assertEqual(self._checkSearch(freeText='nothing'), [])
+        # too short to be narrowed down
+        self.assertEqual(RoomIndexes.getCandidates(freeText='a'), None)
+        self._checkSearch(freeText='a')
+
+    @with_context('database')
+    def testResponsible(self):
+        RoomIndexes.build()
+        # rooms 1, 3, 5 and 7 are the ones of fake-1
+        self.assertEqual(self._checkSearch(freeText='fake-1'),
+                         self._ids([self._room1, self._room3, self._room5, self._room7]))
+        self.assertEqual(sorted(RoomIndexes.getCandidates(freeText='fake2@')),
+                         self._ids([self._room2, self._room4, self._room6]))
+        # the rooms are not saved again when their responsible changes
+        self._avatar2.setEmail('someone.else@example.org')
+        self.assertEqual(self._checkSearch(freeText='someone.else'),
+                         self._ids([self._room2, self._room4, self._room6]))
+        self.assertEqual(self._checkSearch(freeText='fake2@'), [])
+        # nor when they change responsible
+        self._room1.responsibleId = 'rb-fake-3'
+        self._room1.update()
+        self.assertEqual(self._checkSearch(freeText='fake3@'), [self._room1.id])
+
+    @with_context('database')
+    def testCapacity(self):
+        self._room1.capacity = 100
+        self._room1.update()
+        RoomIndexes.build()
+        # within 20% unless it is a minimum
+        self.assertEqual(sorted(RoomIndexes.getCandidates(roomEx=self._example(capacity=90))),
+                         [self._room1.id])
+        self.assertEqual(self._checkSearch(roomExample=self._example(capacity=9)),
+                         self._ids(self._rooms[1:]))
+        self.assertEqual(self._checkSearch(roomExample=self._example(capacity=50), minCapacity=True),
+                         [self._room1.id])
+
+    @with_context('database')
+    def testEquipment(self):
+        RoomIndexes.build()
+        self._room2.setEquipment(['Video projector', 'Whiteboard'])
+        self._room2.update()
+        roomEx = self._example()
+        roomEx.setEquipment(['projector'])
+        self.assertEqual(sorted(RoomIndexes.getCandidates(roomEx=roomEx)), [self._room2.id])
+        self.assertEqual(self._checkSearch(roomExample=roomEx), [self._room2.id])
+        self._room2.setEquipment([])
+        self._room2.update()
+        self.assertEqual(self._checkSearch(roomExample=roomEx), [])
+
+    @with_context('database')
+    def testName(self):
+        RoomIndexes.build()
+        self._room1.name = 'Auditorium'
+        self._room1.update()
+        self.assertEqual(list(RoomIndexes.getByName('DummyRoom1')), [])
+        self.assertEqual(list(RoomIndexes.getByName('Auditorium')), [self._room1.id])
+        self.assertEqual(Room.getRooms(roomName='Auditorium'), self._room1)
+        self._room1.remove()
+        self.assertEqual(list(RoomIndexes.getByName('Auditorium')), [])
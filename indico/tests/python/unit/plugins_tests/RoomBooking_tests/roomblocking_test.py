@@ -21,13 +21,10 @@
 # pylint: disable-all
 
 from indico.tests.env import *
-from indico.tests.python.unit.util import IndicoTestFeature, IndicoTestCase, with_context
-from MaKaC.user import AvatarHolder, Avatar, Group, GroupHolder, LoginInfo
-from MaKaC.authentication import AuthenticatorMgr
-from MaKaC.common.info import HelperMaKaCInfo
-from MaKaC.common import Configuration
-from MaKaC.plugins.RoomBooking.CERN.dalManagerCERN import DALManagerCERN
-from MaKaC.plugins.RoomBooking.CERN.initialize import initializeRoomBookingDB
+from indico.tests.python.unit.util import IndicoTestCase, with_context
+from indico.tests.python.unit.plugins_tests.RoomBooking_tests.util import RoomBooking_Feature, \
+     RoomBookingTestCase
+from MaKaC.user import Group, GroupHolder
 from MaKaC.rb_location import Location
 from datetime import date, datetime, time, timedelta
 from MaKaC.rb_reservation import RepeatabilityEnum
@@ -37,107 +34,6 @@ from MaKaC.common.mail import GenericMailer
 from MaKaC.plugins.RoomBooking.rb_roomblocking import RoomBlockingBase
 
 
-class RoomBooking_Feature(IndicoTestFeature):
-    _requires = ['db.DummyUser', 'plugins.Plugins']
-
-    def start(self, obj):
-        super(RoomBooking_Feature, self).start(obj)
-
-        with obj._context('database'):
-            # Tell indico to use the current database for roombooking stuff
-            minfo = HelperMaKaCInfo.getMaKaCInfoInstance()
-            cfg = Configuration.Config.getInstance()
-            minfo.setRoomBookingDBConnectionParams(cfg.getDBConnectionParams())
-
-            obj._ph.getById('RoomBooking').setActive(True)
-
-            DALManagerCERN.connect()
-            initializeRoomBookingDB("Universe", force=False)
-            DALManagerCERN.disconnect()
-            # do not use the method for it as it tries to re-create jsvars and fails
-            minfo._roomBookingModuleActive = True
-            DALManagerCERN.connect()
-
-            # Create dummy avatars in obj._avatarN
-            ah = AvatarHolder()
-            obj._avatars = []
-            for i in xrange(1, 5):
-                avatar = Avatar()
-                avatar.setName("fake-%d" % i)
-                avatar.setSurName("fake")
-                avatar.setOrganisation("fake")
-                avatar.setLang("en_GB")
-                avatar.setEmail("fake%d@fake.fake" % i)
-                avatar.setId("rb-fake-%d" % i)
-
-                # setting up the login info
-                li = LoginInfo("fake-%d" % i, "fake-%d" % i)
-                ih = AuthenticatorMgr()
-                userid = ih.createIdentity(li, avatar, "Local")
-                ih.add(userid)
-
-                # activate the account
-                avatar.activateAccount()
-
-                ah.add(avatar)
-                obj._avatars.append(avatar)
-                setattr(obj, '_avatar%d' % i, avatar)
-
-            # Create dummy rooms in obj._roomN - owners are fake1 and fake2 (r1 has f1, r2 has f2, r3 has f1, ...)
-            location = Location.getDefaultLocation()
-            obj._rooms = []
-            for i in xrange(1, 8):
-                room = location.newRoom()
-                room.locationName = location.friendlyName
-                room.name = 'DummyRoom%d' % i
-                room.site = 'a'
-                room.building = 1
-                room.floor = 'b'
-                room.roomNr = 'c'
-                room.latitude = ''
-                room.longitude = ''
-                room.isActive = True
-                room.isReservable = True
-                room.resvsNeedConfirmation = False
-                room.responsibleId = 'rb-fake-%d' % (((i - 1) % 2) + 1)
-                room.whereIsKey = 'Nowhere'
-                room.telephone = '123456789'
-                room.capacity = 10
-                room.division = ''
-                room.surfaceArea = 50
-                room.comments = ''
-                room.setEquipment([])
-                room.setAvailableVC([])
-                room.insert()
-                obj._rooms.append(room)
-                setattr(obj, '_room%d' % i, room)
-
-
-class RoomBookingTestCase(IndicoTestCase):
-    _requires = ['db.DummyUser', RoomBooking_Feature]
-
-    def _createResv(self, room, user, startDate, endDate, pre=False):
-        resv = Location.getDefaultLocation().factory.newReservation()
-        resv.room = room
-        resv.startDT = datetime.combine(startDate, time(8, 30))
-        resv.endDT = datetime.combine(endDate, time(17, 30))
-        if startDate != endDate:
-            resv.repeatability = RepeatabilityEnum.daily
-        resv.reason = ''
-        resv.needsAVCSupport = False
-        resv.usesAVC = False
-        resv.createdDT = datetime.now()
-        resv.createdBy = str(user.getId())
-        resv.bookedForName = user.getFullName()
-        resv.contactEmail = user.getEmail()
-        resv.contactPhone = user.getTelephone()
-        resv.isRejected = False
-        resv.isCancelled = False
-        resv.isConfirmed = True if not pre else None
-        resv.insert()
-        return resv
-
-
 class TestRoomBookingDBSetup(IndicoTestCase):
     _requires = [RoomBooking_Feature]
 
@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+##
+##
+## This file is part of Indico.
+## Copyright (C) 2002 - 2013 European Organization for Nuclear Research (CERN).
+##
+## Indico is free software; you can redistribute it and/or
+## modify it under the terms of the GNU General Public License as
+## published by the Free Software Foundation; either version 3 of the
+## License, or (at your option) any later version.
+##
+## Indico is distributed in the hope that it will be useful, but
+## WITHOUT ANY WARRANTY; without even the implied warranty of
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+## General Public License for more details.
+##
+## You should have received a copy of the GNU General Public License
+## along with Indico;if not, see <http://www.gnu.org/licenses/>.
+
+"""
+Fixtures shared by the room booking tests
+"""
+
+from datetime import datetime, time
+
+from indico.tests.python.unit.util import IndicoTestFeature, IndicoTestCase
+from MaKaC.user import AvatarHolder, Avatar, LoginInfo
+from MaKaC.authentication import AuthenticatorMgr
+from MaKaC.common.info import HelperMaKaCInfo
+from MaKaC.common import Configuration
+from MaKaC.plugins.RoomBooking.CERN.dalManagerCERN import DALManagerCERN
+from MaKaC.plugins.RoomBooking.CERN.initialize import initializeRoomBookingDB
+from MaKaC.plugins.RoomBooking.default.factory import Factory
+from MaKaC.rb_location import Location
+from MaKaC.rb_reservation import RepeatabilityEnum
+
+
+class RoomBooking_Feature(IndicoTestFeature):
+    _requires = ['db.DummyUser', 'plugins.Plugins']
+
+    def start(self, obj):
+        super(RoomBooking_Feature, self).start(obj)
+
+        with obj._context('database'):
+            # Tell indico to use the current database for roombooking stuff
+            minfo = HelperMaKaCInfo.getMaKaCInfoInstance()
+            cfg = Configuration.Config.getInstance()
+            minfo.setRoomBookingDBConnectionParams(cfg.getDBConnectionParams())
+
+            obj._ph.getById('RoomBooking').setActive(True)
+
+            DALManagerCERN.connect()
+            initializeRoomBookingDB("Universe", force=False)
+            DALManagerCERN.disconnect()
+            # do not use the method for it as it tries to re-create jsvars and fails
+            minfo._roomBookingModuleActive = True
+            DALManagerCERN.connect()
+
+            # Create dummy avatars in obj._avatarN
+            ah = AvatarHolder()
+            obj._avatars = []
+            for i in xrange(1, 5):
+                avatar = Avatar()
+                avatar.setName("fake-%d" % i)
+                avatar.setSurName("fake")
+                avatar.setOrganisation("fake")
+                avatar.setLang("en_GB")
+                avatar.setEmail("fake%d@fake.fake" % i)
+                avatar.setId("rb-fake-%d" % i)
+
+                # setting up the login info
+                li = LoginInfo("fake-%d" % i, "fake-%d" % i)
+                ih = AuthenticatorMgr()
+                userid = ih.createIdentity(li, avatar, "Local")
+                ih.add(userid)
+
+                # activate the account
+                avatar.activateAccount()
+
+                ah.add(avatar)
+                obj._avatars.append(avatar)
+                setattr(obj, '_avatar%d' % i, avatar)
+
+            # Create dummy rooms in obj._roomN - owners are fake1 and fake2 (r1 has f1, r2 has f2, r3 has f1, ...)
+            location = Location.getDefaultLocation()
+            obj._rooms = []
+            for i in xrange(1, 8):
+                room = location.newRoom()
+                room.locationName = location.friendlyName
+                room.name = 'DummyRoom%d' % i
+                room.site = 'a'
+                room.building = 1
+                room.floor = 'b'
+                room.roomNr = 'c'
+                room.latitude = ''
+                room.longitude = ''
+                room.isActive = True
+                room.isReservable = True
+                room.resvsNeedConfirmation = False
+                room.responsibleId = 'rb-fake-%d' % (((i - 1) % 2) + 1)
+                room.whereIsKey = 'Nowhere'
+                room.telephone = '123456789'
+                room.capacity = 10
+                room.division = ''
+                room.surfaceArea = 50
+                room.comments = ''
+                room.setEquipment([])
+                room.setAvailableVC([])
+                room.insert()
+                obj._rooms.append(room)
+                setattr(obj, '_room%d' % i, room)
+
+
+class RoomBookingTestCase(IndicoTestCase):
+    _requires = ['db.DummyUser', RoomBooking_Feature]
+
+    def _createResv(self, room, user, startDate, endDate, pre=False):
+        resv = Location.getDefaultLocation().factory.newReservation()
+        resv.room = room
+        resv.startDT = datetime.combine(startDate, time(8, 30))
+        resv.endDT = datetime.combine(endDate, time(17, 30))
+        if startDate != endDate:
+            resv.repeatability = RepeatabilityEnum.daily
+        resv.reason = ''
+        resv.needsAVCSupport = False
+        resv.usesAVC = False
+        resv.createdDT = datetime.now()
+        resv.createdBy = str(user.getId())
+        resv.bookedForName = user.getFullName()
+        resv.contactEmail = user.getEmail()
+        resv.contactPhone = user.getTelephone()
+        resv.isRejected = False
+        resv.isCancelled = False
+        resv.isConfirmed = True if not pre else None
+        resv.insert()
+        return resv
+
+    def _ids(self, objs):
+        return sorted(obj.id for obj in objs)
+
+    def _callWithout(self, branch, func, *args, **kwargs):
+        """
+        Calls func without the given branch of the room booking database
+        root, e.g. to search without an index
+        """
+        dalRoot = Factory.getDALManager().getRoot()
+        value = dalRoot[branch]
+        del dalRoot[branch]
+        try:
+            return func(*args, **kwargs)
+        finally:
+            dalRoot[branch] = value
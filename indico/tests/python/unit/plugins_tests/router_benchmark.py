@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+##
+##
+## This file is part of Indico.
+## Copyright (C) 2002 - 2013 European Organization for Nuclear Research (CERN).
+##
+## Indico is free software; you can redistribute it and/or
+## modify it under the terms of the GNU General Public License as
+## published by the Free Software Foundation; either version 3 of the
+## License, or (at your option) any later version.
+##
+## Indico is distributed in the hope that it will be useful, but
+## WITHOUT ANY WARRANTY; without even the implied warranty of
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+## General Public License for more details.
+##
+## You should have received a copy of the GNU General Public License
+## along with Indico;if not, see <http://www.gnu.org/licenses/>.
+"""
+Benchmark of the dispatch of plugin URLs, comparing a linear scan over all
+the registered patterns with PluginURLRouter, for increasing numbers of
+plugin routes.
+
+Run it directly: python router_benchmark.py [requests]
+"""
+
+import re
+import sys
+import time
+
+from MaKaC.plugins.base import PluginURLRouter
+
+
+def makeRHMap(numRoutes):
+    rhMap = {}
+    for i in xrange(numRoutes):
+        # a few routes per plugin, as the real ones
+        prefix = 'Plugin%d' % (i / 4)
+        url = [r'^/%s/(?P<filepath>.*)$', r'^/%s/admin/?$',
+               r'^/%s/display/?$', r'^/%s/(?P<confId>\w+)/manage$'][i % 4] % prefix
+        rhMap[re.compile(url)] = i
+    return rhMap
+
+
+def linearScan(rhMap, path):
+    for urlRE, rh in rhMap.iteritems():
+        m = urlRE.match(path)
+        if m:
+            return rh, m
+    return None, None
+
+
+def run(name, numRequests, func, paths):
+    ts = time.time()
+    for i in xrange(numRequests):
+        func(paths[i % len(paths)])
+    return (time.time() - ts) / numRequests * 1e6
+
+
+def main():
+    numRequests = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+
+    print "%8s %18s %18s %18s %18s" % ('routes', 'scan hit (us)', 'router hit (us)',
+                                       'scan miss (us)', 'router miss (us)')
+    for numRoutes in [10, 50, 100, 500, 1000]:
+        rhMap = makeRHMap(numRoutes)
+        router = PluginURLRouter(rhMap)
+        hits = ['/Plugin%d/admin' % i for i in xrange(0, numRoutes / 4, 3)]
+        # legacy pages and static files are the most common misses
+        misses = ['/conferenceDisplay.py', '/css/Default.css', '/images/logo.png']
+        results = [run('scan', numRequests, lambda path: linearScan(rhMap, path), hits),
+                   run('router', numRequests, router.match, hits),
+                   run('scan', numRequests, lambda path: linearScan(rhMap, path), misses),
+                   run('router', numRequests, router.match, misses)]
+        print "%8d %18.2f %18.2f %18.2f %18.2f" % tuple([numRoutes] + results)
+
+
+if __name__ == '__main__':
+    main()
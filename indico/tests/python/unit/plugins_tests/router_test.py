@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+##
+##
+## This file is part of Indico.
+## Copyright (C) 2002 - 2013 European Organization for Nuclear Research (CERN).
+##
+## Indico is free software; you can redistribute it and/or
+## modify it under the terms of the GNU General Public License as
+## published by the Free Software Foundation; either version 3 of the
+## License, or (at your option) any later version.
+##
+## Indico is distributed in the hope that it will be useful, but
+## WITHOUT ANY WARRANTY; without even the implied warranty of
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+## General Public License for more details.
+##
+## You should have received a copy of the GNU General Public License
+## along with Indico;if not, see <http://www.gnu.org/licenses/>.
+import re
+import unittest
+
+from MaKaC.plugins.base import PluginURLRouter
+
+
+class TestPluginURLRouter(unittest.TestCase):
+
+    def setUp(self):
+        self.rhMap = {}
+        for name, url in [('collabFile', r"^/Collaboration/(?:(?P<plugin>[^\s/]+)/)?(?P<filepath>[^\s/]+)$"),
+                          ('collabAdmin', r'^/Collaboration/admin'),
+                          ('search', r"^/search/?$"),
+                          ('chat', r'^/confModifChat.py$'),
+                          ('epayment', r"^/epayment/(?P<filepath>.*)$")]:
+            self.rhMap[re.compile(url)] = name
+        self.router = PluginURLRouter(self.rhMap)
+
+    def testMatch(self):
+        for path, expected in [('/Collaboration/Vidyo/vidyo.png', 'collabFile'),
+                               ('/Collaboration/admin/plugins', 'collabAdmin'),
+                               ('/search', 'search'),
+                               ('/search/', 'search'),
+                               ('/confModifChat.py', 'chat'),
+                               ('/epayment/', 'epayment')]:
+            rh, m = self.router.match(path)
+            self.assertEqual(rh, expected, path)
+        rh, m = self.router.match('/epayment/images/logo.png')
+        self.assertEqual(m.groupdict(), {'filepath': 'images/logo.png'})
+
+    def testNoMatch(self):
+        for path in ['/', '/searching', '/Collaboration', '/confModifChat.pyc',
+                     '/categoryDisplay.py']:
+            self.assertEqual(self.router.match(path), (None, None), path)
+
+    def testSameAsLinearScan(self):
+        for path in ['/Collaboration/admin', '/Collaboration/a/b', '/search/x',
+                     '/confModifChatXpy', '/epayment']:
+            expected = [rh for urlRE, rh in self.rhMap.iteritems() if urlRE.match(path)]
+            rh, m = self.router.match(path)
+            self.assertEqual(rh, expected[0] if expected else None, path)
+        self.assertEqual(len(self.router), len(self.rhMap))
@@ -31,9 +31,12 @@ import logging
 import inspect
 import re
 import zope.interface
+from collections import OrderedDict
 from types import NoneType
 from itertools import ifilter
 
+from indico.util.contextManager import ContextManager
+
 
 def fossilizes(*classList):
     """
@@ -65,6 +68,42 @@ def clearCache():
     Fossilizable.clearCache()
 
 
+class AttributeCache(object):
+    """
+    Bounded LRU cache of the method results of already fossilized objects,
+    keyed by object (class and `_p_oid`). It lives in the `ContextManager`,
+    so it only lasts for the request which created it.
+    """
+
+    def __init__(self, maxSize=1000):
+        self._maxSize = maxSize
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, methodName):
+        entry = self._entries.get(key)
+        if entry is None or methodName not in entry:
+            self.misses += 1
+            raise KeyError(methodName)
+        self.hits += 1
+        # mark the entry as the most recently used one
+        del self._entries[key]
+        self._entries[key] = entry
+        return entry[methodName]
+
+    def set(self, key, methodName, value):
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = self._entries[key] = {}
+            if len(self._entries) > self._maxSize:
+                self._entries.popitem(last=False)
+        entry[methodName] = value
+
+
 class NonFossilizableException(Exception):
     """
     Object is not fossilizable (doesn't implement Fossilizable)
@@ -93,9 +132,9 @@ class Fossilizable(object):
     __methodNameRE = re.compile('^get(\w+)|(has\w+)|(is\w+)$')
     __methodNameCache = {}
     __fossilNameCache = {}
-    __fossilInterfaceCache = {}
-    __fossilAttrsCache = {} # Attribute Cache for Fossils with
-                            # fields that are repeated
+    __fossilPlanCache = {}
+    # number of objects kept in the attribute cache
+    attrCacheSize = 1000
 
     @classmethod
     def __extractName(cls, name):
@@ -194,12 +233,28 @@ class Fossilizable(object):
         return interface
 
 
+    @classmethod
+    def __getAttrCache(cls, create=False):
+        """
+        Returns the attribute cache of the current request (context)
+        """
+        cache = ContextManager.get('fossilAttrCache', None)
+        if cache is None and create:
+            cache = ContextManager.set('fossilAttrCache', AttributeCache(cls.attrCacheSize))
+        return cache
+
     @classmethod
     def clearCache(cls):
         """
-        Clears the fossil attribute cache
+        Clears the fossil attribute cache, logging how useful it was
         """
-        cls.__fossilAttrsCache = {}
+        cache = cls.__getAttrCache()
+        if cache is None:
+            return
+        if cache.hits or cache.misses:
+            logging.getLogger('indico.fossilize').debug(
+                "Attribute cache: %d hits, %d misses, %d objects" % (cache.hits, cache.misses, len(cache)))
+        ContextManager.set('fossilAttrCache', None)
 
 
     @classmethod
@@ -252,6 +307,69 @@ class Fossilizable(object):
         return self.fossilize_obj(self, interfaceArg=interfaceArg, useAttrCache=useAttrCache,
                                   **kwargs)
 
+    @classmethod
+    def __compileFossil(cls, interface):
+        """
+        Turns a fossil interface into a "plan" that can be applied to any
+        object providing it: a list with one step per method, containing
+        everything that does not depend on the object being fossilized
+        (tagged values, converter arguments, target attribute names).
+        Plans are built only once per interface.
+        """
+
+        plan = cls.__fossilPlanCache.get(interface)
+        if plan is not None:
+            return plan
+
+        steps = []
+        for methodName in interface.names(all=True):
+            method = interface[methodName]
+            tags = method.getTaggedValueTags()
+
+            produce = method.getTaggedValue('produce') if 'produce' in tags else None
+            filterName = method.getTaggedValue('filterBy') if 'filterBy' in tags else None
+            resultInterface = method.getTaggedValue('result') if 'result' in tags else None
+
+            if 'convert' in tags:
+                convertFunction = method.getTaggedValue('convert')
+                converterArgNames = tuple(inspect.getargspec(convertFunction)[0])
+            else:
+                convertFunction = converterArgNames = None
+
+            # Re-name the attribute produced by the method
+            # In case the name contains dots, each of the 'domains' but the
+            # last one are translated into nested dictionnaries. For example,
+            # if we want to re-name an attribute into "foo.bar.tofu", the
+            # corresponding fossilized attribute will be of the form:
+            # {"foo":{"bar":{"tofu": res,...},...},...}
+            # instead of:
+            # {"foo.bar.tofu": res, ...}
+            if 'name' in tags:
+                methodPath = attributePath = tuple(method.getTaggedValue('name').split('.'))
+            else:
+                # plain attributes keep their name; methods get it
+                # 'de-camelcased', which is only possible for valid names
+                attributePath = (methodName,)
+                try:
+                    methodPath = tuple(cls.__extractName(methodName).split('.'))
+                except InvalidFossilException:
+                    methodPath = None
+
+            steps.append((methodName, produce, filterName, resultInterface,
+                          convertFunction, converterArgNames, methodPath, attributePath))
+
+        plan = (cls.__extractFossilName(interface.getName()), steps)
+        cls.__fossilPlanCache[interface] = plan
+        return plan
+
+    @classmethod
+    def clearPlanCache(cls):
+        """
+        Clears the compiled fossil plans (only useful if fossil interfaces
+        are modified after having been used)
+        """
+        cls.__fossilPlanCache = {}
+
     @classmethod
     def fossilize_obj(cls, obj, interfaceArg=None, useAttrCache=False, mapClassType={}, **kwargs):
         """
@@ -265,40 +383,36 @@ class Fossilizable(object):
         """
 
         interface = cls.__obtainInterface(obj, interfaceArg)
-
-        name = interface.getName()
-        fossilName = cls.__extractFossilName(name)
+        fossilName, steps = cls.__compileFossil(interface)
 
         result = {}
+        attrCache = cacheKey = None
+        if useAttrCache:
+            # only persistent objects can be identified reliably
+            oid = getattr(obj, '_p_oid', None)
+            if oid is not None:
+                attrCache = cls.__getAttrCache(create=True)
+                cacheKey = (obj.__class__, oid)
 
-        # cache method names for each interface
-        names = cls.__fossilInterfaceCache.get(interface)
-        if names is None:
-            names = interface.names(all=True)
-            cls.__fossilInterfaceCache[interface] = names
-        ###
-
-        for methodName in names:
-
-            method = interface[methodName]
+        for (methodName, produce, filterName, resultInterface,
+             convertFunction, converterArgNames, methodPath, attributePath) in steps:
 
-            tags = method.getTaggedValueTags()
             isAttribute = False
 
             # In some cases it is better to use the attribute cache to
             # speed up the fossilization
             cacheUsed = False
-            if useAttrCache:
+            if attrCache is not None:
                 try:
-                    methodResult = cls.__fossilAttrsCache[obj._p_oid][methodName]
+                    methodResult, isAttribute = attrCache.get(cacheKey, methodName)
                     cacheUsed = True
                 except KeyError:
                     pass
             if not cacheUsed:
                 # Please use 'produce' as little as possible;
                 # there is almost always a more elegant and modular solution!
-                if 'produce' in tags:
-                    methodResult = method.getTaggedValue('produce')(obj)
+                if produce is not None:
+                    methodResult = produce(obj)
                 else:
                     attr = getattr(obj, methodName)
                     if callable(attr):
@@ -312,13 +426,12 @@ class Fossilizable(object):
                         methodResult = attr
                         isAttribute = True
 
-                if hasattr(obj, "_p_oid"):
-                    cls.__fossilAttrsCache.setdefault(obj._p_oid, {})[methodName] = methodResult
+                if attrCache is not None:
+                    attrCache.set(cacheKey, methodName, (methodResult, isAttribute))
 
-            if 'filterBy' in tags:
+            if filterName is not None:
                 if 'filters' not in kwargs:
                     raise Exception('No filters defined!')
-                filterName = method.getTaggedValue('filterBy')
 
                 if filterName in kwargs['filters']:
                     filterBy = kwargs['filters'][filterName]
@@ -328,17 +441,13 @@ class Fossilizable(object):
                 filterBy = None
 
             # Result conversion
-            if 'result' in tags:
-                targetInterface = method.getTaggedValue('result')
-                #targetInterface = globals()[targetInterfaceName]
-
+            if resultInterface is not None:
                 methodResult = Fossilizable.fossilizeIterable(
-                    methodResult, targetInterface, filterBy=filterBy, mapClassType=mapClassType, **kwargs)
+                    methodResult, resultInterface, useAttrCache, filterBy=filterBy, mapClassType=mapClassType,
+                    **kwargs)
 
             # Conversion function
-            if 'convert' in tags:
-                convertFunction = method.getTaggedValue('convert')
-                converterArgNames = inspect.getargspec(convertFunction)[0]
+            if convertFunction is not None:
                 converterArgs = dict((name, kwargs[name])
                                      for name in converterArgNames
                                      if name in kwargs)
@@ -349,34 +458,22 @@ class Fossilizable(object):
                                                                 (obj, interfaceArg, methodName))
                     raise
 
-
-            # Re-name the attribute produced by the method
-            if 'name' in tags:
-                attrName = method.getTaggedValue('name')
-            elif isAttribute:
-                attrName = methodName
+            if isAttribute:
+                path = attributePath
+            elif methodPath is not None:
+                path = methodPath
             else:
-                attrName = cls.__extractName(methodName)
+                # raises the appropriate InvalidFossilException
+                path = (cls.__extractName(methodName),)
 
-            # In case the name contains dots, each of the 'domains' but the
-            # last one are translated into nested dictionnaries. For example,
-            # if we want to re-name an attribute into "foo.bar.tofu", the
-            # corresponding fossilized attribute will be of the form:
-            # {"foo":{"bar":{"tofu": res,...},...},...}
-            # instead of:
-            # {"foo.bar.tofu": res, ...}
-
-            current = result
-            attrList = attrName.split('.')
-
-            while len(attrList) > 1:
-                attr = attrList.pop(0)
-                if attr not in current:
-                    current[attr] = {}
-                current = current[attr]
-
-            # For the last attribute level
-            current[attrList[0]] = methodResult
+            if len(path) == 1:
+                result[path[0]] = methodResult
+            else:
+                current = result
+                for attr in path[:-1]:
+                    current = current.setdefault(attr, {})
+                # For the last attribute level
+                current[path[-1]] = methodResult
 
         if "_type" in result or "_fossil" in result:
             raise InvalidFossilException('"_type" or "_fossil"'
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+##
+##
+## This file is part of Indico.
+## Copyright (C) 2002 - 2013 European Organization for Nuclear Research (CERN).
+##
+## Indico is free software; you can redistribute it and/or
+## modify it under the terms of the GNU General Public License as
+## published by the Free Software Foundation; either version 3 of the
+## License, or (at your option) any later version.
+##
+## Indico is distributed in the hope that it will be useful, but
+## WITHOUT ANY WARRANTY; without even the implied warranty of
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+## General Public License for more details.
+##
+## You should have received a copy of the GNU General Public License
+## along with Indico;if not, see <http://www.gnu.org/licenses/>.
+
+"""
+Buffer for API key usage information.
+
+Instead of writing to the `APIKey` object on every HTTP API request, usage
+is accumulated in redis and written to the database in batches by the
+`APIKeyUsageTask`.
+"""
+
+import time
+from datetime import datetime
+from indico.util.redis import scripts
+from indico.util.redis import client as redis_client
+
+
+def record_usage(ak, ip, path, query, authenticated, client=None):
+    """Records a use of the API key. Returns False if it could not be buffered."""
+    if client is None:
+        client = redis_client
+    res = scripts.api_key_usage_add(ak.getKey(), int(time.time()), ip or '', path or '', query or '',
+                                    int(bool(authenticated)), client=client)
+    return res is not None
+
+
+def get_usage(client=None):
+    """Returns the buffered usage information.
+
+    The usage is moved out of the buffer and kept until `confirm_usage` is
+    called once it has been written to the database; until then the same
+    usage is returned again (new uses are buffered separately).
+
+    The result is a dict mapping API keys to dicts containing the number of
+    uses (`count`) and the details of the most recent use.
+    """
+    if client is None:
+        client = redis_client
+    res = scripts.api_key_usage_get(client=client)
+    if not res:
+        return {}
+    return dict((key, {'count': int(data['count']),
+                       'dt': datetime.fromtimestamp(int(data['ts'])),
+                       'ip': data['ip'] or None,
+                       'path': data['path'],
+                       'query': data['query'],
+                       'authenticated': data['authenticated'] == '1'})
+                for key, data in res.iteritems())
+
+
+def confirm_usage(client=None):
+    """Removes the usage returned by `get_usage` after it has been written."""
+    if client is None:
+        client = redis_client
+    scripts.api_key_usage_confirm(client=client)
@@ -0,0 +1,11 @@
+-- args=6
+-- vim: ts=4 sw=4 et
+local key = ARGV[1]
+
+local api_key_usage_key = 'api-key-usage/usage:'..key
+
+redis.call('HINCRBY', api_key_usage_key, 'count', 1)
+redis.call('HMSET', api_key_usage_key, 'ts', ARGV[2], 'ip', ARGV[3], 'path', ARGV[4], 'query', ARGV[5],
+           'authenticated', ARGV[6])
+redis.call('SADD', 'api-key-usage/keys', key)
+return 1
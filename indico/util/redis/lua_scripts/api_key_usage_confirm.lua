@@ -0,0 +1,9 @@
+-- args=0
+-- vim: ts=4 sw=4 et
+local pending_keys = 'api-key-usage/pending-keys'
+
+for _, key in ipairs(redis.call('SMEMBERS', pending_keys)) do
+    redis.call('DEL', 'api-key-usage/pending:'..key)
+end
+redis.call('DEL', pending_keys)
+return 1
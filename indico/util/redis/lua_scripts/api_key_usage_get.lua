@@ -0,0 +1,31 @@
+-- result=json, args=0
+-- vim: ts=4 sw=4 et
+local pending_keys = 'api-key-usage/pending-keys'
+
+-- usage fetched before but not confirmed (the flush failed) is returned again
+if redis.call('EXISTS', pending_keys) == 0 then
+    if redis.call('EXISTS', 'api-key-usage/keys') == 0 then
+        return cjson.encode({})
+    end
+    for _, key in ipairs(redis.call('SMEMBERS', 'api-key-usage/keys')) do
+        local api_key_usage_key = 'api-key-usage/usage:'..key
+        if redis.call('EXISTS', api_key_usage_key) == 1 then
+            redis.call('RENAME', api_key_usage_key, 'api-key-usage/pending:'..key)
+        end
+    end
+    redis.call('RENAME', 'api-key-usage/keys', pending_keys)
+end
+
+local res = {}
+for _, key in ipairs(redis.call('SMEMBERS', pending_keys)) do
+    local data = redis.call('HGETALL', 'api-key-usage/pending:'..key)
+    if #data > 0 then
+        local usage = {}
+        for i = 1, #data, 2 do
+            usage[data[i]] = data[i + 1]
+        end
+        res[key] = usage
+    end
+end
+
+return cjson.encode(res)
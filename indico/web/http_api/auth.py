@@ -106,13 +106,21 @@ class APIKey(Persistent):
     def setPersistentAllowed(self, val):
         self._persistentAllowed = val
 
-    def used(self, ip, path, query, authenticated):
-        self._lastUsedDT = datetime.datetime.now()
-        self._lastUsedIP = ip
-        self._lastPath = path
-        self._lastQuery = query
-        self._lastUseAuthenticated = authenticated
-        self._useCount += 1
+    def used(self, ip, path, query, authenticated, dt=None, count=1):
+        """Records `count` uses of the key, the last one being at `dt`.
+
+        Buffered usage may be flushed out of order, so the details of the
+        last use are only updated if they are more recent.
+        """
+        if dt is None:
+            dt = datetime.datetime.now()
+        if self._lastUsedDT is None or dt >= self._lastUsedDT:
+            self._lastUsedDT = dt
+            self._lastUsedIP = ip
+            self._lastPath = path
+            self._lastQuery = query
+            self._lastUseAuthenticated = authenticated
+        self._useCount += count
 
     def newKey(self):
         akh = APIKeyHolder()
@@ -43,6 +43,7 @@ from indico.web.wsgi import webinterface_handler_config as apache
 from indico.web.http_api.metadata.serializer import Serializer
 from indico.util.network import _get_remote_ip
 from indico.util.contextManager import ContextManager
+from indico.util.redis import api_key_usage
 from indico.modules.oauth.errors import OAuthError
 from indico.modules.oauth.components import OAuthUtils
 
@@ -53,6 +54,7 @@ from MaKaC.common.fossilize import fossilize
 from MaKaC.accessControl import AccessWrapper
 from MaKaC.common.info import HelperMaKaCInfo
 from MaKaC.common.cache import GenericCache
+from MaKaC.common.accessCache import AccessCache
 from MaKaC.plugins.RoomBooking.default.factory import Factory
 
 
@@ -126,6 +128,7 @@ def buildAW(ak, req, onlyPublic=False):
 def handler(req, **params):
     ContextManager.destroy()
     ContextManager.set('currentReq', req)
+    AccessCache.enable()
     logger = Logger.get('httpapi')
     path, query = req.URLFields['PATH_INFO'], req.URLFields['QUERY_STRING']
     if req.method == 'POST':
@@ -247,13 +250,18 @@ def handler(req, **params):
         # TODO: usage page
         raise apache.SERVER_RETURN, apache.HTTP_NOT_FOUND
     else:
-        if ak and error is None:
+        normPath, normQuery = normalizeQuery(path, query, remove=('signature', 'timestamp'), separate=True)
+        usageBuffered = False
+        if ak and error is None and req.method != 'POST' and Config.getInstance().getRedisConnectionURL():
+            # Read-only request; the key usage is written to the DB later by the APIKeyUsageTask
+            usageBuffered = api_key_usage.record_usage(ak, _get_remote_ip(req), normPath, normQuery, not onlyPublic)
+
+        if ak and error is None and not usageBuffered:
             # Commit only if there was an API key and no error
             for _retry in xrange(10):
                 dbi.sync()
                 if minfo.getRoomBookingModuleActive():
                     Factory.getDALManager().sync()
-                normPath, normQuery = normalizeQuery(path, query, remove=('signature', 'timestamp'), separate=True)
                 ak.used(_get_remote_ip(req), normPath, normQuery, not onlyPublic)
                 try:
                     if minfo.getRoomBookingModuleActive():
@@ -265,7 +273,7 @@ def handler(req, **params):
                     break
         else:
             # No need to commit stuff if we didn't use an API key
-            # (nothing was written)
+            # or buffered its usage (nothing was written)
             if minfo.getRoomBookingModuleActive():
                 Factory.getDALManager().rollback()
                 Factory.getDALManager().disconnect()
@@ -17,19 +17,33 @@
 ## You should have received a copy of the GNU General Public License
 ## along with Indico;if not, see <http://www.gnu.org/licenses/>.
 
+import hashlib
+import os
 import time
 from MaKaC.common import Config
+from MaKaC.errors import NotFoundError
 from email.Utils import formatdate
 
+from indico.web.wsgi.indico_wsgi_file_handler import stream_file
+from indico.web.wsgi.webinterface_handler_config import SERVER_RETURN, \
+     HTTP_NOT_FOUND
 
-def set_file_headers(req, fname, fpath, last_modified, ftype, data, size):
+
+def _isAndroid(req):
+    return req.headers_in['User-Agent'].find('Android') != -1
+
+
+def _useXSendFile(req):
+    return Config.getInstance().getUseXSendFile() and not _isAndroid(req)
+
+
+def set_file_headers(req, fname, fpath, last_modified, ftype, data=None, size=None):
     cfg = Config.getInstance()
 
     mimetype = cfg.getFileTypeMimeType(ftype)
     req.content_type = str(mimetype)
 
-    if 'User-Agent' in req.headers_in and \
-            req.headers_in['User-Agent'].find('Android') != -1:
+    if _isAndroid(req):
         dispos = "attachment"
     else:
         dispos = "inline"
@@ -40,7 +54,7 @@ def set_file_headers(req, fname, fpath, last_modified, ftype, data, size):
             "Content-Disposition": '{0}; filename="{1}"'.format(dispos, fname)
             })
 
-    if cfg.getUseXSendFile() and req.headers_in['User-Agent'].find('Android') == -1:
+    if _useXSendFile(req):
         # X-Send-File support makes it easier, just let the web server
         # do all the heavy lifting
 
@@ -48,9 +62,39 @@ def set_file_headers(req, fname, fpath, last_modified, ftype, data, size):
         req.send_x_file(fpath)
 
 
+def get_file_etag(fpath):
+    """
+    Returns an entity tag for the file, which changes whenever it is modified
+    """
+    stat = os.stat(fpath)
+    return '"%x-%x-%s"' % (stat.st_size, int(stat.st_mtime),
+                           hashlib.md5(fpath).hexdigest()[:8])
+
+
 def send_file(req, fdata):
-    cfg = Config.getInstance()
-    if cfg.getUseXSendFile() and req.headers_in['User-Agent'].find('Android') == -1:
+    """
+    Sends the file (after `set_file_headers`) without reading it into memory:
+    either the web server sends it (X-Sendfile) or it is streamed from disk,
+    honouring conditional (If-Modified-Since, If-None-Match) and range requests.
+    The file itself is returned as a DeferredFileResponse, which is only sent
+    once the request handler has finished (and committed)
+    """
+    if _useXSendFile(req):
+        return ""
+    fpath = fdata.getFilePath()
+    try:
+        return stream_file(req, fpath, fullname=fdata.getFileName(), mime=req.content_type,
+                           etag=get_file_etag(fpath),
+                           disposition='attachment' if _isAndroid(req) else 'inline',
+                           x_sendfile=False, deferred=True)
+    except OSError:
+        raise NotFoundError("The file you try to access does not exist.")
+    except SERVER_RETURN, status:
+        status = int(str(status))
+        if status == HTTP_NOT_FOUND:
+            raise NotFoundError("The file you try to access does not exist.")
+        # not modified, precondition failed, etc. - no content to send, so
+        # the length of the file (set_file_headers) does not apply
+        req.status = status
+        req.set_content_length(None)
         return ""
-    else:
-        return fdata.readBin()
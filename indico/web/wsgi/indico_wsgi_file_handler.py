@@ -17,6 +17,7 @@
 ## You should have received a copy of the GNU General Public License
 ## along with Indico;if not, see <http://www.gnu.org/licenses/>.
 
+import calendar
 import time
 import random
 import os
@@ -36,27 +37,52 @@ _mimes = MimeTypes(strict=False)
 _mimes.suffix_map.update({'.tbz2' : '.tar.bz2'})
 _mimes.encodings_map.update({'.bz2' : 'bzip2'})
 
-def stream_file(req, fullpath, fullname=None, mime=None, encoding=None, etag=None, md5=None, location=None):
+
+class DeferredFileResponse(object):
+    """
+    The body of a file response (see `stream_file`), which is only written
+    to the client when `send` is called. Request handlers return it instead
+    of sending the file themselves, since a request can be retried (ZODB
+    conflicts) until it is committed, and the file has to be sent once.
+    """
+
+    def __init__(self, send):
+        self.send = send
+
+
+def stream_file(req, fullpath, fullname=None, mime=None, encoding=None, etag=None, md5=None, location=None,
+                disposition='inline', x_sendfile=True, deferred=False):
     """This is a generic function to stream a file to the user.
     If fullname, mime, encoding, and location are not provided they will be
     guessed based on req and fullpath.
     md5 should be passed as an hexadecimal string.
+    X-Sendfile is used if enabled in the configuration, unless x_sendfile is False.
+    If deferred is True, only the response headers are set, and the file is
+    sent by the returned DeferredFileResponse.
     """
+    def respond(send):
+        if deferred:
+            return DeferredFileResponse(send)
+        send()
+        return ""
+
     def normal_streaming(size):
         req.set_content_length(size)
-        req.send_http_header()
-        if not req.header_only:
-            req.sendfile(fullpath)
-        return ""
+        def send():
+            req.send_http_header()
+            if not req.header_only:
+                req.sendfile(fullpath)
+        return respond(send)
 
     def single_range(size, the_range):
         req.set_content_length(the_range[1])
         req.headers_out['Content-Range'] = 'bytes %d-%d/%d' % (the_range[0], the_range[0] + the_range[1] - 1, size)
         req.status = apache.HTTP_PARTIAL_CONTENT
-        req.send_http_header()
-        if not req.header_only:
-            req.sendfile(fullpath, the_range[0], the_range[1])
-        return ""
+        def send():
+            req.send_http_header()
+            if not req.header_only:
+                req.sendfile(fullpath, the_range[0], the_range[1])
+        return respond(send)
 
     def multiple_ranges(size, ranges, mime):
         req.status = apache.HTTP_PARTIAL_CONTENT
@@ -72,18 +98,19 @@ def stream_file(req, fullpath, fullname=None, mime=None, encoding=None, etag=Non
             content_length += len('\r\n')
         content_length += len('--%s--\r\n' % boundary)
         req.set_content_length(content_length)
-        req.send_http_header()
-        if not req.header_only:
-            for arange in ranges:
-                req.write('--%s\r\n' % boundary, 0)
-                req.write('Content-Type: %s\r\n' % mime, 0)
-                req.write('Content-Range: bytes %d-%d/%d\r\n' % (arange[0], arange[0] + arange[1] - 1, size), 0)
-                req.write('\r\n', 0)
-                req.sendfile(fullpath, arange[0], arange[1])
-                req.write('\r\n', 0)
-            req.write('--%s--\r\n' % boundary)
-            req.flush()
-        return ""
+        def send():
+            req.send_http_header()
+            if not req.header_only:
+                for arange in ranges:
+                    req.write('--%s\r\n' % boundary, 0)
+                    req.write('Content-Type: %s\r\n' % mime, 0)
+                    req.write('Content-Range: bytes %d-%d/%d\r\n' % (arange[0], arange[0] + arange[1] - 1, size), 0)
+                    req.write('\r\n', 0)
+                    req.sendfile(fullpath, arange[0], arange[1])
+                    req.write('\r\n', 0)
+                req.write('--%s--\r\n' % boundary)
+                req.flush()
+        return respond(send)
 
     def parse_date(date):
         """According to <http://www.w3.org/Protocols/rfc2616/rfc2616-sec3.html#sec3.3>
@@ -100,11 +127,11 @@ def stream_file(req, fullpath, fullname=None, mime=None, encoding=None, etag=Non
         try:
             date = date.split(';')[0].strip() # Because of IE
             ## Sun, 06 Nov 1994 08:49:37 GMT
-            return time.mktime(time.strptime(date, '%a, %d %b %Y %X %Z'))
+            return calendar.timegm(time.strptime(date, '%a, %d %b %Y %X %Z'))
         except:
             try:
                 ## Sun, 06 Nov 1994 08:49:37 GMT
-                return time.mktime(time.strptime(date, '%A, %d-%b-%y %H:%M:%S %Z'))
+                return calendar.timegm(time.strptime(date, '%A, %d-%b-%y %H:%M:%S %Z'))
             except:
                 try:
                     ## Sun, 06 Nov 1994 08:49:37 GMT
@@ -194,7 +221,7 @@ def stream_file(req, fullpath, fullname=None, mime=None, encoding=None, etag=Non
                 ret[key] = value
         return ret
 
-    if Config.getInstance().getUseXSendFile():
+    if x_sendfile and Config.getInstance().getUseXSendFile():
         ## If XSendFile is supported by the server, let's use it.
         if os.path.exists(fullpath):
             return req.send_x_file(fullpath, fullname, mime)
@@ -209,7 +236,8 @@ def stream_file(req, fullpath, fullname=None, mime=None, encoding=None, etag=Non
             raise apache.SERVER_RETURN, apache.HTTP_PRECONDITION_FAILED
 
     if os.path.exists(fullpath):
-        mtime = os.path.getmtime(fullpath)
+        # the dates in the headers have a precision of seconds
+        mtime = int(os.path.getmtime(fullpath))
         if fullname is None:
             fullname = os.path.basename(fullpath)
         if mime is None:
@@ -229,7 +257,7 @@ def stream_file(req, fullpath, fullname=None, mime=None, encoding=None, etag=Non
             req.headers_out["ETag"] = etag
         if md5 is not None:
             req.headers_out["Content-MD5"] = base64.encodestring(binascii.unhexlify(md5.upper()))[:-1]
-        req.headers_out["Content-Disposition"] = 'inline; filename="%s"' % fullname.replace('"', '\\"')
+        req.headers_out["Content-Disposition"] = '%s; filename="%s"' % (disposition, fullname.replace('"', '\\"'))
         size = os.path.getsize(fullpath)
         if headers['if-modified-since'] and headers['if-modified-since'] >= mtime:
             raise apache.SERVER_RETURN, apache.HTTP_NOT_MODIFIED
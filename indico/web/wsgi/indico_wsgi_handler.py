@@ -41,13 +41,20 @@ from indico.web.wsgi.webinterface_handler_config import \
     REMOTE_HOST, REMOTE_NOLOOKUP
 from indico.web.wsgi.indico_wsgi_handler_utils import table, FieldStorage, \
      registerException, _check_result
-from indico.web.wsgi.indico_wsgi_url_parser import is_mp_legacy_publisher_path
+from indico.web.wsgi.indico_wsgi_url_parser import is_mp_legacy_publisher_path, \
+     SERVER_CONFIG
+from indico.web.wsgi.indico_wsgi_route_table import LegacyRouteTable
 
 # Legacy imports
 from MaKaC.plugins.base import RHMapMemory
 
 
 DIR_HTDOCS = None
+# streamed responses are written to the client in chunks of (at least) this size
+STREAM_CHUNK_SIZE = 64 * 1024
+# block size used to read the files sent with req.sendfile
+SENDFILE_BLOCK_SIZE = 64 * 1024
+LEGACY_ROUTES = LegacyRouteTable()
 
 def initialize_htdocs():
     global DIR_HTDOCS
@@ -78,6 +85,8 @@ def application(environ, start_response):
         start_response("501 Not Implemented", [], None)
         return ''
 
+    LEGACY_ROUTES.preload(initialize_htdocs(), SERVER_CONFIG.url_mappings)
+
     possible_module, possible_handler = is_mp_legacy_publisher_path(req)
 
     # The POST form processing has to be done after checking the path
@@ -99,17 +108,14 @@ def application(environ, start_response):
 
                 if not possible_static_path:
                     # maybe the url is owned by some plugin?
-                    pluginRHMap = RHMapMemory()._map
-
-                    for urlRE, rh in pluginRHMap.iteritems():
-                        m = urlRE.match(url)
-                        if m:
+                    rh, m = RHMapMemory()._router.match(url)
 
-                            if type(rh) == ClassType or RHHtdocs not in rh.mro():
-                                raise SERVER_RETURN, plugin_publisher(req, url, rh, m.groupdict())
-                            else:
-                                # calculate the path to the resource
-                                possible_static_path = rh.calculatePath(**m.groupdict())
+                    if rh is not None:
+                        if type(rh) == ClassType or RHHtdocs not in rh.mro():
+                            raise SERVER_RETURN, plugin_publisher(req, url, rh, m.groupdict())
+                        else:
+                            # calculate the path to the resource
+                            possible_static_path = rh.calculatePath(**m.groupdict())
 
 
                 if possible_static_path is not None:
@@ -118,6 +124,10 @@ def application(environ, start_response):
                     raise SERVER_RETURN, HTTP_NOT_FOUND
 
             req.flush()
+            # a file which is sent by the server itself (wsgi.file_wrapper)
+            file_wrapper = req.pop_file_wrapper()
+            if file_wrapper is not None:
+                return file_wrapper
         #Exception treatment
         except SERVER_RETURN, status:
             status = int(str(status))
@@ -201,19 +211,9 @@ def mp_legacy_publisher(req, possible_module, possible_handler):
     """
     mod_python legacy publisher minimum implementation.
     """
-    the_module = open(possible_module).read()
-    module_globals = {}
+    handler = LEGACY_ROUTES.getHandler(possible_module, possible_handler)
 
-    try:
-        exec(the_module, module_globals)
-    except:
-        # Log which file caused the exec error (traceback won't do it for
-        # some reason) and relaunch the exception
-        registerException('Error executing the module %s' % possible_module)
-        raise
-
-    if possible_handler in module_globals and \
-           callable(module_globals[possible_handler]):
+    if handler is not None:
         ## the req.form must be casted to dict because of Python 2.4 and earlier
         ## otherwise any object exposing the mapping interface can be
         ## used with the magic **
@@ -221,36 +221,7 @@ def mp_legacy_publisher(req, possible_module, possible_handler):
 
         _convert_to_string(form)
 
-        try:
-            return _check_result(req, module_globals[possible_handler](req, **form))
-        except TypeError, err:
-            if ("%s() got an unexpected keyword argument" % possible_handler) in \
-                   str(err) or ('%s() takes at least' % possible_handler) in str(err):
-                import inspect
-                inspected_args = inspect.getargspec(module_globals[possible_handler])
-                expected_args = list(inspected_args[0])
-                expected_defaults = list(inspected_args[3])
-                expected_args.reverse()
-                expected_defaults.reverse()
-                # Write the exception to Apache error log file
-                registerException("Wrong GET parameter set in calling a legacy "
-                                  "publisher handler for %s: expected_args=%s, "
-                                  "found_args=%s" % \
-                                  (possible_handler, repr(expected_args),
-                                   repr(req.form.keys())))
-                cleaned_form = {}
-                for index, arg in enumerate(expected_args):
-                    if arg == 'req':
-                        continue
-                    if index < len(expected_defaults):
-                        cleaned_form[arg] = form.get(arg, expected_defaults[index])
-                    else:
-                        cleaned_form[arg] = form.get(arg, None)
-                return _check_result(req,
-                                     module_globals[possible_handler](req,
-                                                                      **cleaned_form))
-            else:
-                raise
+        return _check_result(req, handler(req, form))
     else:
         raise SERVER_RETURN, HTTP_NOT_FOUND
 
@@ -276,7 +247,9 @@ class SimulatedModPythonRequest(object):
         self.__environ = environ
         self.__start_response = start_response
         self.__response_sent_p = False
-        self.__buffer = ''
+        self.__buffer = []
+        self.__buffer_size = 0
+        self.__file_wrapper = None
         self.__low_level_headers = []
         self.__headers = table(self.__low_level_headers)
         self.__headers.add = self.__headers.add_header
@@ -343,23 +316,39 @@ class SimulatedModPythonRequest(object):
         return self.__low_level_headers
 
     def get_buffer(self):
-        return self.__buffer
+        return ''.join(self.__buffer)
 
     def write(self, string, flush=1):
         if isinstance(string, unicode):
-            self.__buffer += string.encode('utf8')
-        else:
-            self.__buffer += string
+            string = string.encode('utf8')
+        self.__buffer.append(string)
+        self.__buffer_size += len(string)
         if flush:
             self.flush()
 
+    def stream(self, chunks, chunk_size=STREAM_CHUNK_SIZE):
+        """
+        Writes an iterable of strings to the client as it is consumed,
+        coalescing the small ones
+        """
+        for chunk in chunks:
+            self.write(chunk, flush=0)
+            if self.__buffer_size >= chunk_size:
+                self.flush()
+        self.flush()
+
     def flush(self):
         self.send_http_header()
-        if self.__buffer:
-            self.__bytes_sent += len(self.__buffer)
+        data = ''.join(self.__buffer)
+        self.__buffer = []
+        self.__buffer_size = 0
+        if data:
+            self.__bytes_sent += len(data)
             try:
                 if not self.__write_error:
-                    self.__write(self.__buffer)
+                    # whatever is written comes after the pending file
+                    self.__write_file_wrapper()
+                    self.__write(data)
             except IOError, err:
                 if "failed to write data" in str(err):
                     self.__write_error = True
@@ -369,7 +358,6 @@ class SimulatedModPythonRequest(object):
                     self.__write_error = True
                 else:
                     raise
-            self.__buffer = ''
 
     def set_content_type(self, content_type):
         self.__headers['content-type'] = content_type
@@ -441,28 +429,40 @@ class SimulatedModPythonRequest(object):
 
     def sendfile(self, path, offset=0, the_len=-1):
         try:
-            self.send_http_header()
-            file_to_send = open(path)
-            file_to_send.seek(offset)
-            file_wrapper = FileWrapper(file_to_send)
-            count = 0
-            if the_len < 0:
-                for chunk in file_wrapper:
-                    count += len(chunk)
-                    self.__bytes_sent += len(chunk)
-                    self.__write(chunk)
-            else:
-                for chunk in file_wrapper:
-                    if the_len >= len(chunk):
-                        the_len -= len(chunk)
+            self.flush()
+            file_to_send = open(path, 'rb')
+            if offset == 0 and the_len < 0 and 'wsgi.file_wrapper' in self.__environ:
+                # the whole file, the server can send it on its own (e.g. with
+                # sendfile(2)) once it gets it as the response iterable
+                self.__write_file_wrapper()
+                self.__file_wrapper = self.__environ['wsgi.file_wrapper'](
+                    file_to_send, SENDFILE_BLOCK_SIZE)
+                self.__bytes_sent += os.fstat(file_to_send.fileno()).st_size
+                return self.__bytes_sent
+            try:
+                self.__write_file_wrapper()
+                file_to_send.seek(offset)
+                file_wrapper = FileWrapper(file_to_send, SENDFILE_BLOCK_SIZE)
+                count = 0
+                if the_len < 0:
+                    for chunk in file_wrapper:
                         count += len(chunk)
                         self.__bytes_sent += len(chunk)
                         self.__write(chunk)
-                    else:
-                        count += the_len
-                        self.__bytes_sent += the_len
-                        self.__write(chunk[:the_len])
-                        break
+                else:
+                    for chunk in file_wrapper:
+                        if the_len >= len(chunk):
+                            the_len -= len(chunk)
+                            count += len(chunk)
+                            self.__bytes_sent += len(chunk)
+                            self.__write(chunk)
+                        else:
+                            count += the_len
+                            self.__bytes_sent += the_len
+                            self.__write(chunk[:the_len])
+                            break
+            finally:
+                file_to_send.close()
         except IOError, err:
             if "failed to write data" in str(err):
                 pass
@@ -472,6 +472,28 @@ class SimulatedModPythonRequest(object):
                 raise
         return self.__bytes_sent
 
+    def __write_file_wrapper(self):
+        """
+        Writes the pending file (if any) through the write callable, since
+        something else has to be sent after it
+        """
+        file_wrapper, self.__file_wrapper = self.__file_wrapper, None
+        if file_wrapper is not None:
+            try:
+                for chunk in file_wrapper:
+                    self.__write(chunk)
+            finally:
+                if hasattr(file_wrapper, 'close'):
+                    file_wrapper.close()
+
+    def pop_file_wrapper(self):
+        """
+        Returns the `wsgi.file_wrapper` of the file which is pending to be sent
+        (as the response iterable), if any
+        """
+        file_wrapper, self.__file_wrapper = self.__file_wrapper, None
+        return file_wrapper
+
     def send_x_file(self, fullpath, fullname=None, mime=None):
         """
         Sends a file using X-Send-File
@@ -53,11 +53,13 @@ import re
 import cgi
 import cStringIO
 import tempfile
+import types
 from indico.web.wsgi import webinterface_handler_config as apache
 from indico.web.wsgi.webinterface_handler_config import \
      SERVER_RETURN, \
      HTTP_LENGTH_REQUIRED, \
      HTTP_BAD_REQUEST
+from indico.web.wsgi.indico_wsgi_file_handler import DeferredFileResponse
 from MaKaC.common.logger import Logger
 
 # Cache for values of PythonPath that have been seen already.
@@ -588,13 +590,29 @@ def parse_header(line):
             pdict[name] = value
     return key, pdict
 
+class DeferredChunkedResponse(object):
+    """
+    A response made of the strings (chunks) produced by an iterable, which
+    are only generated as they are written to the client, after the request
+    has been committed (it can be retried until then, e.g. on ZODB
+    conflicts). `close` is called once they have been written, or if they
+    are not, e.g. for HEAD requests.
+    """
+
+    def __init__(self, chunks, close):
+        self.chunks = chunks
+        self.close = close
+
+
 def _check_result(req, result):
     """
     Check that a page handler actually wrote something, and
     properly finish the apache request.
 
     @param req: the request.
-    @param result: the produced output.
+    @param result: the produced output, either a string, a list/generator
+        of strings (chunks) which are streamed to the client, a
+        DeferredChunkedResponse or a DeferredFileResponse
     @type result: string
     @return: an apache error code
     @rtype: int
@@ -602,9 +620,24 @@ def _check_result(req, result):
     @note: that this function actually takes care of writing the result
         to the client.
     """
+    if isinstance(result, DeferredFileResponse):
+        # the headers have already been set by stream_file
+        result.send()
+        return req.status
+    if isinstance(result, DeferredChunkedResponse):
+        try:
+            return _check_result(req, result.chunks)
+        finally:
+            result.close()
+
+    chunks = None
     if result is apache.HTTP_OK:
         result = ""
     else:
+        if isinstance(result, (list, tuple, types.GeneratorType)):
+            # the first chunk is enough to guess the content type
+            chunks = iter(result)
+            result = next(chunks, "")
         if type(result) == unicode:
             result = result.encode('utf-8')
         else:
@@ -627,6 +660,8 @@ def _check_result(req, result):
         # It might be interesting in future not to use the write callable
         # with all the web pages. <http://www.python.org/dev/peps/pep-0333/#the-write-callable>
         req.write(result)
+        if chunks is not None:
+            req.stream(chunks)
         return req.status
 
     return apache.HTTP_OK
@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+##
+##
+## This file is part of Indico.
+## Copyright (C) 2002 - 2013 European Organization for Nuclear Research (CERN).
+##
+## Indico is free software; you can redistribute it and/or
+## modify it under the terms of the GNU General Public License as
+## published by the Free Software Foundation; either version 3 of the
+## License, or (at your option) any later version.
+##
+## Indico is distributed in the hope that it will be useful, but
+## WITHOUT ANY WARRANTY; without even the implied warranty of
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+## General Public License for more details.
+##
+## You should have received a copy of the GNU General Public License
+## along with Indico;if not, see <http://www.gnu.org/licenses/>.
+"""
+Route table of the legacy (mod_python style) publisher.
+
+The publisher modules (htdocs/*.py and the ones in the url mappings) are
+compiled and executed once per process, instead of on every request, and
+the signature of each handler is inspected once, so that the request form
+can be bound to its arguments.
+
+In DEVELOPMENT mode (see MaKaC.common.general) the modules are still
+executed on every request, since that is when they reload the request
+handler modules they use.
+"""
+
+import glob
+import inspect
+import os
+import threading
+
+from indico.web.wsgi.indico_wsgi_handler_utils import registerException
+
+# Legacy imports
+from MaKaC.common import Config, general
+from MaKaC.common.logger import Logger
+
+
+class LegacyHandler(object):
+    """
+    A handler function of a legacy publisher module, called as
+    `handler(req, **form)`
+    """
+
+    def __init__(self, name, func):
+        self.name = name
+        self._func = func
+        try:
+            args, varargs, varkw, defaults = inspect.getargspec(func)
+        except TypeError:
+            # not a plain function, let it deal with the arguments itself
+            args, varkw, defaults = [], True, None
+        defaults = defaults or ()
+        self._acceptsAny = varkw is not None
+        # the first argument is the request
+        self._args = args[1:]
+        self._defaults = dict(zip(args[len(args) - len(defaults):], defaults))
+        self._required = set(arg for arg in self._args
+                             if arg not in self._defaults)
+
+    def bind(self, form):
+        """
+        Returns the keyword arguments for the handler, out of the form
+        """
+        if self._acceptsAny or (self._required.issubset(form) and
+                                set(form).issubset(self._args)):
+            return form
+        Logger.get('wsgi').warning("Wrong GET parameter set in calling a legacy "
+                                   "publisher handler for %s: expected_args=%r, "
+                                   "found_args=%r" % (self.name, self._args,
+                                                      form.keys()))
+        return dict((arg, form.get(arg, self._defaults.get(arg)))
+                    for arg in self._args)
+
+    def __call__(self, req, form):
+        return self._func(req, **self.bind(form))
+
+
+class LegacyModule(object):
+    """
+    A legacy publisher module, compiled and executed once
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._mtime = os.path.getmtime(path)
+        with open(path) as f:
+            code = compile(f.read(), path, 'exec')
+        self._globals = {}
+        exec code in self._globals
+        self._handlers = {}
+
+    def isStale(self):
+        try:
+            return os.path.getmtime(self.path) != self._mtime
+        except OSError:
+            return True
+
+    def getHandler(self, name):
+        """
+        Returns the handler called `name`, or None if there is no such thing
+        """
+        handler = self._handlers.get(name)
+        if handler is None:
+            func = self._globals.get(name)
+            if not callable(func):
+                return None
+            handler = self._handlers[name] = LegacyHandler(name, func)
+        return handler
+
+
+class LegacyRouteTable(object):
+    """
+    Maps module paths to the (already loaded) legacy publisher modules.
+    When running the embedded (development) web server, modules which
+    changed on disk are loaded again, and in DEVELOPMENT mode they are
+    loaded on every request.
+    """
+
+    def __init__(self):
+        self._modules = {}
+        self._lock = threading.Lock()
+        self._preloaded = False
+
+    def _needsLoad(self, module, reloadChanged):
+        return module is None or (reloadChanged and module.isStale())
+
+    def _loadModule(self, path):
+        try:
+            return LegacyModule(path)
+        except:
+            # Log which file caused the error and relaunch the exception
+            registerException('Error executing the module %s' % path)
+            raise
+
+    def getModule(self, path):
+        path = os.path.abspath(path)
+        if general.DEVELOPMENT:
+            return self._loadModule(path)
+        reloadChanged = Config.getInstance().getEmbeddedWebserver()
+        module = self._modules.get(path)
+        if self._needsLoad(module, reloadChanged):
+            with self._lock:
+                module = self._modules.get(path)
+                if self._needsLoad(module, reloadChanged):
+                    module = self._modules[path] = self._loadModule(path)
+        return module
+
+    def getHandler(self, path, name):
+        return self.getModule(path).getHandler(name)
+
+    def preload(self, htdocsDir, urlMappings):
+        """
+        Loads all the publisher modules (the ones in htdocs and in the url
+        mappings) once, so that the requests don't pay for it. Modules which
+        fail to load are retried when requested.
+        """
+        if self._preloaded or general.DEVELOPMENT:
+            return
+        self._preloaded = True
+        paths = set(glob.glob(os.path.join(htdocsDir, '*.py')))
+        paths.discard(os.path.join(htdocsDir, '__init__.py'))
+        for module, handler, function, params in urlMappings.itervalues():
+            paths.add(os.path.join(*module))
+        for path in sorted(paths):
+            try:
+                self.getModule(path)
+            except Exception:
+                pass